@@ -0,0 +1,107 @@
+"""
+Benchmark da afinidade de cache (rendezvous-hash) no LoadBalancerProxy.
+
+1. Cópias em cache: imagens repetidas (popularidade Zipf) enviadas por
+   vários clientes através do balanceador; para cada algoritmo, quantas
+   cópias distintas de cada imagem os serviços acabam recebendo (1.0 = cada
+   imagem aquece o cache de um único serviço) e a fração da carga no serviço
+   mais carregado.
+2. Movimento de chaves: fração das chaves que mudam de serviço quando um
+   serviço sai e quando volta, comparada com hash módulo N.
+
+Uso: python src/benchmarks/bench_affinity.py [--services 4] [--images 200] [--requests 2000] [--load-factor 1.25]
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.balancing import RendezvousHashStrategy
+from domain.load_balancer_proxy import LoadBalancerProxy
+from domain.service_client import ServiceClient
+from fake_service import FakeService
+
+def run(address: str, clients: int, sequence: list):
+    def client_loop(i: int):
+        client = ServiceClient(address, timeout=30)
+        for payload in sequence[i::clients]:
+            client.request(payload)
+        client.close()
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def cache_copies(args, images, sequence):
+    print(f"{args.services} serviços, {len(images)} imagens distintas, {len(sequence)} requisições "
+          f"(Zipf s={args.zipf}), {args.clients} clientes")
+    print(f"{'algoritmo':<20}{'cópias/imagem':>15}{'maior carga':>13}{'desvios':>9}")
+    for algorithm in args.algorithms:
+        services = [FakeService(delay=args.delay / 1000.0, track_keys=True) for _ in range(args.services)]
+        options = {'load_factor': args.load_factor} if algorithm == 'rendezvous-hash' else None
+        lb = LoadBalancerProxy([s.address for s in services], name=f"LB-{algorithm}",
+                               algorithm=algorithm, algorithm_options=options)
+        threading.Thread(target=lb.start, daemon=True).start()
+        while not lb.running:
+            time.sleep(0.01)
+
+        run(f"localhost:{lb.port}", args.clients, sequence)
+        distinct = len(set().union(*(s.keys for s in services)))
+        copies = sum(len(s.keys) for s in services) / max(1, distinct)
+        busiest = max(s.requests for s in services) / max(1, sum(s.requests for s in services))
+        spillovers = getattr(lb.strategy, 'spillovers', 0)
+        print(f"{algorithm:<20}{copies:>15.2f}{busiest * 100:>12.1f}%{spillovers:>9}")
+
+        lb.stop()
+        for service in services:
+            service.close()
+
+def key_movement(args):
+    services = [f"backend-{i}:{9000 + i}" for i in range(args.services)]
+    keys = [hashlib.blake2b(str(i).encode(), digest_size=16).digest() for i in range(args.keys)]
+    strategy = RendezvousHashStrategy()
+    rendezvous = lambda candidates, key: strategy.rank(candidates, key)[0]
+    modulo = lambda candidates, key: candidates[int.from_bytes(key[:8], 'big') % len(candidates)]
+    removed = services[1:] if len(services) > 1 else services
+
+    print(f"\n{args.keys} chaves, {args.services} serviços -> sai {services[0]} -> volta "
+          f"(ideal: {100 / args.services:.1f}% movidas)")
+    print(f"{'método':<20}{'movidas (saída)':>17}{'movidas (volta)':>17}")
+    for name, choose in (("rendezvous-hash", rendezvous), ("hash mod N", modulo)):
+        before = [choose(services, key) for key in keys]
+        during = [choose(removed, key) for key in keys]
+        after = [choose(services, key) for key in keys]
+        moved_out = np.mean([a != b for a, b in zip(before, during)])
+        moved_back = np.mean([a != b for a, b in zip(during, after)])
+        print(f"{name:<20}{moved_out * 100:>16.1f}%{moved_back * 100:>16.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--services', type=int, default=4)
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--size', type=int, default=4096)
+    parser.add_argument('--zipf', type=float, default=1.1, help="expoente da popularidade das imagens")
+    parser.add_argument('--delay', type=float, default=1.0, help="atraso dos serviços (ms)")
+    parser.add_argument('--load-factor', type=float, default=1.25, help="limite de carga do rendezvous-hash")
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--algorithms', nargs='+', default=['round-robin', 'least-outstanding', 'rendezvous-hash'])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    images = [os.urandom(args.size) for _ in range(args.images)]
+    popularity = 1.0 / np.arange(1, args.images + 1) ** args.zipf
+    sequence = [images[i] for i in rng.choice(args.images, size=args.requests, p=popularity / popularity.sum())]
+
+    cache_copies(args, images, sequence)
+    key_movement(args)
+
+if __name__ == "__main__":
+    main()
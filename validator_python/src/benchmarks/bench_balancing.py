@@ -0,0 +1,80 @@
+"""
+Benchmark dos algoritmos de balanceamento com um serviço lento: latência
+(p50/p99/p99.9) e fração das requisições enviadas ao serviço lento, para
+cada algoritmo, com vários clientes concorrentes passando pelo
+LoadBalancerProxy. Os serviços são falsos (ver fake_service): todos
+respondem em `--delay` ms, exceto um, que responde em `--slow-delay` ms.
+
+Uso: python src/benchmarks/bench_balancing.py [--services 4] [--clients 16] [--requests 100]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.balancing import BALANCING_STRATEGIES
+from domain.load_balancer_proxy import LoadBalancerProxy
+from domain.service_client import ServiceClient
+from fake_service import FakeService
+
+def run(address: str, clients: int, requests: int, payload: bytes) -> np.ndarray:
+    latencies = [[] for _ in range(clients)]
+
+    def client_loop(i: int):
+        client = ServiceClient(address, timeout=30)
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.request(payload)
+            latencies[i].append(time.perf_counter() - start)
+        client.close()
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array([x for values in latencies for x in values]) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--services', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--delay', type=float, default=5.0, help="atraso dos serviços normais (ms)")
+    parser.add_argument('--slow-delay', type=float, default=100.0, help="atraso do serviço lento (ms)")
+    parser.add_argument('--algorithms', nargs='+', default=list(BALANCING_STRATEGIES))
+    args = parser.parse_args()
+
+    payload = os.urandom(4096)
+    print(f"{args.services} serviços ({args.delay:.0f}ms, um com {args.slow_delay:.0f}ms), "
+          f"{args.clients} clientes x {args.requests} requisições")
+    print(f"{'algoritmo':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}{'p99.9 (ms)':>12}{'req/s':>8}{'no lento':>10}")
+    for algorithm in args.algorithms:
+        services = [FakeService(delay=args.delay / 1000.0) for _ in range(args.services)]
+        services[0].delay = args.slow_delay / 1000.0
+        options = None
+        if algorithm == 'weighted-round-robin':
+            # Peso menor para o serviço lento, como um operador configuraria
+            options = {'weights': {services[0].address: 1, **{s.address: 4 for s in services[1:]}}}
+        lb = LoadBalancerProxy([s.address for s in services], name=f"LB-{algorithm}",
+                               algorithm=algorithm, algorithm_options=options)
+        threading.Thread(target=lb.start, daemon=True).start()
+        while not lb.running:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        latencies = run(f"localhost:{lb.port}", args.clients, args.requests, payload)
+        rate = len(latencies) / (time.perf_counter() - start)
+        slow_share = services[0].requests / max(1, sum(s.requests for s in services))
+        print(f"{algorithm:<22}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+              f"{np.percentile(latencies, 99.9):>12.2f}{rate:>8.0f}{slow_share * 100:>9.1f}%")
+
+        lb.stop()
+        for service in services:
+            service.close()
+
+if __name__ == "__main__":
+    main()
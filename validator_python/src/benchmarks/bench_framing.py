@@ -0,0 +1,91 @@
+"""
+Benchmark da E/S enquadrada: vazão em loopback de mensagens com prefixo de
+tamanho, comparando o caminho antigo (recv de 8192 bytes concatenado com +=,
+dois sendall separados, sem TCP_NODELAY) com o de framing (buffer
+pré-alocado preenchido com recv_into, sendmsg único, TCP_NODELAY).
+
+Cada rodada faz ida e volta: o cliente envia o payload e o servidor devolve
+uma resposta curta, como no Service.
+
+Uso: python src/benchmarks/bench_framing.py [--sizes 4096 1048576] [--rounds 50]
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.framing import configure_socket, recv_message, send_message
+
+RESPONSE = b'{"status": "success"}'
+
+def legacy_recv(sock: socket.socket) -> bytes:
+    size = int.from_bytes(sock.recv(8), 'big')
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 8192))
+        if not chunk:
+            raise ConnectionError("Conexão fechada")
+        data += chunk
+    return data
+
+def legacy_send(sock: socket.socket, payload: bytes):
+    sock.sendall(len(payload).to_bytes(8, 'big'))
+    sock.sendall(payload)
+
+def framed_recv(sock: socket.socket) -> bytes:
+    return recv_message(sock)
+
+def framed_send(sock: socket.socket, payload: bytes):
+    send_message(sock, payload)
+
+def serve(server: socket.socket, recv, send, rounds: int, nodelay: bool):
+    conn, _ = server.accept()
+    if nodelay:
+        configure_socket(conn)
+    with conn:
+        for _ in range(rounds):
+            recv(conn)
+            send(conn, RESPONSE)
+
+def run(size: int, rounds: int, recv, send, nodelay: bool) -> float:
+    payload = os.urandom(size)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    thread = threading.Thread(target=serve, args=(server, recv, send, rounds, nodelay))
+    thread.start()
+
+    client = socket.create_connection(server.getsockname())
+    if nodelay:
+        configure_socket(client)
+    start = time.perf_counter()
+    with client:
+        for _ in range(rounds):
+            send(client, payload)
+            recv(client)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    server.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[4 * 1024, 64 * 1024, 1024 * 1024, 20 * 1024 * 1024])
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'payload':>12}{'legado (MB/s)':>16}{'framing (MB/s)':>16}{'legado (ms)':>14}{'framing (ms)':>14}")
+    for size in args.sizes:
+        rounds = max(3, min(args.rounds, (200 * 1024 * 1024) // size))
+        legacy = run(size, rounds, legacy_recv, legacy_send, nodelay=False)
+        framed = run(size, rounds, framed_recv, framed_send, nodelay=True)
+        total_mb = size * rounds / (1024 * 1024)
+        print(f"{size:>12}{total_mb / legacy:>16.1f}{total_mb / framed:>16.1f}"
+              f"{legacy / rounds * 1000:>14.3f}{framed / rounds * 1000:>14.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark de hedging: latência (p50/p99/p99.9) e carga extra nos serviços,
+sem e com duplicatas, no balanceador e no cliente. Os serviços são falsos
+(ver fake_service): respondem em `--delay` ms, mas uma fração
+`--stall-rate` das requisições trava por `--stall-delay` ms a mais.
+
+A carga extra é a razão entre as requisições recebidas pelos serviços e as
+enviadas pelos clientes, menos 1; "canceladas" são as cópias perdedoras
+descartadas pelos serviços (FRAME_CANCEL).
+
+Uso: python src/benchmarks/bench_hedging.py [--services 4] [--clients 8] [--requests 200] [--percentile 95]
+"""
+import os
+import sys
+import time
+import argparse
+import itertools
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.connection_pool import ConnectionPool
+from domain.hedging import HedgePolicy, RetryBudget, hedged_call
+from domain.load_balancer_proxy import LoadBalancerProxy
+from domain.service_client import ServiceClient
+from fake_service import FakeService
+
+def run(request, clients: int, requests: int) -> np.ndarray:
+    latencies = [[] for _ in range(clients)]
+
+    def client_loop(i: int):
+        for _ in range(requests):
+            start = time.perf_counter()
+            request()
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array([x for values in latencies for x in values]) * 1000
+
+def hedging_config(args, enabled: bool):
+    return {'enabled': enabled, 'percentile': args.percentile, 'min_samples': 50,
+            'retry_budget': {'ratio': args.budget_ratio}}
+
+def via_lb(args, services, payload, enabled: bool):
+    lb = LoadBalancerProxy([s.address for s in services], name="LB-hedge",
+                           algorithm="least-outstanding", hedging=hedging_config(args, enabled))
+    threading.Thread(target=lb.start, daemon=True).start()
+    while not lb.running:
+        time.sleep(0.01)
+    client = ServiceClient(f"localhost:{lb.port}", timeout=30)
+    latencies = run(lambda: client.request(payload), args.clients, args.requests)
+    client.close()
+    lb.stop()
+    return latencies, lb.hedging
+
+def via_client(args, services, payload, enabled: bool):
+    pools = {s.address: ConnectionPool(lambda address=s.address: ServiceClient(address, timeout=30).connect())
+             for s in services}
+    addresses = itertools.cycle(list(pools))
+    policy = HedgePolicy(percentile=args.percentile, min_samples=50,
+                         budget=RetryBudget(ratio=args.budget_ratio)) if enabled else None
+
+    def request():
+        used = []
+
+        def submit(hedge: bool):
+            address = next(addresses)
+            while address in used:
+                address = next(addresses)
+            used.append(address)
+            client = pools[address].acquire()
+            future = client.submit(payload)
+
+            def finish():
+                if not future.done():
+                    client.cancel(future)
+                pools[address].release(client)
+            return future, finish
+
+        if policy is None:
+            future, finish = submit(False)
+            try:
+                return future.result()
+            finally:
+                finish()
+        return hedged_call(policy, submit, timeout=30)
+
+    latencies = run(request, args.clients, args.requests)
+    for pool in pools.values():
+        pool.close()
+    return latencies, policy
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--services', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=2.0, help="atraso normal dos serviços (ms)")
+    parser.add_argument('--stall-rate', type=float, default=0.03, help="fração de requisições que travam")
+    parser.add_argument('--stall-delay', type=float, default=100.0, help="duração das travadas (ms)")
+    parser.add_argument('--percentile', type=float, default=95.0, help="percentil que dispara a duplicata")
+    parser.add_argument('--budget-ratio', type=float, default=0.1, help="fichas por requisição do orçamento")
+    args = parser.parse_args()
+
+    payload = os.urandom(4096)
+    total = args.clients * args.requests
+    print(f"{args.services} serviços ({args.delay:.0f}ms, {args.stall_rate * 100:.0f}% travam "
+          f"+{args.stall_delay:.0f}ms), {args.clients} clientes x {args.requests} requisições, "
+          f"duplicata após p{args.percentile:g}")
+    print(f"{'caminho':<26}{'p50 (ms)':>10}{'p99 (ms)':>10}{'p99.9 (ms)':>12}{'carga extra':>13}"
+          f"{'duplicatas':>12}{'canceladas':>12}")
+    for name, mode, enabled in (("balanceador", via_lb, False), ("balanceador + hedging", via_lb, True),
+                                ("cliente", via_client, False), ("cliente + hedging", via_client, True)):
+        services = [FakeService(delay=args.delay / 1000.0, stall_rate=args.stall_rate,
+                                stall_delay=args.stall_delay / 1000.0) for _ in range(args.services)]
+        latencies, policy = mode(args, services, payload, enabled)
+        received = sum(s.requests for s in services)
+        hedged = policy.hedged if policy else 0
+        print(f"{name:<26}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}"
+              f"{np.percentile(latencies, 99.9):>12.2f}{(received / total - 1) * 100:>12.1f}%"
+              f"{hedged:>12}{sum(s.cancelled for s in services):>12}")
+        for service in services:
+            service.close()
+
+if __name__ == "__main__":
+    main()
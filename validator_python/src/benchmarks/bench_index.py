@@ -0,0 +1,72 @@
+"""
+Benchmark dos índices de vizinhos: recall@k em relação à busca exata e
+latência por consulta, lado a lado, para diferentes tamanhos de treino.
+
+Os dados são sintéticos e agrupados (como imagens de poucas classes), com
+dimensão configurável: 4096 corresponde às features brutas e valores
+menores simulam o uso de um estágio de redução de dimensionalidade.
+
+Uso: python src/benchmarks/bench_index.py [--sizes 10000 100000] [--dim 256]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.neighbor_index import create_index
+
+CONFIGS = [
+    {'backend': 'brute'},
+    {'backend': 'tree'},
+    {'backend': 'ivf', 'n_lists': 64, 'n_probe': 4},
+    {'backend': 'ivf', 'n_lists': 64, 'n_probe': 16},
+    {'backend': 'ivf', 'n_lists': 256, 'n_probe': 8},
+]
+
+def clustered_data(n: int, dim: int, rng, n_clusters: int = 50) -> np.ndarray:
+    centers = rng.normal(0, 1, (n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + rng.normal(0, 0.5, (n, dim)).astype(np.float32)
+
+def recall(found: np.ndarray, exact: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, exact))
+    return hits / exact.size
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    for size in args.sizes:
+        X = clustered_data(size, args.dim, rng)
+        Q = clustered_data(args.queries, args.dim, rng)
+
+        print(f"\n=== {size} amostras de treino, dimensão {args.dim}, k={args.k} ===")
+        print(f"{'backend':<34}{'build (s)':>10}{'consulta (ms)':>15}{'recall@k':>10}")
+        exact = None
+        for config in CONFIGS:
+            index = create_index(config)
+            start = time.perf_counter()
+            index.fit(X)
+            build = time.perf_counter() - start
+
+            found = []
+            start = time.perf_counter()
+            for q in Q:
+                found.append(index.search(q[None, :], args.k)[1][0])
+            query_ms = (time.perf_counter() - start) / len(Q) * 1000
+            found = np.array(found)
+            if exact is None:
+                exact = found
+
+            name = ', '.join(f"{k}={v}" for k, v in config.items())
+            print(f"{name:<34}{build:>10.2f}{query_ms:>15.3f}{recall(found, exact):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: caminho sklearn atual (transform + predict + predict_proba)
+versus o InferenceEngine de passo único.
+
+Uso: python src/benchmarks/bench_inference.py [--train 2000] [--requests 500]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.inference import InferenceEngine
+
+def sklearn_path(model, scaler, features):
+    features = scaler.transform(features)
+    prediction = model.predict(features)[0]
+    probabilities = model.predict_proba(features)[0]
+    return prediction, probabilities[prediction]
+
+def engine_path(engine, features):
+    predictions, confidences = engine.predict(features)
+    return predictions[0], confidences[0]
+
+def measure(fn, queries) -> np.ndarray:
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--train', type=int, default=2000, help='imagens de treinamento sintéticas')
+    parser.add_argument('--requests', type=int, default=500, help='requisições medidas')
+    parser.add_argument('--batch', type=int, default=32, help='tamanho do lote para o teste em lote')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    X = rng.integers(0, 256, size=(args.train, 4096), dtype=np.uint8)
+    y = rng.integers(0, 2, size=args.train)
+    queries = [rng.integers(0, 256, size=(1, 4096), dtype=np.uint8) for _ in range(args.requests)]
+
+    scaler = StandardScaler()
+    model = KNeighborsClassifier(n_neighbors=5)
+    model.fit(scaler.fit_transform(X), y)
+    engine = InferenceEngine.from_sklearn(model, scaler)
+
+    # Confere se os dois caminhos concordam
+    mismatches = sum(sklearn_path(model, scaler, q)[0] != engine_path(engine, q)[0] for q in queries[:50])
+
+    old = measure(lambda q: sklearn_path(model, scaler, q), queries)
+    new = measure(lambda q: engine_path(engine, q), queries)
+
+    print(f"=== Inferência por requisição ({args.train} imagens de treino, {args.requests} requisições) ===")
+    print(f"{'caminho':<22}{'média (ms)':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for name, lat in (("sklearn (2 buscas)", old), ("InferenceEngine", new)):
+        print(f"{name:<22}{lat.mean():>12.3f}{np.percentile(lat, 50):>12.3f}{np.percentile(lat, 99):>12.3f}")
+    print(f"Redução da latência média: {(1 - new.mean() / old.mean()) * 100:.1f}%")
+    print(f"Divergências de classe (50 amostras): {mismatches}")
+
+    batch = np.vstack(queries[:args.batch])
+    start = time.perf_counter()
+    engine.predict(batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+    print(f"Lote de {args.batch} imagens: {batch_ms:.3f}ms ({batch_ms / args.batch:.3f}ms por imagem)")
+
+if __name__ == "__main__":
+    main()
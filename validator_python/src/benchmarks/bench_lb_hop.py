@@ -0,0 +1,68 @@
+"""
+Benchmark do salto pelo balanceador: latência de requisições enviadas
+direto a um serviço e através do LoadBalancerProxy, com vários clientes
+concorrentes. Os serviços são falsos (respondem na hora, ver fake_service),
+de modo que a diferença medida é o custo do salto extra.
+
+Uso: python src/benchmarks/bench_lb_hop.py [--size 65536] [--clients 1 8 32] [--requests 200]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.load_balancer_proxy import LoadBalancerProxy
+from domain.service_client import ServiceClient
+from fake_service import FakeService
+
+def run(address: str, clients: int, requests: int, payload: bytes) -> np.ndarray:
+    latencies = [[] for _ in range(clients)]
+
+    def client_loop(i: int):
+        client = ServiceClient(address, timeout=30)
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.request(payload)
+            latencies[i].append(time.perf_counter() - start)
+        client.close()
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array([x for values in latencies for x in values]) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=64 * 1024)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    services = [FakeService(), FakeService()]
+    lb = LoadBalancerProxy([s.address for s in services], name="LB-bench")
+    threading.Thread(target=lb.start, daemon=True).start()
+    while not lb.running:
+        time.sleep(0.01)
+    payload = os.urandom(args.size)
+
+    print(f"payload: {args.size} bytes, {args.requests} requisições por cliente")
+    print(f"{'clientes':>9}{'caminho':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'req/s':>10}")
+    for clients in args.clients:
+        for name, address in (("direto", services[0].address), ("via LB", f"localhost:{lb.port}")):
+            start = time.perf_counter()
+            latencies = run(address, clients, args.requests, payload)
+            rate = len(latencies) / (time.perf_counter() - start)
+            print(f"{clients:>9}{name:>10}{np.percentile(latencies, 50):>10.3f}"
+                  f"{np.percentile(latencies, 99):>10.3f}{rate:>10.0f}")
+
+    lb.stop()
+    for service in services:
+        service.close()
+
+if __name__ == "__main__":
+    main()
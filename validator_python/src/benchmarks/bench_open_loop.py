@@ -0,0 +1,69 @@
+"""
+Benchmark do gerador de carga: malha fechada (o laço antigo do Source:
+envia, espera a resposta, dorme 1 / taxa) contra malha aberta
+(OpenLoopGenerator) na mesma taxa, contra um serviço falso que trava de vez
+em quando: a cada `--pause-interval` ms ele pausa por `--pause-duration` ms.
+
+Na malha fechada a taxa atingida fica abaixo da configurada e as requisições
+que deveriam ter chegado durante uma pausa simplesmente não são enviadas,
+então o p99 medido esconde a espera (coordinated omission). A malha aberta
+mantém a taxa e conta essa espera na latência.
+
+Uso: python src/benchmarks/bench_open_loop.py [--rate 200] [--duration 5] [--arrival poisson]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.load_generator import OpenLoopGenerator, create_arrival_process
+from domain.service_client import ServiceClient
+from fake_service import FakeService
+
+def closed_loop(client: ServiceClient, payload: bytes, rate: float, duration: float):
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        begin = time.perf_counter()
+        client.request(payload)
+        latencies.append(time.perf_counter() - begin)
+        time.sleep(1.0 / rate)
+    return len(latencies) / duration, len(latencies) / (time.perf_counter() - start), np.array(latencies)
+
+def open_loop(client: ServiceClient, payload: bytes, args):
+    generator = OpenLoopGenerator(lambda i: client.request(payload),
+                                  create_arrival_process(args.arrival, args.rate), concurrency=args.concurrency)
+    stats = generator.run(args.duration)
+    return stats['offered_rate'], stats['achieved_rate'], np.array(generator.latencies)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=200.0, help="taxa configurada (req/s)")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--arrival', default='poisson', help="constant | poisson | bursty")
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--delay', type=float, default=1.0, help="atraso normal do serviço (ms)")
+    parser.add_argument('--pause-interval', type=float, default=1000.0, help="intervalo entre pausas (ms)")
+    parser.add_argument('--pause-duration', type=float, default=100.0, help="duração das pausas (ms)")
+    args = parser.parse_args()
+
+    payload = os.urandom(4096)
+    print(f"taxa {args.rate:.0f} req/s por {args.duration:.0f}s, serviço de {args.delay:.0f}ms "
+          f"(pausa de {args.pause_duration:.0f}ms a cada {args.pause_interval:.0f}ms)")
+    print(f"{'gerador':<22}{'oferecida':>11}{'atingida':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}")
+    for name, mode in (("malha fechada", lambda c: closed_loop(c, payload, args.rate, args.duration)),
+                       (f"malha aberta ({args.arrival})", lambda c: open_loop(c, payload, args))):
+        service = FakeService(delay=args.delay / 1000.0, pause_interval=args.pause_interval / 1000.0,
+                              pause_duration=args.pause_duration / 1000.0)
+        client = ServiceClient(service.address, timeout=30)
+        offered, achieved, latencies = mode(client)
+        latencies = latencies * 1000
+        print(f"{name:<22}{offered:>11.1f}{achieved:>10.1f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 99):>10.2f}{latencies.max():>10.2f}")
+        client.close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: pré-processamento original (decodificação colorida + resize +
+cvtColor) versus o estágio de preprocessing (decodificação direta em cinza,
+modos reduzidos e buffer pré-alocado), para diferentes tamanhos de imagem.
+
+Uso: python src/benchmarks/bench_preprocessing.py [--repeat 50]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.preprocessing import FEATURE_LENGTH, extract_features
+
+SIZES = [(64, 64), (256, 256), (640, 480), (1280, 960), (1920, 1080), (4000, 3000)]
+
+def legacy_features(image_data: bytes) -> np.ndarray:
+    nparr = np.frombuffer(image_data, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    img = cv2.resize(img, (64, 64))
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return img.flatten()
+
+def synthetic_jpeg(width: int, height: int, rng) -> bytes:
+    # Gradiente com ruído para gerar um JPEG de tamanho realista
+    base = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    img = base + rng.normal(0, 30, (height, width, 3))
+    _, encoded = cv2.imencode('.jpg', np.clip(img, 0, 255).astype(np.uint8))
+    return encoded.tobytes()
+
+def measure(fn, data: bytes, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(data)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=50, help='repetições por tamanho')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    buffer = np.empty(FEATURE_LENGTH, dtype=np.uint8)
+
+    print(f"{'imagem':>12}{'JPEG (KB)':>12}{'original (ms)':>16}{'novo (ms)':>12}{'ganho':>8}{'dif. média':>12}")
+    for width, height in SIZES:
+        data = synthetic_jpeg(width, height, rng)
+        old = measure(legacy_features, data, args.repeat)
+        new = measure(lambda d: extract_features(d, out=buffer), data, args.repeat)
+        diff = np.abs(legacy_features(data).astype(np.int16) - extract_features(data).astype(np.int16)).mean()
+        print(f"{f'{width}x{height}':>12}{len(data) / 1024:>12.1f}{old:>16.3f}{new:>12.3f}{old / new:>7.1f}x{diff:>12.2f}")
+
+if __name__ == "__main__":
+    main()
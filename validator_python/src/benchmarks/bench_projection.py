@@ -0,0 +1,90 @@
+"""
+Relatório de acurácia vs. dimensão do estágio de projeção (PCA/aleatória).
+
+Usa as imagens de data/train (validação cruzada em k partes) quando houver
+imagens suficientes; caso contrário gera um conjunto sintético de duas
+classes. Para cada dimensão informa acurácia, latência por consulta e
+memória da matriz de treinamento armazenada no modelo.
+
+Uso (a partir de validator_python/):
+    python src/benchmarks/bench_projection.py [--dims 16 32 64 128 256] [--folds 5]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import KNeighborsClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.inference import InferenceEngine
+from domain.preprocessing import FEATURE_LENGTH, FEATURE_SHAPE, extract_features_from_file
+from domain.projection import create_projection
+
+def load_training_set(min_samples: int):
+    samples = []
+    for label, train_dir in ((0, "data/train/cars"), (1, "data/train/bikes")):
+        if os.path.isdir(train_dir):
+            samples += [(os.path.join(train_dir, name), label) for name in os.listdir(train_dir)
+                        if name.endswith(('.jpg', '.jpeg', '.png', '.webp'))]
+    if len(samples) < min_samples:
+        return None
+    X = np.empty((len(samples), FEATURE_LENGTH), dtype=np.uint8)
+    for row, (path, _) in enumerate(samples):
+        extract_features_from_file(path, out=X[row])
+    return X, np.array([label for _, label in samples])
+
+def synthetic_set(n: int, rng):
+    # Duas classes com padrões de baixa frequência distintos mais ruído
+    yy, xx = np.mgrid[0:FEATURE_SHAPE[0], 0:FEATURE_SHAPE[1]] / FEATURE_SHAPE[0]
+    patterns = [np.sin(6 * xx) * 60 + 128, np.cos(4 * (xx + yy)) * 60 + 128]
+    y = rng.integers(0, 2, size=n)
+    X = np.stack([patterns[label] + rng.normal(0, 400, FEATURE_SHAPE) for label in y])
+    return np.clip(X, 0, 255).reshape(n, -1).astype(np.uint8), y
+
+def evaluate(X, y, projection_config, folds: int, rng):
+    order = rng.permutation(len(X))
+    correct, latencies, stored_bytes = 0, [], 0
+    for fold in np.array_split(order, folds):
+        train = np.setdiff1d(order, fold)
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X[train])
+        projection = create_projection(projection_config)
+        if projection is not None:
+            X_train = projection.fit_transform(X_train)
+        model = KNeighborsClassifier(n_neighbors=5).fit(X_train, y[train])
+        engine = InferenceEngine.from_sklearn(model, scaler, projection=projection)
+        stored_bytes = engine.train_X.nbytes + (projection.components.nbytes if projection else 0)
+
+        for row in fold:
+            start = time.perf_counter()
+            prediction = engine.predict(X[row])[0][0]
+            latencies.append(time.perf_counter() - start)
+            correct += prediction == y[row]
+    return correct / len(X), np.mean(latencies) * 1000, stored_bytes
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dims', type=int, nargs='+', default=[8, 16, 32, 64, 128, 256])
+    parser.add_argument('--method', default='pca', choices=['pca', 'random'])
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--synthetic', type=int, default=2000, help='amostras sintéticas se data/train for pequeno')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    dataset = load_training_set(min_samples=10 * args.folds)
+    if dataset is None:
+        print(f"data/train com poucas imagens; usando {args.synthetic} amostras sintéticas")
+        dataset = synthetic_set(args.synthetic, rng)
+    X, y = dataset
+
+    print(f"{'dimensão':>10}{'acurácia':>10}{'consulta (ms)':>15}{'memória (KB)':>14}")
+    configs = [(FEATURE_LENGTH, None)] + [(d, {'method': args.method, 'dim': d}) for d in args.dims]
+    for dim, config in configs:
+        accuracy, latency, stored = evaluate(X, y, config, args.folds, rng)
+        label = f"{dim}" if config else f"{dim} (sem)"
+        print(f"{label:>10}{accuracy:>10.3f}{latency:>15.3f}{stored / 1024:>14.1f}")
+
+if __name__ == "__main__":
+    main()
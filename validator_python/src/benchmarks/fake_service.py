@@ -0,0 +1,119 @@
+"""
+Serviço falso para os benchmarks de rede e balanceamento: fala o protocolo
+v2 (e v1) como o Service, mas responde com um JSON fixo após um atraso
+configurável, sem classificar nada. Permite medir o custo dos saltos de rede
+e do balanceador isoladamente, e simular serviços lentos ou com travadas
+ocasionais (`stall_rate` das requisições demoram `stall_delay` a mais) ou
+pausas do serviço inteiro (a cada `pause_interval` segundos, nenhuma resposta
+sai durante `pause_duration` segundos, como numa coleta de lixo).
+Requisições canceladas com FRAME_CANCEL antes do fim do atraso não são respondidas.
+"""
+import os
+import sys
+import json
+import random
+import hashlib
+import time
+import socket
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from domain.protocol import HELLO, LENGTH_PREFIX, FRAME_RESPONSE, FRAME_CANCEL
+from domain.framing import configure_socket, recv_exact, recv_frame, recv_header, send_frame, send_message
+
+class FakeService:
+    def __init__(self, delay: float = 0.0, host: str = 'localhost', track_keys: bool = False,
+                 stall_rate: float = 0.0, stall_delay: float = 0.0,
+                 pause_interval: float = 0.0, pause_duration: float = 0.0):
+        self.delay = delay
+        self.stall_rate = stall_rate
+        self.stall_delay = stall_delay
+        self.pause_interval = pause_interval
+        self.pause_duration = pause_duration
+        self.started = time.monotonic()
+        self.requests = 0
+        self.cancelled = 0
+        # Hashes dos payloads recebidos (para medir a afinidade de cache)
+        self.track_keys = track_keys
+        self.keys = set()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, 0))
+        self.server.listen(1024)
+        self.address = f"{host}:{self.server.getsockname()[1]}"
+        self.response = json.dumps({"status": "success", "class": "Carro", "confidence": 1.0}).encode()
+        thread = threading.Thread(target=self._accept_loop)
+        thread.daemon = True
+        thread.start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            configure_socket(conn)
+            thread = threading.Thread(target=self._serve, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _delay(self) -> float:
+        if self.stall_rate and random.random() < self.stall_rate:
+            delay = self.delay + self.stall_delay
+        else:
+            delay = self.delay
+        if self.pause_interval:
+            # Se a resposta cair numa pausa, só sai quando a pausa termina
+            elapsed = (time.monotonic() + delay - self.started) % self.pause_interval
+            if elapsed < self.pause_duration:
+                delay += self.pause_duration - elapsed
+        return delay
+
+    def _reply_later(self, conn, lock, request_id, delay, cancelled):
+        time.sleep(delay)
+        with lock:
+            if request_id in cancelled:
+                cancelled.discard(request_id)
+                return
+            send_frame(conn, request_id, FRAME_RESPONSE, self.response)
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                header = recv_header(conn, LENGTH_PREFIX)
+                if header is None:
+                    return
+                if header != HELLO:
+                    recv_exact(conn, int.from_bytes(header, 'big'))
+                    self.requests += 1
+                    time.sleep(self._delay())
+                    send_message(conn, self.response)
+                    return
+                conn.sendall(HELLO)
+                lock = threading.Lock()
+                cancelled = set()
+                while True:
+                    frame = recv_frame(conn)
+                    if frame is None:
+                        return
+                    request_id, frame_type, _, payload = frame
+                    if frame_type == FRAME_CANCEL:
+                        with lock:
+                            cancelled.add(request_id)
+                        self.cancelled += 1
+                        continue
+                    self.requests += 1
+                    if self.track_keys:
+                        self.keys.add(hashlib.blake2b(payload, digest_size=16).digest())
+                    delay = self._delay()
+                    if delay:
+                        threading.Thread(target=self._reply_later,
+                                         args=(conn, lock, request_id, delay, cancelled), daemon=True).start()
+                    else:
+                        with lock:
+                            send_frame(conn, request_id, FRAME_RESPONSE, self.response)
+            except OSError:
+                return
+
+    def close(self):
+        self.server.close()
@@ -0,0 +1,171 @@
+"""
+Varredura de capacidade: para cada número de serviços da grade, inicia os
+serviços (um processo cada, divididos entre LB1 e LB2) e os dois
+balanceadores, mede o MRT em cada taxa de requisições até o resultado
+estabilizar (CapacitySweep) e encerra tudo antes do próximo número de
+serviços. No fim encontra o joelho de saturação de cada configuração e grava
+capacity_results.json, mrt_vs_rate.png e mrt_vs_services.png.
+
+A grade e os critérios vêm da seção `sweep` de config/source.yaml; os
+argumentos da linha de comando têm prioridade.
+
+Uso: python src/capacity_sweep.py [--services 2 4] [--rates 5 10 20 40] [--window 5] [--output capacity]
+"""
+import os
+import copy
+import yaml
+import logging
+import argparse
+import multiprocessing
+import time
+from typing import Dict, List
+from domain.capacity import CapacitySweep
+from domain.health_checker import HealthChecker
+from domain.source import Source
+from start_services import ServiceManager, SOURCE_CONFIG, run_service_worker, run_load_balancer_worker
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _quiet(target, *args):
+    """Executa o processo filho sem os logs por requisição dos componentes."""
+    logging.getLogger('domain').setLevel(logging.WARNING)
+    target(*args)
+
+class SweepCluster:
+    """
+    Serviços e balanceadores de uma etapa da varredura, cada um em um
+    processo próprio (criado com "spawn", já que o processo da varredura tem
+    as threads do Source). Os serviços usam portas a partir de `base_port` e
+    os balanceadores as portas de loadbalancer1/loadbalancer2 da configuração.
+    """
+
+    def __init__(self, manager: ServiceManager, config: Dict, base_port: int, startup_timeout: float = 60.0):
+        self.manager = manager
+        self.config = config
+        self.base_port = base_port
+        self.startup_timeout = startup_timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.processes: List[multiprocessing.Process] = []
+
+    def source_config(self, services: int) -> Dict:
+        """Configuração do Source com `services` serviços divididos entre LB1 e LB2."""
+        first = (services + 1) // 2
+        host = self.config['loadbalancer1'].get('host', 'localhost')
+        ports = [self.base_port + i for i in range(services)]
+        config = copy.deepcopy(self.config)
+        config['loadbalancer1']['services'] = [f"{host}:{port}" for port in ports[:first]]
+        config['loadbalancer2']['services'] = [f"{host}:{port}" for port in ports[first:]]
+        config['source']['route_via_load_balancers'] = True
+        return config
+
+    def _spawn(self, name: str, target, *args):
+        process = self.context.Process(target=_quiet, args=(target, *args), name=name)
+        process.start()
+        self.processes.append(process)
+
+    def _wait_ready(self, addresses: List[str]):
+        # Sonda com o HELLO do protocolo v2, como as verificações de saúde dos balanceadores
+        checker = HealthChecker(addresses, timeout=1.0)
+        deadline = time.monotonic() + self.startup_timeout
+        for address in addresses:
+            while True:
+                try:
+                    checker.probe(address)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"{address} não respondeu em {self.startup_timeout:.0f}s")
+                    if any(not p.is_alive() for p in self.processes):
+                        raise RuntimeError(f"Um processo terminou antes de {address} ficar pronto")
+                    time.sleep(0.2)
+
+    def start(self, config: Dict):
+        """Inicia os serviços e os balanceadores de `config` (ver source_config) e espera ficarem prontos."""
+        services = config['loadbalancer1']['services'] + config['loadbalancer2']['services']
+        for address in services:
+            port = int(address.rsplit(':', 1)[1])
+            config_path = self.manager.create_service_config(port, train_on_start=False)
+            self._spawn(f"service-{port}", run_service_worker, config_path)
+        self._wait_ready(services)
+        balancers = []
+        for name in ('loadbalancer1', 'loadbalancer2'):
+            self._spawn(name, run_load_balancer_worker, name, config[name])
+            balancers.append(f"{config[name].get('host', 'localhost')}:{config[name]['port']}")
+        self._wait_ready(balancers)
+        logger.info(f"{len(services)} serviços e 2 balanceadores prontos")
+
+    def stop(self):
+        # Balanceadores primeiro, para não marcarem serviços que estão saindo como indisponíveis
+        for process in reversed(self.processes):
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                logger.warning(f"Processo {process.name} não finalizou, forçando encerramento")
+                process.kill()
+                process.join()
+        self.processes = []
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura de capacidade com detecção do joelho de saturação")
+    parser.add_argument('--config', default=SOURCE_CONFIG, help="configuração do Source (seção sweep)")
+    parser.add_argument('--services', type=int, nargs='+', help="números de serviços (total de LB1 + LB2)")
+    parser.add_argument('--rates', type=float, nargs='+', help="taxas de requisições (req/s)")
+    parser.add_argument('--window', type=float, help="duração de cada janela de medição (s)")
+    parser.add_argument('--max-windows', type=int, help="janelas por passo, no máximo")
+    parser.add_argument('--tolerance', type=float, help="variação relativa do MRT para considerar estável")
+    parser.add_argument('--output', help="diretório dos resultados")
+    parser.add_argument('--base-port', type=int, help="porta do primeiro serviço")
+    parser.add_argument('--server-mode', choices=['threaded', 'asyncio'], default='threaded',
+                        help="modo de servidor dos serviços (ver start_services.py)")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    sweep_config = config['source'].get('sweep') or {}
+    sweep = CapacitySweep.from_config(sweep_config, rates=args.rates, services=args.services, window=args.window,
+                                      max_windows=args.max_windows, tolerance=args.tolerance)
+    output_dir = args.output or sweep_config.get('output', 'capacity')
+    base_port = args.base_port or sweep_config.get('base_port', 9100)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Os componentes registram cada requisição; na varredura ficam só os avisos
+    logging.getLogger('domain').setLevel(logging.WARNING)
+    logging.getLogger('domain.capacity').setLevel(logging.INFO)
+
+    manager = ServiceManager(mode='process', server_mode=args.server_mode)
+    cluster = SweepCluster(manager, config, base_port)
+
+    # Cada processo de serviço apenas mapeia o artefato já gravado em disco
+    manager.prepare_model(manager.create_service_config(base_port, train_on_start=False))
+
+    try:
+        for services in sweep.services:
+            source_config = cluster.source_config(services)
+            config_path = os.path.join(output_dir, f"source_{services}.yaml")
+            with open(config_path, 'w') as f:
+                yaml.dump(source_config, f)
+            logger.info(f"=== {services} serviços ===")
+            cluster.start(source_config)
+            source = Source(config_path)
+            try:
+                sweep.run(source, services)
+            finally:
+                source.stop()
+                cluster.stop()
+    except KeyboardInterrupt:
+        logger.info("Varredura interrompida; gravando os passos já medidos")
+    finally:
+        cluster.stop()
+        if sweep.steps:
+            path = sweep.save(output_dir)
+            logger.info(f"Resultados: {path}")
+            print(sweep.summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from .framing import MAX_PAYLOAD_SIZE
+from .protocol import (HELLO, LENGTH_PREFIX, FRAME_IMAGE, FRAME_RESPONSE, FRAME_INFO, FRAME_ERROR,
+                       FRAME_CANCEL, FLAG_TRACE, FRAME_HEADER, encode_frame, read_frame, split_deadline)
+from .tracing import Trace, TracedForward, TRACE_RECEIVED, TRACE_REPLIED
+from .scheduler import DeadlineExceededError, OverloadedError, overloaded_response, rejection_response
+
+logger = logging.getLogger(__name__)
+
+# Serviço usado pelos processos do executor (modo "process")
+_worker_service = None
+
+def _init_process_worker(config_path: str):
+    """Inicializa um processo do executor com seu próprio Service (o modelo é mapeado do artefato)."""
+    global _worker_service
+    from .service import Service
+    _worker_service = Service(config_path)
+    # Cada processo classifica uma imagem por vez; o lote não teria com o que agrupar
+    _worker_service.batcher = None
+
+def _handle_in_worker(frame_type: int, payload: bytes, trace: Optional[Trace] = None,
+                      deadline: Optional[float] = None):
+    # O rastro volta junto: os eventos registrados no processo filho não alteram o do event loop
+    return _worker_service.handle_request(frame_type, payload, trace, deadline), trace
+
+class AsyncServiceServer:
+    """
+    Modo de servidor baseado em asyncio para o Service.
+
+    O enquadramento (v1, uma requisição por conexão, ou v2 persistente e
+    multiplexado, ver protocol) e toda a E/S rodam no event loop; a
+    classificação, que usa CPU, vai para um executor limitado de threads ou
+    processos. No máximo `max_pending` requisições ficam em execução ou
+    aguardando o executor; as excedentes são rejeitadas na hora com
+    "overloaded", para que a fila não cresça sem limite. As que aguardam um
+    worker livre são atendidas por ordem de prazo (earliest deadline first) e
+    descartadas se o prazo expirar antes de chegarem ao executor, ou se o
+    cliente as cancelar (FRAME_CANCEL).
+    """
+
+    def __init__(self, service):
+        self.service = service
+        config = service.config['service']
+        executor_config = config.get('executor', {})
+        self.executor_type = executor_config.get('type', 'thread')
+        self.max_workers = executor_config.get('max_workers') or os.cpu_count() or 1
+        self.max_pending = executor_config.get('max_pending', self.max_workers * 4)
+        self.loop = None
+        self.server = None
+        self._stopped = None
+        
+        # Controle de admissão (alterado apenas no event loop)
+        self.pending = 0
+        self.max_depth = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.late = 0
+        self.cancelled = 0
+        # Workers ocupados e fila de espera por prazo: heap de (prazo, sequência, future)
+        self.busy = 0
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def _create_executor(self) -> Executor:
+        if self.executor_type == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_process_worker,
+                initargs=(self.service.config_path,)
+            )
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="classifier")
+
+    def run(self):
+        """Executa o event loop até stop() ser chamado."""
+        asyncio.run(self._serve())
+
+    def stop(self):
+        """Encerra o servidor (pode ser chamado de outra thread ou de um handler de sinal)."""
+        if self.loop and self._stopped and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.executor = self._create_executor()
+        try:
+            self.server = await asyncio.start_server(
+                self._handle_connection,
+                host=self.service.host,
+                port=self.service.port,
+                backlog=self.service.backlog,
+                reuse_address=True,
+                reuse_port=self.service.reuse_port or None
+            )
+            self.service.port = self.server.sockets[0].getsockname()[1]
+            logger.info(f"Servidor asyncio iniciado em {self.service.host}:{self.service.port} "
+                        f"(executor: {self.executor_type} x{self.max_workers}, backlog: {self.service.backlog})")
+            await self._stopped.wait()
+        finally:
+            if self.server:
+                self.server.close()
+                await self.server.wait_closed()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"Controle de admissão: {self.accepted} aceitas, {self.rejected} rejeitadas, "
+                        f"máximo de {self.max_depth} pendentes, {self.dropped} descartadas por prazo, "
+                        f"{self.late} concluídas após o prazo, {self.cancelled} canceladas")
+            logger.info("Servidor encerrado")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.pending - self.busy,
+            "max_queue_depth": max(0, self.max_depth - self.max_workers),
+            "queue_limit": max(0, self.max_pending - self.max_workers),
+            "in_flight": self.busy,
+            "concurrency_limit": self.max_workers,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "late": self.late,
+            "cancelled": self.cancelled
+        }
+    
+    async def _acquire_worker(self, deadline: Optional[float]):
+        """Aguarda um worker livre; a fila de espera é ordenada pelo prazo."""
+        if deadline is not None and time.monotonic() > deadline:
+            self.dropped += 1
+            raise DeadlineExceededError("Prazo da requisição expirou antes do processamento")
+        if self.busy < self.max_workers:
+            self.busy += 1
+            return
+        waiter = self.loop.create_future()
+        key = deadline if deadline is not None else float('inf')
+        heapq.heappush(self._waiting, (key, next(self._seq), waiter))
+        # O worker é repassado diretamente por _release_worker
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Cancelada depois de receber o worker: repassa-o adiante
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release_worker()
+            raise
+    
+    def _release_worker(self):
+        """Repassa o worker à requisição de menor prazo, descartando as já expiradas."""
+        now = time.monotonic()
+        while self._waiting:
+            deadline, _, waiter = heapq.heappop(self._waiting)
+            if waiter.done():
+                continue
+            if now > deadline:
+                self.dropped += 1
+                waiter.set_exception(DeadlineExceededError("Prazo da requisição expirou na fila"))
+                continue
+            waiter.set_result(None)
+            return
+        self.busy -= 1
+    
+    async def _process(self, frame_type: int, payload: bytes, deadline: Optional[float] = None,
+                       trace: Optional[Trace] = None) -> Dict[str, Any]:
+        if frame_type == FRAME_INFO:
+            return self.service.describe()
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise OverloadedError(f"Serviço sobrecarregado ({self.pending} requisições pendentes)")
+        self.pending += 1
+        self.accepted += 1
+        self.max_depth = max(self.max_depth, self.pending)
+        try:
+            await self._acquire_worker(deadline)
+            try:
+                if self.executor_type == 'process':
+                    work = self.loop.run_in_executor(self.executor, _handle_in_worker, frame_type, bytes(payload),
+                                                     trace, deadline)
+                else:
+                    work = self.loop.run_in_executor(self.executor, self.service.handle_request,
+                                                     frame_type, payload, trace, deadline)
+                try:
+                    response = await asyncio.shield(work)
+                    if self.executor_type == 'process':
+                        response, worker_trace = response
+                        if trace is not None:
+                            trace.events = worker_trace.events
+                    return response
+                except asyncio.CancelledError:
+                    # Já em execução: o worker só é liberado quando ela terminar
+                    await asyncio.wait([work])
+                    raise
+            finally:
+                self._release_worker()
+                if deadline is not None and time.monotonic() > deadline:
+                    self.late += 1
+        finally:
+            self.pending -= 1
+    
+    async def _respond(self, writer: asyncio.StreamWriter, request_id: int, frame_type: int, flags: int,
+                       payload: bytes):
+        """
+        Processa uma requisição v2 e escreve a resposta assim que ela fica
+        pronta (com o rastro, se a requisição for rastreada).
+        """
+        response_type = FRAME_RESPONSE
+        received_at = time.time()
+        trace = None
+        try:
+            deadline, payload = split_deadline(flags, payload, time.monotonic())
+            trace, payload = Trace.split(flags, payload)
+            if trace is not None:
+                trace.stamp(self.service.address, TRACE_RECEIVED, received_at)
+            response = await self._process(frame_type, payload, deadline, trace)
+            if isinstance(response, TracedForward):
+                # Primeiro estágio de uma cadeia: o worker já foi liberado; a resposta vem do próximo salto
+                forwarded = await self.loop.run_in_executor(None, self.service.forward_traced, response, trace)
+                response = await asyncio.wrap_future(forwarded)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            return
+        except (OverloadedError, DeadlineExceededError) as e:
+            logger.warning(f"Requisição {request_id} rejeitada: {str(e)}")
+            response, response_type, trace = rejection_response(e), FRAME_ERROR, None
+        except Exception as e:
+            logger.error(f"Erro ao processar requisição {request_id}: {str(e)}")
+            response, trace = {"status": "error", "error": str(e)}, None
+        data = json.dumps(response).encode()
+        if trace is None:
+            writer.write(encode_frame(request_id, response_type, data))
+        else:
+            trace.stamp(self.service.address, TRACE_REPLIED)
+            encoded = trace.encode()
+            writer.write(FRAME_HEADER.pack(request_id, response_type, FLAG_TRACE, len(encoded) + len(data)))
+            writer.writelines((encoded, data))
+        await writer.drain()
+    
+    async def _serve_multiplexed(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(HELLO)
+        tasks: Dict[int, asyncio.Task] = {}
+        while True:
+            frame = await read_frame(reader)
+            if frame is None:
+                break
+            request_id, frame_type, flags, payload = frame
+            if frame_type == FRAME_CANCEL:
+                task = tasks.get(request_id)
+                if task is not None:
+                    task.cancel()
+                continue
+            task = asyncio.create_task(self._respond(writer, request_id, frame_type, flags, payload))
+            tasks[request_id] = task
+            task.add_done_callback(lambda t, request_id=request_id: tasks.pop(request_id, None))
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        address = writer.get_extra_info('peername')
+        try:
+            size_data = await reader.readexactly(LENGTH_PREFIX)
+            if size_data == HELLO:
+                await self._serve_multiplexed(reader, writer)
+                return
+            
+            size = int.from_bytes(size_data, 'big')
+            if size > MAX_PAYLOAD_SIZE:
+                raise ValueError(f"Payload de {size} bytes excede o limite de {MAX_PAYLOAD_SIZE} bytes")
+            image_data = await reader.readexactly(size)
+            try:
+                response = await self._process(FRAME_IMAGE, image_data)
+            except OverloadedError as e:
+                logger.warning(f"Requisição de {address} rejeitada: {str(e)}")
+                response = overloaded_response(e)
+            except Exception as e:
+                logger.error(f"Erro ao processar requisição: {str(e)}")
+                response = {"status": "error", "error": str(e)}
+
+            response_data = json.dumps(response).encode()
+            writer.write(len(response_data).to_bytes(8, 'big') + response_data)
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            logger.error(f"Conexão com {address} encerrada antes do fim da requisição")
+        except Exception as e:
+            logger.error(f"Erro na conexão com {address}: {str(e)}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
@@ -0,0 +1,224 @@
+import itertools
+import logging
+import socket
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from .protocol import HELLO, FRAME_CANCEL
+from .framing import configure_socket, recv_exact, recv_frame, recv_into_buffer, send_frame
+from .hedging import HedgeTimer
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos blocos lidos ao descartar um payload do cliente
+RELAY_CHUNK_SIZE = 64 * 1024
+
+# Chamado com (tipo do frame, payload, flags) quando a resposta chega, ou com
+# (None, exceção) se a conexão com o serviço cair antes ou o prazo da
+# requisição acabar (socket.timeout); flags tem padrão 0
+ResponseCallback = Callable[..., None]
+
+_local = threading.local()
+
+# Uma única thread acompanha os timeouts das requisições de todas as conexões;
+# _expire roda no executor do HedgeTimer, nunca na thread dos prazos
+_timeouts = HedgeTimer("backend-timeouts")
+
+def _relay_buffer() -> memoryview:
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = memoryview(bytearray(RELAY_CHUNK_SIZE))
+    return buffer
+
+def discard(sock: socket.socket, length: int):
+    """Lê e descarta `length` bytes (mantém o enquadramento do cliente quando o payload não é usado)."""
+    buffer = _relay_buffer()
+    while length > 0:
+        chunk = buffer[:min(length, len(buffer))]
+        recv_into_buffer(sock, chunk)
+        length -= len(chunk)
+
+class BackendError(Exception):
+    """Falha na conexão com o serviço de destino."""
+    pass
+
+class BackendConnection:
+    """
+    Conexão persistente e multiplexada (protocolo v2) do balanceador com um serviço.
+
+    As requisições de todos os clientes do balanceador compartilham a mesma
+    conexão: cada payload é lido do cliente antes de ocupar a conexão e vai
+    ao serviço em um único frame, e uma thread leitora entrega cada resposta
+    ao callback registrado com o request_id usado no serviço.
+
+    Uma requisição sem resposta em `request_timeout` segundos é cancelada no
+    serviço (FRAME_CANCEL) e o callback recebe socket.timeout, para que um
+    serviço travado não prenda o cliente para sempre.
+    """
+
+    def __init__(self, address: str, connect_timeout: float = 1.0, request_timeout: Optional[float] = 30.0):
+        host, port = address.split(':')
+        self.address = address
+        self.host, self.port = host, int(port)
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        # request_id -> (callback, entrada do timeout em _timeouts)
+        self._pending: Dict[int, Tuple[ResponseCallback, Optional[list]]] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    @property
+    def outstanding(self) -> int:
+        """Requisições enviadas ao serviço e ainda sem resposta."""
+        return len(self._pending)
+
+    def connect(self) -> "BackendConnection":
+        """Abre a conexão agora (em vez de na primeira requisição). Lança BackendError."""
+        self._ensure_connected()
+        return self
+
+    def _ensure_connected(self) -> socket.socket:
+        with self._connect_lock:
+            if self._sock is not None:
+                return self._sock
+            try:
+                sock = configure_socket(socket.create_connection((self.host, self.port),
+                                                                 timeout=self.connect_timeout))
+                sock.sendall(HELLO)
+                if recv_exact(sock, len(HELLO)) != HELLO:
+                    sock.close()
+                    raise BackendError(f"{self.address} não suporta o protocolo v2")
+                sock.settimeout(None)
+            except OSError as e:
+                raise BackendError(f"Falha ao conectar a {self.address}: {str(e)}")
+            reader = threading.Thread(target=self._read_loop, args=(sock,), name=f"backend-{self.address}")
+            reader.daemon = True
+            reader.start()
+            self._sock = sock
+            logger.info(f"Conexão persistente com {self.address} estabelecida")
+            return sock
+
+    def _read_loop(self, sock: socket.socket):
+        error: Exception = BackendError(f"Conexão com {self.address} fechada pelo serviço")
+        try:
+            while True:
+                frame = recv_frame(sock)
+                if frame is None:
+                    break
+                request_id, frame_type, flags, payload = frame
+                callback = self._take(request_id)
+                if callback is not None:
+                    callback(frame_type, payload, flags)
+        except Exception as e:
+            error = BackendError(f"Erro na conexão com {self.address}: {str(e)}")
+        finally:
+            self._drop(sock, error)
+
+    def _drop(self, sock: socket.socket, error: Exception):
+        """Fecha a conexão e falha as requisições que esperavam resposta nela."""
+        with self._connect_lock:
+            if self._sock is sock:
+                self._sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for callback, timer in pending.values():
+            if timer is not None:
+                HedgeTimer.cancel(timer)
+            callback(None, error)
+
+    def _register(self, callback: ResponseCallback) -> int:
+        request_id = next(self._ids)
+        timer = None
+        if self.request_timeout:
+            timer = _timeouts.schedule(self.request_timeout, lambda: self._expire(request_id))
+        with self._pending_lock:
+            self._pending[request_id] = (callback, timer)
+        return request_id
+
+    def _take(self, request_id: int) -> Optional[ResponseCallback]:
+        """Retira a requisição das pendentes (cancelando o timeout); None se já concluída."""
+        with self._pending_lock:
+            entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return None
+        callback, timer = entry
+        if timer is not None:
+            HedgeTimer.cancel(timer)
+        return callback
+
+    def _unregister(self, request_id: int):
+        self._take(request_id)
+
+    def _expire(self, request_id: int):
+        """
+        Disparado por _timeouts: falha o callback e então desiste da
+        requisição no serviço. O cancelamento vem depois para que um envio
+        preso nesta conexão não atrase o erro entregue ao cliente.
+        """
+        callback = self._take(request_id)
+        if callback is None:
+            return
+        callback(None, socket.timeout(f"Sem resposta de {self.address} em {self.request_timeout}s"))
+        self._send_cancel(request_id)
+
+    def forward_from_client(self, client: socket.socket, frame_type: int, flags: int, length: int,
+                            callback: ResponseCallback, head: bytes = b'') -> int:
+        """
+        Lê do socket do cliente um payload de `length` bytes (precedido de
+        `head`, o início do payload já lido e regravado pelo balanceador), o
+        envia ao serviço e retorna o request_id usado no serviço. O payload é
+        lido inteiro antes de tomar o lock de envio: um cliente lento ou
+        travado no upload atrasa só a própria requisição, e não as dos demais
+        clientes que compartilham a conexão. Lança BackendError se o serviço
+        estiver indisponível (o payload já foi consumido do cliente).
+        """
+        payload = recv_exact(client, length)
+        return self.forward([head, payload] if head else payload, frame_type, flags, callback)
+
+    def forward(self, payload, frame_type: int, flags: int, callback: ResponseCallback) -> int:
+        """Envia ao serviço um payload já em memória e retorna o request_id usado no serviço."""
+        sock = self._ensure_connected()
+        request_id = self._register(callback)
+        try:
+            with self._send_lock:
+                send_frame(sock, request_id, frame_type, payload, flags)
+        except OSError as e:
+            self._unregister(request_id)
+            self._drop(sock, BackendError(str(e)))
+            raise BackendError(f"Falha ao enviar requisição para {self.address}: {str(e)}")
+        return request_id
+
+    def cancel(self, request_id: int) -> bool:
+        """
+        Desiste de uma requisição enviada: o callback não será mais chamado e o
+        serviço recebe FRAME_CANCEL. Retorna False se a resposta já tinha chegado.
+        """
+        if self._take(request_id) is None:
+            return False
+        self._send_cancel(request_id)
+        return True
+
+    def _send_cancel(self, request_id: int):
+        sock = self._sock
+        if sock is not None:
+            try:
+                with self._send_lock:
+                    send_frame(sock, request_id, FRAME_CANCEL, b'')
+            except OSError as e:
+                self._drop(sock, BackendError(str(e)))
+
+    def close(self):
+        with self._connect_lock:
+            sock = self._sock
+        if sock is not None:
+            self._drop(sock, BackendError("Conexão com o serviço fechada pelo balanceador"))
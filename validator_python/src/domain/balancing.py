@@ -0,0 +1,198 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Type
+import hashlib
+import logging
+import math
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BalancingStrategy(ABC):
+    """
+    Interface dos algoritmos de balanceamento do LoadBalancerProxy.
+
+    select() escolhe um serviço entre os disponíveis; on_dispatch() e
+    on_complete() delimitam cada requisição encaminhada (para contar as
+    pendentes) e observe() recebe o tempo de resposta de cada sucesso.
+    Algoritmos com `uses_key` recebem em select() a chave de afinidade da
+    requisição (hash do payload), o que faz o balanceador ler o payload
+    inteiro antes de escolher o serviço.
+    """
+    name = ""
+    uses_key = False
+
+    def __init__(self, **params):
+        self.params = params
+        self._lock = threading.Lock()
+        self.outstanding: Dict[str, int] = {}
+
+    @abstractmethod
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        """Escolhe um serviço da lista (não vazia) de candidatos disponíveis."""
+        pass
+
+    def on_dispatch(self, service: str):
+        with self._lock:
+            self.outstanding[service] = self.outstanding.get(service, 0) + 1
+
+    def on_complete(self, service: str):
+        with self._lock:
+            self.outstanding[service] = max(0, self.outstanding.get(service, 0) - 1)
+
+    def observe(self, service: str, response_time: float):
+        pass
+
+class RoundRobinStrategy(BalancingStrategy):
+    """Percorre os serviços disponíveis em ordem circular."""
+    name = "round-robin"
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._next = 0
+
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        with self._lock:
+            service = candidates[self._next % len(candidates)]
+            self._next += 1
+        return service
+
+class WeightedRoundRobinStrategy(BalancingStrategy):
+    """
+    Round-robin ponderado suave (como no nginx): cada serviço recebe uma
+    fração das requisições proporcional ao seu peso, intercaladas em vez de
+    em rajadas. Parâmetro: `weights` ({endereço: peso}, padrão 1).
+    """
+    name = "weighted-round-robin"
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.weights: Dict[str, float] = dict(params.get('weights') or {})
+        self._current: Dict[str, float] = {}
+
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        with self._lock:
+            total = 0.0
+            for service in candidates:
+                weight = self.weights.get(service, 1)
+                self._current[service] = self._current.get(service, 0.0) + weight
+                total += weight
+            service = max(candidates, key=lambda s: self._current[s])
+            self._current[service] -= total
+        return service
+
+class LeastOutstandingStrategy(BalancingStrategy):
+    """Escolhe o serviço com menos requisições pendentes (empates por sorteio)."""
+    name = "least-outstanding"
+
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        with self._lock:
+            fewest = min(self.outstanding.get(s, 0) for s in candidates)
+            return random.choice([s for s in candidates if self.outstanding.get(s, 0) == fewest])
+
+class EWMALatencyStrategy(BalancingStrategy):
+    """
+    Escolhe o menor custo estimado: média móvel exponencial do tempo de
+    resposta multiplicada pelas pendentes + 1, para que um serviço rápido
+    não receba todo o tráfego até ficar lento. Serviços ainda sem medida são
+    experimentados primeiro. Parâmetro: `alpha` (peso da nova medida, 0.3).
+    """
+    name = "ewma"
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.alpha = float(params.get('alpha', 0.3))
+        self.latency: Dict[str, float] = {}
+
+    def observe(self, service: str, response_time: float):
+        with self._lock:
+            previous = self.latency.get(service)
+            if previous is None:
+                self.latency[service] = response_time
+            else:
+                self.latency[service] = previous + self.alpha * (response_time - previous)
+
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        with self._lock:
+            costs = {s: self.latency.get(s, 0.0) * (self.outstanding.get(s, 0) + 1) for s in candidates}
+        lowest = min(costs.values())
+        return random.choice([s for s in candidates if costs[s] == lowest])
+
+class PowerOfTwoChoicesStrategy(BalancingStrategy):
+    """
+    Sorteia dois serviços e fica com o que tem menos requisições pendentes:
+    quase o equilíbrio do least-outstanding, sem que todos os balanceadores
+    escolham o mesmo serviço ao mesmo tempo.
+    """
+    name = "power-of-two"
+
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        with self._lock:
+            if self.outstanding.get(second, 0) < self.outstanding.get(first, 0):
+                return second
+        return first
+
+class RendezvousHashStrategy(BalancingStrategy):
+    """
+    Afinidade de cache: cada payload (pelo hash do conteúdo, a mesma chave
+    do cache de resultados dos serviços) vai sempre para o serviço de maior
+    peso hash(chave, serviço) (rendezvous hashing). Quando um serviço sai ou
+    volta, só as chaves dele mudam de destino. Com carga limitada, um serviço
+    com pendentes acima de `load_factor` vezes a média (padrão 1.25) é
+    pulado em favor do próximo da ordem da chave, para que chaves muito
+    frequentes não sobrecarreguem um único serviço. Sem chave, usa o
+    serviço com menos pendentes.
+    """
+    name = "rendezvous-hash"
+    uses_key = True
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.load_factor = max(1.0, float(params.get('load_factor', 1.25)))
+        self.spillovers = 0
+
+    @staticmethod
+    def _weight(key: bytes, service: str) -> bytes:
+        return hashlib.blake2b(key, digest_size=8, key=service.encode()[-64:]).digest()
+
+    def rank(self, candidates: List[str], key: bytes) -> List[str]:
+        """Serviços na ordem de preferência da chave."""
+        return sorted(candidates, key=lambda s: self._weight(key, s), reverse=True)
+
+    def select(self, candidates: List[str], key: Optional[bytes] = None) -> str:
+        if key is None:
+            with self._lock:
+                return min(candidates, key=lambda s: self.outstanding.get(s, 0))
+        ranked = self.rank(candidates, key)
+        with self._lock:
+            total = sum(self.outstanding.get(s, 0) for s in candidates)
+            limit = math.ceil(self.load_factor * (total + 1) / len(candidates))
+            for service in ranked:
+                if self.outstanding.get(service, 0) < limit:
+                    if service != ranked[0]:
+                        self.spillovers += 1
+                    return service
+        return ranked[0]
+
+BALANCING_STRATEGIES: Dict[str, Type[BalancingStrategy]] = {
+    RoundRobinStrategy.name: RoundRobinStrategy,
+    WeightedRoundRobinStrategy.name: WeightedRoundRobinStrategy,
+    LeastOutstandingStrategy.name: LeastOutstandingStrategy,
+    EWMALatencyStrategy.name: EWMALatencyStrategy,
+    PowerOfTwoChoicesStrategy.name: PowerOfTwoChoicesStrategy,
+    RendezvousHashStrategy.name: RendezvousHashStrategy,
+}
+
+def create_strategy(algorithm: str = None, options: Dict[str, Any] = None) -> BalancingStrategy:
+    """
+    Cria o algoritmo de balanceamento pelo nome usado em `algorithm` na
+    configuração (por exemplo "round-robin" ou "power-of-two").
+    """
+    algorithm = algorithm or RoundRobinStrategy.name
+    if algorithm not in BALANCING_STRATEGIES:
+        raise ValueError(f"Algoritmo de balanceamento desconhecido: {algorithm} "
+                         f"(opções: {', '.join(BALANCING_STRATEGIES)})")
+    return BALANCING_STRATEGIES[algorithm](**(options or {}))
@@ -0,0 +1,127 @@
+import queue
+import threading
+import logging
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+import numpy as np
+from .preprocessing import thread_buffer
+
+logger = logging.getLogger(__name__)
+
+class InferenceBatcher:
+    """
+    Estágio de inferência em lote (micro-batching).
+
+    As threads de conexão extraem as features da imagem e as enfileiram;
+    uma thread dedicada agrupa as requisições concorrentes e as envia como
+    uma única matriz ao classificador quando o lote atinge `max_batch_size`
+    ou quando o item mais antigo espera `max_wait` segundos.
+    """
+
+    def __init__(self, classifier, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.classifier = classifier
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._worker = None
+        self.running = False
+
+        # Estatísticas
+        self.batch_count = 0
+        self.item_count = 0
+
+    def start(self):
+        """Inicia a thread de agrupamento."""
+        if self.running:
+            return
+        self.running = True
+        self._worker = threading.Thread(target=self._run, name="inference-batcher")
+        self._worker.daemon = True
+        self._worker.start()
+        logger.info(f"Batcher iniciado (lote máximo: {self.max_batch_size}, "
+                    f"espera máxima: {self.max_wait * 1000:.1f}ms)")
+
+    def stop(self):
+        """Para a thread de agrupamento e falha as requisições pendentes."""
+        self.running = False
+        self._queue.put(None)
+        if self._worker:
+            self._worker.join(timeout=5)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Batcher finalizado"))
+        logger.info("Batcher finalizado")
+
+    def submit(self, features: np.ndarray) -> Future:
+        """Enfileira um vetor de features e retorna um Future com (classe, confiança)."""
+        future = Future()
+        if not self.running:
+            future.set_exception(RuntimeError("Batcher não está em execução"))
+            return future
+        self._queue.put((features, future))
+        return future
+
+    def classify(self, image_data: bytes) -> Tuple[str, float]:
+        """Extrai as features na thread chamadora e aguarda o resultado do lote."""
+        # O buffer da thread pode ser reutilizado: a thread fica bloqueada até o
+        # lote ser copiado e classificado
+        features = self.classifier.extract_features(image_data, out=thread_buffer()[0])
+        return self.submit(features).result()
+
+    def classify_features(self, features: np.ndarray) -> Tuple[str, float]:
+        """Enfileira um vetor de features já extraído e aguarda o resultado do lote."""
+        return self.submit(features).result()
+
+    @property
+    def average_batch_size(self) -> float:
+        if self.batch_count == 0:
+            return 0.0
+        return self.item_count / self.batch_count
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future]]:
+        """Bloqueia até o primeiro item e agrupa os seguintes até o limite de tamanho ou tempo."""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            futures = [future for _, future in batch]
+            try:
+                features = np.stack([f for f, _ in batch])
+                results = self.classifier.predict_features(features)
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Erro ao classificar lote de {len(batch)} imagens: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batch_count += 1
+            self.item_count += len(batch)
@@ -0,0 +1,281 @@
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import logging
+import os
+import matplotlib.pyplot as plt
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _percentiles(values: Sequence[float]) -> Dict[str, float]:
+    values = np.array(values) if len(values) else np.zeros(1)
+    return {
+        "mean": float(np.mean(values)),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(np.max(values)),
+    }
+
+class CapacitySweep:
+    """
+    Varredura de capacidade: mede o MRT em uma grade de taxas de requisição
+    para cada número de serviços e encontra o joelho de saturação, a maior
+    taxa em que o sistema ainda acompanha a carga oferecida sem a latência
+    disparar.
+
+    Cada passo (taxa, número de serviços) roda em janelas de `window`
+    segundos, depois de `warmup` segundos descartados, até o MRT das últimas
+    `min_windows` janelas variar no máximo `tolerance` (relativo à média) ou
+    até `max_windows` janelas. Uma janela em que a taxa atingida fica abaixo
+    de `min_efficiency` da oferecida, ou com mais de `max_error_rate` de
+    erros e descartes, marca o passo como saturado; com `stop_at_saturation`
+    as taxas maiores são puladas para aquele número de serviços.
+
+    O joelho é a última taxa, em ordem crescente, que não saturou e cujo MRT
+    não passou de `knee_factor` vezes o MRT da menor taxa.
+    """
+
+    def __init__(self, rates: Sequence[float], services: Sequence[int], window: float = 5.0,
+                 warmup: float = 1.0, tolerance: float = 0.1, min_windows: int = 2, max_windows: int = 6,
+                 knee_factor: float = 2.0, min_efficiency: float = 0.95, max_error_rate: float = 0.01,
+                 stop_at_saturation: bool = True):
+        if not rates or not services:
+            raise ValueError("A varredura precisa de ao menos uma taxa e um número de serviços")
+        self.rates = sorted(float(rate) for rate in rates)
+        self.services = sorted(int(count) for count in services)
+        if self.services[0] < 2:
+            raise ValueError("São necessários ao menos 2 serviços (um por balanceador)")
+        self.window = window
+        self.warmup = warmup
+        self.tolerance = tolerance
+        self.min_windows = max(1, int(min_windows))
+        self.max_windows = max(self.min_windows, int(max_windows))
+        self.knee_factor = knee_factor
+        self.min_efficiency = min_efficiency
+        self.max_error_rate = max_error_rate
+        self.stop_at_saturation = stop_at_saturation
+        self.steps: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] = None, **overrides) -> "CapacitySweep":
+        """Cria a varredura a partir da seção `sweep` da configuração do Source (argumentos têm prioridade)."""
+        config = dict(config or {})
+        config.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(
+            config.get('rates', [5, 10, 20, 40, 80]),
+            config.get('services', [2, 4]),
+            window=config.get('window', 5.0),
+            warmup=config.get('warmup', 1.0),
+            tolerance=config.get('tolerance', 0.1),
+            min_windows=config.get('min_windows', 2),
+            max_windows=config.get('max_windows', 6),
+            knee_factor=config.get('knee_factor', 2.0),
+            min_efficiency=config.get('min_efficiency', 0.95),
+            max_error_rate=config.get('max_error_rate', 0.01),
+            stop_at_saturation=config.get('stop_at_saturation', True)
+        )
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "rates": self.rates,
+            "services": self.services,
+            "window": self.window,
+            "warmup": self.warmup,
+            "tolerance": self.tolerance,
+            "min_windows": self.min_windows,
+            "max_windows": self.max_windows,
+            "knee_factor": self.knee_factor,
+            "min_efficiency": self.min_efficiency,
+            "max_error_rate": self.max_error_rate,
+            "stop_at_saturation": self.stop_at_saturation,
+        }
+
+    def _saturated(self, stats: Dict[str, Any]) -> bool:
+        if stats['achieved_rate'] < self.min_efficiency * stats['offered_rate']:
+            return True
+        failed = stats['errors'] + stats['dropped']
+        return stats['offered'] > 0 and failed / stats['offered'] > self.max_error_rate
+
+    def _stable(self, windows: List[Dict[str, Any]]) -> bool:
+        means = [w['latency']['mean'] for w in windows[-self.min_windows:]]
+        center = np.mean(means)
+        return center > 0 and (max(means) - min(means)) / center <= self.tolerance
+
+    def measure_step(self, source, services: int, rate: float) -> Dict[str, Any]:
+        """
+        Mede um passo da varredura. `source` é um Source (measure(rate,
+        duration) e load_generator) já configurado com `services` serviços.
+        """
+        if self.warmup > 0:
+            source.measure(rate, self.warmup)
+        windows, latencies, service_times, chain = [], [], [], []
+        stable = saturated = False
+        while len(windows) < self.max_windows:
+            stats = source.measure(rate, self.window)
+            windows.append(stats)
+            latencies.extend(source.load_generator.latencies)
+            service_times.extend(source.load_generator.service_times)
+            if stats.get('mrt') is not None:
+                chain.append((stats['mrt'], stats['completed']))
+            logger.info(f"{services} serviços, {rate:g} req/s, janela {len(windows)}: "
+                        f"{source.load_generator.summary()}")
+            if self._saturated(stats):
+                saturated = True
+                break
+            if len(windows) >= self.min_windows and self._stable(windows):
+                stable = True
+                break
+
+        offered = sum(w['offered'] for w in windows)
+        completed = sum(w['completed'] for w in windows)
+        step = {
+            "services": services,
+            "rate": rate,
+            "windows": len(windows),
+            "stable": stable,
+            "saturated": saturated,
+            "offered": offered,
+            "completed": completed,
+            "errors": sum(w['errors'] for w in windows),
+            "dropped": sum(w['dropped'] for w in windows),
+            "offered_rate": float(np.mean([w['offered_rate'] for w in windows])),
+            "achieved_rate": float(np.mean([w['achieved_rate'] for w in windows])),
+            # MRT desde a chegada prevista (inclui a espera por um worker do gerador)
+            "mrt": float(np.mean(latencies)) if latencies else None,
+            # MRT medido pelo Source sobre a cadeia (t5_total), como em generate_graphs
+            "chain_mrt": (float(sum(m * n for m, n in chain) / sum(n for _, n in chain))
+                          if chain and sum(n for _, n in chain) else None),
+            "latency": _percentiles(latencies),
+            "service_time": _percentiles(service_times),
+            "window_mrt": [w['latency']['mean'] for w in windows],
+        }
+        self.steps.append(step)
+        logger.info(f"Passo {services} serviços x {rate:g} req/s: MRT {(step['mrt'] or 0) * 1000:.1f}ms, "
+                    f"p99 {step['latency']['p99'] * 1000:.1f}ms, atingida {step['achieved_rate']:.1f} req/s "
+                    f"({'saturado' if saturated else 'estável' if stable else 'não estabilizou'}, "
+                    f"{len(windows)} janelas)")
+        return step
+
+    def run(self, source, services: int) -> List[Dict[str, Any]]:
+        """Percorre as taxas, em ordem crescente, para um número de serviços."""
+        steps = []
+        for rate in self.rates:
+            step = self.measure_step(source, services, rate)
+            steps.append(step)
+            if step['saturated'] and self.stop_at_saturation:
+                logger.info(f"{services} serviços saturaram em {rate:g} req/s; taxas maiores puladas")
+                break
+        return steps
+
+    def find_knee(self, steps: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Joelho de saturação de um número de serviços (ver a descrição da classe)."""
+        steps = sorted((s for s in steps if s['mrt'] is not None), key=lambda s: s['rate'])
+        if not steps:
+            return None
+        baseline = steps[0]['mrt']
+        knee, limit = None, None
+        for step in steps:
+            if step['saturated'] or step['mrt'] > self.knee_factor * baseline:
+                limit = step
+                break
+            knee = step
+        return {
+            "services": steps[0]['services'],
+            "baseline_mrt": baseline,
+            "knee_rate": knee['rate'] if knee else None,
+            "knee_mrt": knee['mrt'] if knee else None,
+            "knee_achieved_rate": knee['achieved_rate'] if knee else None,
+            # Primeira taxa acima do joelho (None se nenhuma taxa da grade saturou)
+            "limit_rate": limit['rate'] if limit else None,
+            "max_achieved_rate": max(s['achieved_rate'] for s in steps),
+        }
+
+    def knees(self) -> List[Dict[str, Any]]:
+        knees = []
+        for count in self.services:
+            knee = self.find_knee([s for s in self.steps if s['services'] == count])
+            if knee is not None:
+                knees.append(knee)
+        return knees
+
+    def results(self) -> Dict[str, Any]:
+        return {"settings": self.settings(), "steps": self.steps, "knees": self.knees()}
+
+    def save(self, output_dir: str) -> str:
+        """Grava os resultados (JSON) e os gráficos em `output_dir`; retorna o caminho do JSON."""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, 'capacity_results.json')
+        with open(path, 'w') as f:
+            json.dump(self.results(), f, indent=2)
+        self.plot(output_dir)
+        return path
+
+    def plot(self, output_dir: str):
+        """Gera mrt_vs_rate.png e mrt_vs_services.png a partir dos passos medidos."""
+        knees = {knee['services']: knee for knee in self.knees()}
+
+        # Gráfico 1: MRT vs. taxa, uma curva por número de serviços, com o joelho marcado
+        plt.figure(figsize=(10, 6))
+        for count in self.services:
+            steps = sorted((s for s in self.steps if s['services'] == count and s['mrt'] is not None),
+                           key=lambda s: s['rate'])
+            if not steps:
+                continue
+            line, = plt.plot([s['rate'] for s in steps], [s['mrt'] * 1000 for s in steps], 'o-',
+                             label=f'{count} serviços')
+            saturated = [s for s in steps if s['saturated']]
+            if saturated:
+                plt.plot([s['rate'] for s in saturated], [s['mrt'] * 1000 for s in saturated], 'x',
+                         color=line.get_color(), markersize=10)
+            knee = knees.get(count)
+            if knee and knee['knee_rate'] is not None:
+                plt.axvline(knee['knee_rate'], color=line.get_color(), linestyle='--', alpha=0.5)
+        plt.xlabel('Taxa de requisições oferecida (req/s)')
+        plt.ylabel('MRT (ms)')
+        plt.yscale('log')
+        plt.title('MRT vs. Taxa de Requisições (x: saturado, tracejado: joelho)')
+        plt.legend()
+        plt.grid(True, which='both')
+        plt.savefig(os.path.join(output_dir, 'mrt_vs_rate.png'))
+        plt.close()
+
+        # Gráfico 2: MRT vs. número de serviços para cada taxa e capacidade (joelho) vs. serviços
+        fig, (left, right) = plt.subplots(1, 2, figsize=(14, 6))
+        for rate in self.rates:
+            steps = sorted((s for s in self.steps if s['rate'] == rate and s['mrt'] is not None),
+                           key=lambda s: s['services'])
+            if steps:
+                left.plot([s['services'] for s in steps], [s['mrt'] * 1000 for s in steps], 'o-',
+                          label=f'{rate:g} req/s')
+        left.set_xlabel('Número de Serviços')
+        left.set_ylabel('MRT (ms)')
+        left.set_yscale('log')
+        left.set_title('Tempo Médio de Resposta (MRT) vs. Número de Serviços')
+        left.set_xticks(self.services)
+        left.legend()
+        left.grid(True, which='both')
+        counts = [count for count in self.services if count in knees]
+        right.plot(counts, [knees[c]['knee_rate'] or 0 for c in counts], 'o-', label='Joelho (req/s)')
+        right.plot(counts, [knees[c]['max_achieved_rate'] for c in counts], 's--', label='Máxima atingida (req/s)')
+        right.set_xlabel('Número de Serviços')
+        right.set_ylabel('Taxa (req/s)')
+        right.set_title('Capacidade vs. Número de Serviços')
+        right.set_xticks(self.services)
+        right.legend()
+        right.grid(True)
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, 'mrt_vs_services.png'))
+        plt.close(fig)
+
+    def summary(self) -> str:
+        lines = [f"{'serviços':>9}{'joelho (req/s)':>16}{'MRT base (ms)':>15}{'MRT joelho (ms)':>17}"
+                 f"{'máx. atingida':>15}"]
+        for knee in self.knees():
+            knee_rate = f"{knee['knee_rate']:g}" if knee['knee_rate'] is not None else "-"
+            if knee['knee_rate'] is not None and knee['limit_rate'] is None:
+                knee_rate = f">={knee_rate}"
+            knee_mrt = f"{knee['knee_mrt'] * 1000:.1f}" if knee['knee_mrt'] is not None else "-"
+            lines.append(f"{knee['services']:>9}{knee_rate:>16}{knee['baseline_mrt'] * 1000:>15.1f}"
+                         f"{knee_mrt:>17}{knee['max_achieved_rate']:>15.1f}")
+        return "\n".join(lines)
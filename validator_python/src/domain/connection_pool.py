@@ -0,0 +1,248 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão do pool ficou livre dentro do tempo limite."""
+    pass
+
+class _PooledConnection:
+    __slots__ = ('connection', 'leases', 'idle_since')
+
+    def __init__(self, connection: Any, leases: int = 0):
+        self.connection = connection
+        self.leases = leases
+        self.idle_since = time.monotonic()
+
+class ConnectionPool:
+    """
+    Pool de conexões persistentes com um serviço, usado pelo balanceador
+    (BackendConnection) e pelo Source (ServiceClient).
+
+    As conexões são multiplexadas (protocolo v2), então cada uma pode ser
+    emprestada a até `max_streams` requisições ao mesmo tempo. acquire()
+    reutiliza a conexão válida menos ocupada; se todas estiverem cheias, abre
+    uma nova (até `max_size`) ou espera até `acquire_timeout` segundos por
+    uma vaga. Conexões fechadas são descartadas na retirada e na devolução, e
+    as ociosas há mais de `idle_timeout` segundos são fechadas (verificado no
+    máximo uma vez por segundo, nas retiradas), mantendo pelo menos
+    `min_size` abertas.
+
+    `factory` cria uma conexão já conectada; as conexões precisam ter a
+    propriedade `connected` e o método `close()`.
+    """
+
+    def __init__(self, factory: Callable[[], Any], min_size: int = 1, max_size: int = 4,
+                 max_streams: int = 32, idle_timeout: float = 60.0, acquire_timeout: float = 5.0,
+                 name: str = "pool"):
+        self.factory = factory
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.max_streams = max(1, int(max_streams))
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+        self._entries: Dict[int, _PooledConnection] = {}
+        self._creating = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._next_sweep = 0.0
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+
+        # Métricas
+        self.acquires = 0
+        self.creates = 0
+        self.reuses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.invalidated = 0
+        self.evicted = 0
+        self.peak_in_use = 0
+
+    @classmethod
+    def from_config(cls, factory: Callable[[], Any], config: Dict[str, Any] = None,
+                    name: str = "pool") -> "ConnectionPool":
+        config = config or {}
+        return cls(
+            factory,
+            min_size=config.get('min_size', 1),
+            max_size=config.get('max_size', 4),
+            max_streams=config.get('max_streams', 32),
+            idle_timeout=config.get('idle_timeout', 60.0),
+            acquire_timeout=config.get('acquire_timeout', 5.0),
+            name=name
+        )
+
+    def acquire(self) -> Any:
+        """Empresta uma conexão (devolver com release). Lança PoolTimeoutError se o pool continuar cheio."""
+        wait_start = None
+        to_close: List[Any] = []
+        try:
+            with self._cond:
+                self.acquires += 1
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError(f"Pool {self.name} fechado")
+                    now = time.monotonic()
+                    entry = self._least_loaded(to_close)
+                    if entry is not None and entry.leases < self.max_streams:
+                        entry.leases += 1
+                        self.reuses += 1
+                        self._record_use(now, wait_start)
+                        break
+                    if len(self._entries) + self._creating < self.max_size:
+                        entry = None
+                        self._creating += 1
+                        self._record_use(now, wait_start)
+                        break
+                    if wait_start is None:
+                        wait_start = now
+                        self.waits += 1
+                    remaining = wait_start + self.acquire_timeout - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        self.wait_time += now - wait_start
+                        raise PoolTimeoutError(f"Pool {self.name} saturado: {self.max_size} conexões x "
+                                               f"{self.max_streams} requisições em uso")
+                    self._waiting += 1
+                    self._cond.wait(remaining)
+                    self._waiting -= 1
+                if now >= self._next_sweep:
+                    to_close.extend(self._evict_idle(now))
+        finally:
+            self._close_all(to_close)
+        if entry is not None:
+            return entry.connection
+
+        # Abre a nova conexão fora do lock
+        try:
+            connection = self.factory()
+        except Exception:
+            with self._cond:
+                self._creating -= 1
+                self._in_use -= 1
+                if self._waiting:
+                    self._cond.notify()
+            raise
+        with self._cond:
+            self._creating -= 1
+            self.creates += 1
+            self._entries[id(connection)] = _PooledConnection(connection, leases=1)
+        return connection
+
+    def release(self, connection: Any):
+        """Devolve uma conexão emprestada por acquire()."""
+        to_close: List[Any] = []
+        with self._cond:
+            entry = self._entries.get(id(connection))
+            if entry is None or entry.connection is not connection:
+                return  # Já descartada (fechou durante o uso)
+            entry.leases -= 1
+            self._in_use -= 1
+            if entry.leases == 0:
+                entry.idle_since = time.monotonic()
+            if not connection.connected:
+                self._discard(id(connection), to_close)
+                self.invalidated += 1
+            if self._waiting:
+                self._cond.notify()
+        self._close_all(to_close)
+
+    def warm(self):
+        """Abre conexões até `min_size` (falhas apenas registradas: o serviço pode ainda não estar no ar)."""
+        while True:
+            with self._cond:
+                if self._closed or len(self._entries) + self._creating >= self.min_size:
+                    return
+                self._creating += 1
+            try:
+                connection = self.factory()
+            except Exception as e:
+                with self._cond:
+                    self._creating -= 1
+                logger.info(f"Pool {self.name}: falha ao abrir conexão inicial: {str(e)}")
+                return
+            with self._cond:
+                self._creating -= 1
+                self.creates += 1
+                self._entries[id(connection)] = _PooledConnection(connection)
+                if self._waiting:
+                    self._cond.notify()
+
+    def _least_loaded(self, to_close: List[Any]) -> Optional[_PooledConnection]:
+        """Conexão válida com menos empréstimos; as fechadas são descartadas (validação na retirada)."""
+        best = None
+        for key, entry in list(self._entries.items()):
+            if not entry.connection.connected:
+                self._discard(key, to_close)
+                self.invalidated += 1
+            elif best is None or entry.leases < best.leases:
+                best = entry
+        return best
+
+    def _discard(self, key: int, to_close: List[Any]):
+        entry = self._entries.pop(key)
+        self._in_use -= entry.leases
+        to_close.append(entry.connection)
+
+    def _record_use(self, now: float, wait_start: Optional[float]):
+        """Atualiza as métricas de um empréstimo concedido (chamado com o lock)."""
+        if wait_start is not None:
+            self.wait_time += now - wait_start
+        self._in_use += 1
+        if self._in_use > self.peak_in_use:
+            self.peak_in_use = self._in_use
+
+    def _evict_idle(self, now: float) -> List[Any]:
+        """Fecha as conexões ociosas há mais de `idle_timeout`, mantendo `min_size` (chamado com o lock)."""
+        self._next_sweep = now + min(self.idle_timeout, 1.0)
+        removed: List[Any] = []
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].idle_since):
+            if len(self._entries) <= self.min_size:
+                break
+            if entry.leases == 0 and now - entry.idle_since > self.idle_timeout:
+                self._discard(key, removed)
+                self.evicted += 1
+        return removed
+
+    @staticmethod
+    def _close_all(connections: List[Any]):
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar conexão: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas do pool; `saturation` é a fração das retiradas que precisaram esperar."""
+        with self._cond:
+            return {
+                "size": len(self._entries),
+                "idle": sum(1 for e in self._entries.values() if e.leases == 0),
+                "in_use": self._in_use,
+                "peak_in_use": self.peak_in_use,
+                "capacity": self.max_size * self.max_streams,
+                "acquires": self.acquires,
+                "creates": self.creates,
+                "reuses": self.reuses,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "timeouts": self.timeouts,
+                "invalidated": self.invalidated,
+                "evicted": self.evicted,
+                "saturation": self.waits / self.acquires if self.acquires else 0.0,
+            }
+
+    def close(self):
+        """Fecha todas as conexões; retiradas posteriores falham."""
+        with self._cond:
+            self._closed = True
+            connections = [e.connection for e in self._entries.values()]
+            self._entries.clear()
+            self._cond.notify_all()
+        self._close_all(connections)
@@ -0,0 +1,84 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+from .preprocessing import FEATURE_LENGTH, PREPROCESSING_VERSION
+
+logger = logging.getLogger(__name__)
+
+# (mtime em ns, tamanho em bytes) identifica a versão de um arquivo
+FileStamp = Tuple[int, int]
+
+class FeatureStore:
+    """
+    Cache em disco das features extraídas das imagens de treinamento.
+
+    Cada arquivo é identificado por caminho + mtime + tamanho; se qualquer um
+    mudar, as features são recalculadas. O diretório contém `features.npy`
+    (matriz uint8, uma linha por imagem, aberta com mmap) e `index.json`
+    (caminho -> linha). Mudanças em PREPROCESSING_VERSION invalidam o cache.
+    """
+
+    def __init__(self, path: str = "feature_cache"):
+        self.path = path
+        self.matrix_path = os.path.join(path, "features.npy")
+        self.index_path = os.path.join(path, "index.json")
+        self._index: Dict[str, dict] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self.load()
+
+    @staticmethod
+    def stamp(file_path: str) -> FileStamp:
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """Carrega o índice e mapeia a matriz de features, se existirem."""
+        self._index, self._matrix = {}, None
+        if not (os.path.exists(self.index_path) and os.path.exists(self.matrix_path)):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('preprocessing_version') != PREPROCESSING_VERSION:
+                logger.info("Versão do pré-processamento mudou, cache de features descartado")
+                return
+            self._matrix = np.load(self.matrix_path, mmap_mode='r')
+            self._index = data['files']
+            logger.info(f"Cache de features carregado: {len(self._index)} imagens")
+        except Exception as e:
+            logger.warning(f"Cache de features inválido, será recriado: {str(e)}")
+            self._index, self._matrix = {}, None
+
+    def lookup(self, file_path: str, stamp: FileStamp) -> Optional[np.ndarray]:
+        """Retorna as features armazenadas se o arquivo não mudou desde a extração."""
+        entry = self._index.get(os.path.abspath(file_path))
+        if entry is None or self._matrix is None:
+            return None
+        if (entry['mtime_ns'], entry['size']) != tuple(stamp):
+            return None
+        return self._matrix[entry['row']]
+
+    def save(self, paths, stamps, X: np.ndarray):
+        """
+        Regrava o cache com exatamente as imagens do treinamento atual
+        (entradas de arquivos removidos são descartadas).
+        """
+        os.makedirs(self.path, exist_ok=True)
+        files = {
+            os.path.abspath(p): {'mtime_ns': s[0], 'size': s[1], 'row': row}
+            for row, (p, s) in enumerate(zip(paths, stamps))
+        }
+        # Escreve em arquivos temporários e troca atomicamente
+        suffix = f"{os.getpid()}-{threading.get_ident()}"
+        tmp_matrix = f"{self.matrix_path}.tmp-{suffix}.npy"
+        tmp_index = f"{self.index_path}.tmp-{suffix}"
+        np.save(tmp_matrix, np.ascontiguousarray(X, dtype=np.uint8).reshape(-1, FEATURE_LENGTH))
+        with open(tmp_index, 'w') as f:
+            json.dump({'preprocessing_version': PREPROCESSING_VERSION, 'files': files}, f)
+        self._matrix = None
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_index, self.index_path)
+        self.load()
@@ -0,0 +1,110 @@
+"""
+Camada de E/S enquadrada usada por Service, Source (ServiceClient) e NetworkManager.
+
+- A recepção pré-aloca um bytearray do tamanho anunciado e preenche com
+  recv_into através de um memoryview, sem concatenações (custo linear no
+  tamanho do payload, em vez de quadrático).
+- O envio junta cabeçalho e payload em uma única chamada sendmsg
+  (scatter-gather, até IOV_MAX buffers por chamada), sem copiar o payload e
+  sem dois segmentos separados que interagem mal com o algoritmo de Nagle.
+- configure_socket ativa TCP_NODELAY, pois as mensagens são pequenas e
+  sensíveis a latência.
+"""
+import os
+import socket
+from typing import Optional, Sequence
+from .protocol import FRAME_HEADER, LENGTH_PREFIX, MAX_FRAME_SIZE as MAX_PAYLOAD_SIZE, Frame
+
+def _iov_max() -> int:
+    try:
+        value = os.sysconf('SC_IOV_MAX')
+    except (AttributeError, ValueError, OSError):
+        value = -1
+    return value if value > 0 else 1024
+
+# Limite de buffers por chamada sendmsg
+IOV_MAX = _iov_max()
+
+def configure_socket(sock: socket.socket) -> socket.socket:
+    """Aplica as opções padrão dos sockets do sistema (TCP_NODELAY)."""
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+    return sock
+
+def recv_into_buffer(sock: socket.socket, buffer) -> None:
+    """Preenche `buffer` (bytearray ou memoryview gravável) por completo com recv_into."""
+    view = memoryview(buffer).cast('B')
+    received = 0
+    while received < len(view):
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError(f"Conexão fechada após {received} de {len(view)} bytes")
+        received += n
+
+def recv_exact(sock: socket.socket, size: int) -> bytearray:
+    """Recebe exatamente `size` bytes em um buffer pré-alocado."""
+    if size > MAX_PAYLOAD_SIZE:
+        raise ValueError(f"Payload de {size} bytes excede o limite de {MAX_PAYLOAD_SIZE} bytes")
+    buffer = bytearray(size)
+    recv_into_buffer(sock, buffer)
+    return buffer
+
+def recv_header(sock: socket.socket, size: int) -> Optional[bytearray]:
+    """Recebe um cabeçalho; retorna None se a conexão fechou antes do primeiro byte."""
+    header = bytearray(size)
+    view = memoryview(header)
+    n = sock.recv_into(view)
+    if n == 0:
+        return None
+    if n < size:
+        recv_into_buffer(sock, view[n:])
+    return header
+
+def send_parts(sock: socket.socket, parts: Sequence) -> None:
+    """
+    Envia os buffers em sequência com sendmsg (scatter-gather), tratando envios
+    parciais. Cada chamada leva no máximo IOV_MAX buffers (um lote grande tem
+    dois por item).
+    """
+    views = [v for v in (memoryview(p).cast('B') for p in parts) if len(v)]
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(views))
+        return
+    start = 0
+    while start < len(views):
+        sent = sock.sendmsg(views[start:start + IOV_MAX])
+        while start < len(views) and sent >= len(views[start]):
+            sent -= len(views[start])
+            start += 1
+        if sent:
+            views[start] = views[start][sent:]
+
+def send_message(sock: socket.socket, payload) -> None:
+    """Envia uma mensagem v1: [8 bytes de tamanho][payload]."""
+    send_parts(sock, (len(payload).to_bytes(LENGTH_PREFIX, 'big'), payload))
+
+def recv_message(sock: socket.socket) -> Optional[bytearray]:
+    """Recebe uma mensagem v1. Retorna None se a conexão foi fechada entre mensagens."""
+    header = recv_header(sock, LENGTH_PREFIX)
+    if header is None:
+        return None
+    return recv_exact(sock, int.from_bytes(header, 'big'))
+
+def send_frame(sock: socket.socket, request_id: int, frame_type: int, payload, flags: int = 0) -> None:
+    """
+    Envia um frame v2 (cabeçalho + payload em uma única chamada). O payload
+    pode ser um buffer ou uma lista de buffers enviados em sequência.
+    """
+    parts = payload if isinstance(payload, list) else [payload]
+    length = sum(memoryview(p).nbytes for p in parts)
+    send_parts(sock, [FRAME_HEADER.pack(request_id, frame_type, flags, length)] + parts)
+
+def recv_frame(sock: socket.socket) -> Optional[Frame]:
+    """Recebe um frame v2. Retorna None se a conexão foi fechada entre frames."""
+    header = recv_header(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    request_id, frame_type, flags, length = FRAME_HEADER.unpack(header)
+    return request_id, frame_type, flags, recv_exact(sock, length)
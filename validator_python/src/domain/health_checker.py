@@ -0,0 +1,163 @@
+import logging
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
+from .protocol import HELLO
+from .framing import configure_socket, recv_exact
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class BackendHealth:
+    """Estado de saúde de um serviço em um instante (imutável)."""
+    available: bool = True
+    consecutive_failures: int = 0
+    consecutive_successes: int = 0
+    last_check: float = 0.0
+    response_time: float = float('inf')
+    last_error: Optional[str] = None
+
+class HealthChecker:
+    """
+    Verificação de saúde dos serviços em segundo plano.
+
+    Uma thread por serviço faz a sonda (conexão + handshake do protocolo v2)
+    a cada `interval` segundos, com variação aleatória de ±`jitter` (fração
+    do intervalo) para que as sondas de vários balanceadores não coincidam.
+    Um serviço fica indisponível após `unhealthy_threshold` falhas seguidas
+    e volta após `healthy_threshold` sucessos seguidos. Falhas e sucessos
+    observados nas requisições reais também contam.
+
+    O estado é publicado como um snapshot imutável, substituído por inteiro
+    a cada mudança: o caminho de seleção apenas lê `snapshot`, sem locks nem E/S.
+    """
+
+    def __init__(self, services: List[str], interval: float = 5.0, jitter: float = 0.2,
+                 timeout: float = 1.0, unhealthy_threshold: int = 3, healthy_threshold: int = 2,
+                 name: str = "health"):
+        self.services = list(services)
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.unhealthy_threshold = max(1, int(unhealthy_threshold))
+        self.healthy_threshold = max(1, int(healthy_threshold))
+        self.name = name
+        self.snapshot: Mapping[str, BackendHealth] = MappingProxyType(
+            {service: BackendHealth() for service in self.services}
+        )
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def from_config(cls, services: List[str], config: Dict[str, Any] = None, name: str = "health") -> "HealthChecker":
+        config = config or {}
+        return cls(
+            services,
+            interval=config.get('interval', 5.0),
+            jitter=config.get('jitter', 0.2),
+            timeout=config.get('timeout', 1.0),
+            unhealthy_threshold=config.get('unhealthy_threshold', 3),
+            healthy_threshold=config.get('healthy_threshold', 2),
+            name=name
+        )
+
+    def start(self):
+        """Inicia as sondas (uma thread por serviço)."""
+        if self._threads:
+            return
+        for service in self.services:
+            thread = threading.Thread(target=self._run, args=(service,), name=f"{self.name}-{service}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Verificação de saúde iniciada ({len(self.services)} serviços, "
+                    f"intervalo {self.interval}s ±{self.jitter * 100:.0f}%)")
+
+    def stop(self):
+        self._stopped.set()
+
+    def available_services(self) -> List[str]:
+        """Serviços disponíveis no snapshot atual (leitura sem lock)."""
+        snapshot = self.snapshot
+        return [service for service in self.services if snapshot[service].available]
+
+    def probe(self, service: str) -> float:
+        """Sonda o serviço (conexão + HELLO do protocolo v2) e retorna o tempo gasto."""
+        host, port = service.split(':')
+        start_time = time.time()
+        with configure_socket(socket.create_connection((host, int(port)), timeout=self.timeout)) as sock:
+            sock.sendall(HELLO)
+            if recv_exact(sock, len(HELLO)) != HELLO:
+                raise ConnectionError("Resposta de handshake inválida")
+        return time.time() - start_time
+
+    def check(self, service: str) -> bool:
+        """Executa uma sonda imediatamente e registra o resultado."""
+        try:
+            response_time = self.probe(service)
+        except Exception as e:
+            self.report_failure(service, str(e))
+            return False
+        self.report_success(service, response_time)
+        return True
+
+    def report_success(self, service: str, response_time: float = None):
+        """Registra um sucesso (sonda ou requisição real)."""
+        current = self.snapshot.get(service)
+        if current is None:
+            return
+        # Caminho comum (serviço saudável) sem escrita: só publica se algo relevante mudar
+        if current.available and current.consecutive_failures == 0 and response_time is None:
+            return
+        with self._write_lock:
+            current = self.snapshot[service]
+            successes = current.consecutive_successes + 1
+            available = current.available or successes >= self.healthy_threshold
+            if available and not current.available:
+                logger.info(f"Serviço {service} disponível novamente")
+            self._publish(service, replace(
+                current,
+                available=available,
+                consecutive_failures=0,
+                consecutive_successes=successes,
+                last_check=time.time(),
+                response_time=current.response_time if response_time is None else response_time,
+                last_error=None
+            ))
+
+    def report_failure(self, service: str, error: str = None):
+        """Registra uma falha (sonda ou requisição real)."""
+        with self._write_lock:
+            current = self.snapshot.get(service)
+            if current is None:
+                return
+            failures = current.consecutive_failures + 1
+            available = current.available and failures < self.unhealthy_threshold
+            if current.available and not available:
+                logger.warning(f"Serviço {service} marcado como indisponível após {failures} falhas: {error}")
+            self._publish(service, replace(
+                current,
+                available=available,
+                consecutive_failures=failures,
+                consecutive_successes=0,
+                last_check=time.time(),
+                last_error=error
+            ))
+
+    def _publish(self, service: str, health: BackendHealth):
+        """Substitui o snapshot por uma cópia com o novo estado do serviço (chamado com _write_lock)."""
+        states = dict(self.snapshot)
+        states[service] = health
+        self.snapshot = MappingProxyType(states)
+
+    def _run(self, service: str):
+        # Primeira sonda logo no início, em instantes espalhados entre os serviços
+        delay = random.uniform(0, self.interval * self.jitter)
+        while not self._stopped.wait(delay):
+            self.check(service)
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
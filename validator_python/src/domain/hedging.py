@@ -0,0 +1,279 @@
+import heapq
+import itertools
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait as futures_wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class RetryBudget:
+    """
+    Orçamento de tentativas extras (token bucket), compartilhado por
+    duplicatas (hedging) e novas tentativas após erro.
+
+    Cada requisição original deposita `ratio` fichas (0.1: no máximo cerca de
+    10% de requisições extras) e, para tráfego baixo, o saldo também cresce
+    `min_per_second` fichas por segundo; cada tentativa extra gasta uma
+    ficha. O saldo é limitado a `max_tokens`, de modo que, com os serviços
+    sobrecarregados e todas as requisições falhando, as tentativas extras
+    não multiplicam a carga.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.spent = 0
+        self.denied = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] = None) -> "RetryBudget":
+        config = config or {}
+        return cls(
+            ratio=config.get('ratio', 0.1),
+            min_per_second=config.get('min_per_second', 1.0),
+            max_tokens=config.get('max_tokens', 10.0)
+        )
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        """Registra uma requisição original (deposita `ratio` fichas)."""
+        with self._lock:
+            self.requests += 1
+            self._refill()
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Gasta uma ficha para uma tentativa extra; False se o orçamento acabou."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+class HedgePolicy:
+    """
+    Quando duplicar uma requisição lenta (hedging) e quantas vezes tentar de
+    novo após um erro.
+
+    A duplicata é enviada a outro serviço quando a requisição passa do
+    percentil `percentile` das latências recentes (janela de `window`
+    amostras; antes de `min_samples` amostras usa `initial_delay` segundos).
+    A primeira resposta vence e a outra cópia é cancelada. Após um erro, são
+    feitas até `max_retries` novas tentativas em outro serviço. Duplicatas e
+    novas tentativas gastam fichas do mesmo RetryBudget.
+    """
+
+    def __init__(self, percentile: float = 95.0, window: int = 1000, min_samples: int = 20,
+                 initial_delay: float = 0.05, min_delay: float = 0.001, max_retries: int = 1,
+                 budget: RetryBudget = None):
+        self.percentile = percentile
+        self.min_samples = max(1, int(min_samples))
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_retries = max(0, int(max_retries))
+        self.budget = budget or RetryBudget()
+        self._samples = deque(maxlen=max(self.min_samples, int(window)))
+        # O percentil é recalculado a cada 10% da janela, não a cada amostra
+        self._recompute_every = max(1, self._samples.maxlen // 10)
+        self._since_recompute = 0
+        self._delay = initial_delay
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.retried = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] = None) -> Optional["HedgePolicy"]:
+        """Cria a política a partir da seção `hedging` da configuração; None se desativada."""
+        config = config or {}
+        if not config.get('enabled', False):
+            return None
+        return cls(
+            percentile=config.get('percentile', 95.0),
+            window=config.get('window', 1000),
+            min_samples=config.get('min_samples', 20),
+            initial_delay=config.get('initial_delay', 0.05),
+            min_delay=config.get('min_delay', 0.001),
+            max_retries=config.get('max_retries', 1),
+            budget=RetryBudget.from_config(config.get('retry_budget'))
+        )
+
+    def delay(self) -> float:
+        """Tempo de espera antes de enviar a duplicata."""
+        return self._delay
+
+    def record(self, latency: float):
+        """Registra a latência de uma requisição concluída (atualiza o percentil periodicamente)."""
+        with self._lock:
+            self._samples.append(latency)
+            self._since_recompute += 1
+            if len(self._samples) < self.min_samples or self._since_recompute < self._recompute_every:
+                return
+            self._since_recompute = 0
+            samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+        self._delay = max(self.min_delay, float(np.percentile(samples, self.percentile)))
+
+    def count(self, event: str):
+        """Conta um evento: "hedged", "hedge_wins" ou "retried"."""
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.budget.requests
+        return {
+            "requests": requests,
+            "hedge_delay": self._delay,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "retried": self.retried,
+            "denied": self.budget.denied,
+            "extra_load": (self.hedged + self.retried) / requests if requests else 0.0,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (f"{stats['hedged']} duplicatas ({stats['hedge_wins']} venceram), {stats['retried']} novas "
+                f"tentativas, {stats['denied']} negadas pelo orçamento, carga extra "
+                f"{stats['extra_load'] * 100:.1f}%, espera para duplicar {stats['hedge_delay'] * 1000:.1f}ms")
+
+# Uma tentativa de hedged_call: o Future da resposta e a função chamada ao
+# final (cancela a cópia ainda pendente e devolve a conexão ao pool)
+Attempt = Tuple[Future, Callable[[], None]]
+
+def hedged_call(policy: HedgePolicy, submit: Callable[[bool], Attempt], timeout: float) -> Any:
+    """
+    Executa uma requisição com duplicata e novas tentativas segundo `policy`.
+    `submit(hedge)` envia uma tentativa (a um serviço ainda não usado, se
+    houver) e retorna (future, finalizar). Retorna o resultado da primeira
+    tentativa bem-sucedida; lança o último erro ou socket.timeout.
+    """
+    policy.budget.record_request()
+    start = time.monotonic()
+    deadline = start + timeout
+    hedge_at = start + policy.delay()
+    attempts: List[Tuple[Future, Callable[[], None], bool]] = []
+    retries = policy.max_retries
+    hedge_pending = True
+    last_error: Optional[BaseException] = None
+
+    def launch(hedge: bool):
+        try:
+            future, finish = submit(hedge)
+        except Exception as e:
+            # Falha ao enviar (sem conexão, pool cheio): conta como tentativa com erro
+            future, finish = Future(), lambda: None
+            future.set_exception(e)
+        attempts.append((future, finish, hedge))
+
+    launch(False)
+    try:
+        while True:
+            for future, _, hedge in attempts:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    policy.record(time.monotonic() - start)
+                    if hedge:
+                        policy.count('hedge_wins')
+                    return future.result()
+            pending = [future for future, _, _ in attempts if not future.done()]
+            if not pending:
+                last_error = next(f.exception() for f, _, _ in reversed(attempts) if not f.cancelled())
+                if retries > 0 and time.monotonic() < deadline and policy.budget.try_spend():
+                    retries -= 1
+                    policy.count('retried')
+                    launch(False)
+                    continue
+                raise last_error
+            now = time.monotonic()
+            if now >= deadline:
+                raise socket.timeout(f"Sem resposta em {timeout}s")
+            if hedge_pending and now >= hedge_at:
+                hedge_pending = False
+                if policy.budget.try_spend():
+                    policy.count('hedged')
+                    launch(True)
+                continue
+            wait_until = min(hedge_at, deadline) if hedge_pending else deadline
+            futures_wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+    finally:
+        for _, finish, _ in attempts:
+            finish()
+
+class HedgeTimer:
+    """
+    Agenda as duplicatas do balanceador: uma única thread acompanha os prazos
+    (em vez de um threading.Timer por requisição) e apenas entrega as funções
+    vencidas a um executor de até `max_workers` threads. As funções podem
+    fazer E/S bloqueante (conexão, envio, espera por uma conexão do pool) sem
+    atrasar os demais disparos.
+    """
+
+    def __init__(self, name: str = "hedge-timer", max_workers: int = 32):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._heap = []  # (instante, sequência, entrada)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = True
+
+    def schedule(self, delay: float, fn: Callable[[], None]) -> list:
+        """Agenda fn para daqui a `delay` segundos; retorna o identificador usado em cancel()."""
+        entry = [fn]
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), entry))
+            self._cond.notify()
+        return entry
+
+    @staticmethod
+    def cancel(entry: list):
+        entry[0] = None
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._heap and self._heap[0][0] <= time.monotonic():
+                        break
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                _, _, entry = heapq.heappop(self._heap)
+            fn = entry[0]
+            if fn is not None:
+                try:
+                    self._executor.submit(self._fire, fn)
+                except RuntimeError:
+                    return  # Executor encerrado por stop()
+
+    def _fire(self, fn: Callable[[], None]):
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"{self.name}: erro ao disparar função agendada: {str(e)}")
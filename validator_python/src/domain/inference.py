@@ -0,0 +1,105 @@
+import numpy as np
+import logging
+from typing import Dict, Any, Tuple
+from .neighbor_index import NeighborIndex, BruteForceIndex
+from .projection import Projection, restore_projection
+
+logger = logging.getLogger(__name__)
+
+class InferenceEngine:
+    """
+    Motor de inferência KNN em passo único.
+
+    Substitui a sequência `scaler.transform` + `predict` + `predict_proba` do
+    scikit-learn: a normalização usa média/escala pré-calculadas em float32 e
+    uma única busca de vizinhos fornece tanto a classe quanto a confiança.
+    Aceita uma imagem ou um lote (uma linha por imagem). A busca de vizinhos
+    é delegada a um NeighborIndex (força bruta por padrão). Com uma projeção
+    (PCA/aleatória), normalização e projeção são fundidas em um único
+    produto de matrizes e os vizinhos são buscados no espaço reduzido.
+    """
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, train_X: np.ndarray,
+                 train_y: np.ndarray, classes: np.ndarray, n_neighbors: int = 5,
+                 index: NeighborIndex = None, projection: Projection = None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.inv_scale = (1.0 / np.asarray(scale, dtype=np.float64)).astype(np.float32)
+        self.projection = projection
+        if projection is not None:
+            # ((x - mean) * inv_scale - p_mean) @ C.T  ==  x @ W + b
+            self.weights = np.ascontiguousarray((projection.components * self.inv_scale).T, dtype=np.float32)
+            self.bias = -((self.mean * self.inv_scale + projection.mean) @ projection.components.T).astype(np.float32)
+        self.classes = np.asarray(classes)
+        self.train_X = np.ascontiguousarray(train_X, dtype=np.float32)
+        # Rótulos codificados como índices em `classes`
+        self.train_y = np.searchsorted(self.classes, np.asarray(train_y))
+        self.n_neighbors = max(1, min(int(n_neighbors), len(self.train_X)))
+        self.index = (index or BruteForceIndex()).fit(self.train_X)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, index: NeighborIndex = None,
+                     projection: Projection = None) -> "InferenceEngine":
+        """
+        Constrói o motor a partir de um KNeighborsClassifier e StandardScaler já
+        treinados (o KNN deve ter sido ajustado sobre as features projetadas).
+        """
+        return cls(
+            mean=scaler.mean_,
+            scale=scaler.scale_,
+            train_X=model._fit_X,
+            train_y=model.classes_[model._y],
+            classes=model.classes_,
+            n_neighbors=model.n_neighbors,
+            index=index,
+            projection=projection
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any],
+                    index: NeighborIndex = None) -> "InferenceEngine":
+        """Constrói o motor a partir dos arrays de um artefato de modelo (ver model_artifact)."""
+        projection = None
+        if meta.get('projection'):
+            projection = restore_projection(meta['projection'], arrays['projection_mean'],
+                                            arrays['projection_components'])
+        return cls(
+            mean=arrays['mean'],
+            scale=arrays['scale'],
+            train_X=arrays['train_X'],
+            train_y=arrays['train_y'],
+            classes=arrays['classes'],
+            n_neighbors=meta['n_neighbors'],
+            index=index,
+            projection=projection
+        )
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        """Normaliza (e projeta, se configurado) as features com os parâmetros do treinamento."""
+        X = np.atleast_2d(features).astype(np.float32)
+        if self.projection is not None:
+            X = X @ self.weights
+            X += self.bias
+            return X
+        X -= self.mean
+        X *= self.inv_scale
+        return X
+
+    def kneighbors(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (distâncias ao quadrado, índices) dos k vizinhos mais próximos de cada linha."""
+        return self.index.search(X, self.n_neighbors)
+
+    def predict(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Classifica as features e retorna (classes previstas, confiança de cada previsão)."""
+        X = self.transform(features)
+        distances, indices = self.kneighbors(X)
+
+        # Votação uniforme, equivalente a predict_proba do KNeighborsClassifier.
+        # Índices aproximados podem devolver menos de k vizinhos (distância infinita).
+        valid = np.isfinite(distances)
+        neighbor_labels = self.train_y[indices]
+        votes = np.zeros((len(X), len(self.classes)), dtype=np.int32)
+        np.add.at(votes, (np.arange(len(X))[:, None], neighbor_labels), valid.astype(np.int32))
+
+        predicted = votes.argmax(axis=1)
+        confidences = votes[np.arange(len(X)), predicted] / np.maximum(valid.sum(axis=1), 1)
+        return self.classes[predicted], confidences
@@ -1,118 +1,644 @@
-from typing import Dict, Any, List, Optional
+from typing import Callable, Collection, Dict, Any, List, Mapping, Optional, Tuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from .abstract_proxy import AbstractProxy
-import random
+from .balancing import create_strategy
+from .health_checker import BackendHealth, HealthChecker
+from .backend_connection import BackendConnection, BackendError, discard
+from .connection_pool import ConnectionPool, PoolTimeoutError
+from .hedging import HedgePolicy, HedgeTimer
+from .protocol import (HELLO, LENGTH_PREFIX, FRAME_HEADER, FRAME_IMAGE, FRAME_FEATURES, FRAME_BATCH,
+                       FRAME_RESPONSE, FRAME_ERROR, FRAME_CANCEL, FLAG_TRACE, split_deadline)
+from .framing import MAX_PAYLOAD_SIZE, configure_socket, recv_exact, recv_header, send_frame, send_message
+from .result_cache import ResultCache
+from .tracing import Trace, TRACE_LENGTH, TRACE_RECEIVED, TRACE_FORWARDED, TRACE_REPLY_RECEIVED, TRACE_REPLIED
+import json
 import socket
 import logging
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+def _failure(error) -> tuple:
+    """
+    Resposta ao cliente para uma requisição que falhou no serviço: FRAME_ERROR
+    com code "timeout" quando o serviço não respondeu no prazo
+    (socket.timeout), senão FRAME_RESPONSE com status de erro.
+    """
+    if isinstance(error, socket.timeout):
+        return FRAME_ERROR, json.dumps({"status": "error", "code": "timeout", "error": str(error)}).encode()
+    return FRAME_RESPONSE, json.dumps({"status": "error", "error": str(error)}).encode()
+
 class LoadBalancerProxy(AbstractProxy):
-    def __init__(self, services: List[str]):
+    """
+    Balanceador de carga com encaminhamento TCP real.
+
+    Escuta em `host:port` e aceita clientes nos protocolos v1 e v2 (ver
+    protocol). Cada requisição é encaminhada a um dos serviços por uma
+    conexão persistente e multiplexada (BackendConnection) emprestada do pool
+    daquele serviço (ConnectionPool, configurado em `connection_pool`) e
+    compartilhada por todos os clientes; o payload de cada requisição é lido
+    do cliente antes de ocupar a conexão (um upload lento não bloqueia os
+    demais clientes) e a resposta volta ao cliente com o request_id original.
+    Leituras do cliente no meio de uma requisição têm limite de
+    `client_timeout` segundos.
+    
+    O serviço de cada requisição é escolhido pelo algoritmo configurado em
+    `algorithm` (ver balancing) entre os serviços disponíveis, segundo o
+    snapshot publicado pela verificação de saúde em segundo plano
+    (HealthChecker, configurada em `health_check`).
+    
+    Com `hedging` ativado (ver hedging.HedgePolicy), o payload é lido inteiro
+    e, se a resposta demorar mais que o percentil configurado, uma duplicata
+    vai para outro serviço; a primeira resposta vence e a outra cópia é
+    cancelada (FRAME_CANCEL). Erros de conexão e rejeições por sobrecarga
+    são tentados de novo em outro serviço, dentro do mesmo orçamento.
+    Cancelamentos enviados pelo cliente são repassados aos serviços.
+    
+    Em requisições rastreadas (FLAG_TRACE) apenas o prazo e o rastro são
+    lidos e regravados, com os instantes de recebimento e encaminhamento; o
+    restante do payload segue como nas demais. As respostas recebem no
+    rastro os instantes de chegada e envio de volta, com o nome do
+    balanceador como componente.
+    
+    Requisições sem resposta do serviço em `request_timeout` segundos são
+    canceladas nele e respondidas ao cliente com FRAME_ERROR (code "timeout").
+    """
+
+    def __init__(self, services: List[str], host: str = 'localhost', port: int = 0,
+                 max_connections: int = 1000, name: str = "LoadBalancer",
+                 algorithm: str = "round-robin", algorithm_options: Dict[str, Any] = None,
+                 health_check: Dict[str, Any] = None, connection_pool: Dict[str, Any] = None,
+                 hedging: Dict[str, Any] = None, request_timeout: float = 30.0,
+                 client_timeout: float = 30.0):
         super().__init__(services[0])  # Endereço principal
         self.services = services
-        self.service_status: Dict[str, Dict] = {}
-        self.initialize_services()
-        self.current_index = 0
-
-    def initialize_services(self):
-        """Inicializa o status dos serviços."""
-        for service in self.services:
-            self.service_status[service] = {
-                'available': True,
-                'last_check': 0,
-                'response_time': float('inf'),
-                'error_count': 0
-            }
+        self.health = HealthChecker.from_config(services, health_check, name=f"{name}-health")
+        self.strategy = create_strategy(algorithm, algorithm_options)
+        self.hedging = HedgePolicy.from_config(hedging)
+        self.hedge_timer = HedgeTimer(f"{name}-hedge") if self.hedging else None
+        
+        # Encaminhamento
+        self.name = name
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.client_timeout = client_timeout
+        self.pools: Dict[str, ConnectionPool] = {
+            service: ConnectionPool.from_config(lambda service=service: BackendConnection(
+                                                    service, request_timeout=request_timeout).connect(),
+                                                connection_pool, name=f"{name}->{service}")
+            for service in services
+        }
+        self.server_socket = None
+        self.running = False
+        self.active_connections = 0
+        self._connections_lock = threading.Lock()
+
+    @property
+    def service_status(self) -> Mapping[str, BackendHealth]:
+        """Snapshot imutável do estado dos serviços (publicado pelo HealthChecker)."""
+        return self.health.snapshot
+
+    def start_health_checks(self):
+        """Inicia a verificação de saúde em segundo plano (idempotente)."""
+        self.health.start()
 
     def check_service_availability(self, service: str) -> bool:
-        """Verifica se um serviço está disponível."""
-        host, port = service.split(':')
-        try:
-            # Tenta estabelecer uma conexão
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)  # Timeout de 1 segundo
-            start_time = time.time()
-            sock.connect((host, int(port)))
-            response_time = time.time() - start_time
-            sock.close()
-            
-            # Atualiza o status do serviço
-            self.service_status[service].update({
-                'available': True,
-                'last_check': time.time(),
-                'response_time': response_time,
-                'error_count': 0
-            })
-            return True
-        except Exception as e:
-            logger.warning(f"Serviço {service} indisponível: {str(e)}")
-            self.service_status[service]['error_count'] += 1
-            if self.service_status[service]['error_count'] >= 3:
-                self.service_status[service]['available'] = False
-            return False
-
-    def get_available_service(self) -> Optional[str]:
-        """Retorna o serviço mais disponível e com menor tempo de resposta."""
-        current_time = time.time()
-        available_services = []
-        
-        # Verifica disponibilidade dos serviços
-        for service in self.services:
-            # Verifica a cada 5 segundos
-            if current_time - self.service_status[service]['last_check'] > 5:
-                self.check_service_availability(service)
-            
-            if self.service_status[service]['available']:
-                available_services.append(service)
-        
+        """Verifica imediatamente se um serviço está disponível."""
+        return self.health.check(service)
+
+    def get_available_service(self, key: Optional[bytes] = None,
+                              exclude: Collection[str] = ()) -> Optional[str]:
+        """
+        Retorna o serviço escolhido pelo algoritmo de balanceamento entre os
+        disponíveis (`key` é a chave de afinidade, ver affinity_key), exceto
+        os de `exclude`. Apenas lê o snapshot de saúde: nenhuma E/S no
+        caminho da requisição.
+        """
+        available_services = self.health.available_services()
+        if exclude:
+            available_services = [s for s in available_services if s not in exclude]
         if not available_services:
-            logger.error("Nenhum serviço disponível")
+            if not exclude:
+                logger.error("Nenhum serviço disponível")
             return None
         
-        # Retorna o serviço com menor tempo de resposta
-        return min(available_services, 
-                  key=lambda s: self.service_status[s]['response_time'])
+        return self.strategy.select(available_services, key)
+
+    @staticmethod
+    def affinity_key(frame_type: int, flags: int, payload) -> Optional[bytes]:
+        """
+        Chave de afinidade de uma requisição: o hash do payload (sem o prazo)
+        calculado como no cache de resultados dos serviços. None para frames
+        sem conteúdo a classificar.
+        """
+        if frame_type not in (FRAME_IMAGE, FRAME_FEATURES, FRAME_BATCH):
+            return None
+        _, data = split_deadline(flags, payload, 0.0)
+        _, data = Trace.split(flags, data)
+        return ResultCache.key(data, b'features' if frame_type == FRAME_FEATURES else b'')
 
-    def mark_service_error(self, service: str):
+    def mark_service_error(self, service: str, error: str = None):
         """Marca um serviço como tendo erro."""
-        if service in self.service_status:
-            self.service_status[service]['error_count'] += 1
-            if self.service_status[service]['error_count'] >= 3:
-                self.service_status[service]['available'] = False
-                logger.warning(f"Serviço {service} marcado como indisponível após múltiplos erros")
+        self.health.report_failure(service, error)
 
     def mark_service_success(self, service: str, response_time: float):
         """Marca um serviço como tendo sucesso."""
-        if service in self.service_status:
-            self.service_status[service].update({
-                'available': True,
-                'error_count': 0,
-                'response_time': response_time,
-                'last_check': time.time()
-            })
+        self.health.report_success(service)
+        self.strategy.observe(service, response_time)
 
-    def get_next_target(self) -> str:
+    def handle_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Implementa o algoritmo round-robin para seleção do próximo servidor.
+        Encaminha uma requisição em memória ({'payload': bytes, 'frame_type':
+        opcional}) a um serviço e retorna a resposta JSON decodificada.
+        Lança socket.timeout se não houver resposta em `request_timeout` segundos.
         """
-        target = self.services[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.services)
-        return target
+        frame_type = request_data.get('frame_type', FRAME_IMAGE)
+        future = Future()
+        cancel = self._forward_buffered(request_data['payload'], frame_type, 0,
+                                        lambda response_type, payload, flags=0: future.set_result(payload))
+        try:
+            return json.loads(future.result(timeout=self.request_timeout))
+        except FutureTimeoutError:
+            if cancel is not None:
+                cancel()
+            raise socket.timeout(f"{self.name}: sem resposta em {self.request_timeout}s")
+    
+    def start(self):
+        """Inicia o servidor do balanceador (bloqueia até stop())."""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(1024)
+        self.port = self.server_socket.getsockname()[1]
+        self.running = True
+        self.start_health_checks()
+        for pool in self.pools.values():
+            threading.Thread(target=pool.warm, daemon=True).start()
+        logger.info(f"{self.name} escutando em {self.host}:{self.port} (serviços: {', '.join(self.services)})")
+        
+        try:
+            while self.running:
+                try:
+                    client_socket, address = self.server_socket.accept()
+                except OSError as e:
+                    if not self.running:
+                        break
+                    logger.error(f"{self.name}: erro ao aceitar conexão: {str(e)}")
+                    continue
+                
+                with self._connections_lock:
+                    if self.active_connections >= self.max_connections:
+                        logger.warning(f"{self.name}: limite de {self.max_connections} conexões atingido, "
+                                       f"recusando {address}")
+                        client_socket.close()
+                        continue
+                    self.active_connections += 1
+                configure_socket(client_socket)
+                client_socket.settimeout(self.client_timeout)
+                client_thread = threading.Thread(target=self._handle_client, args=(client_socket, address))
+                client_thread.daemon = True
+                client_thread.start()
+        finally:
+            self.server_socket.close()
+            logger.info(f"{self.name} encerrado")
+    
+    def stop(self):
+        """Para o balanceador e fecha as conexões com os serviços."""
+        self.running = False
+        self.health.stop()
+        if self.hedging is not None:
+            self.hedge_timer.stop()
+            logger.info(f"{self.name}: hedging: {self.hedging.summary()}")
+        if self.server_socket:
+            try:
+                self.server_socket.close()
+            except OSError:
+                pass
+        for service, pool in self.pools.items():
+            stats = pool.stats()
+            logger.info(f"{self.name}: pool {service}: {stats['creates']} conexões abertas, "
+                        f"{stats['reuses']} reutilizações, {stats['waits']} esperas "
+                        f"(saturação {stats['saturation'] * 100:.1f}%), pico de {stats['peak_in_use']}/"
+                        f"{stats['capacity']} requisições")
+            pool.close()
 
-    def handle_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas do pool de conexões de cada serviço."""
+        return {service: pool.stats() for service, pool in self.pools.items()}
+    
+    def _dispatch(self, frame_type: int, flags: int, send, reply,
+                  key: Optional[bytes] = None) -> Optional[Callable[[], None]]:
         """
-        Processa a requisição usando o algoritmo de balanceamento de carga.
+        Escolhe o serviço, empresta uma conexão do pool dele, envia a
+        requisição com `send(service, backend, callback)` (que retorna o
+        request_id no serviço) e entrega a resposta a `reply(tipo, payload)`.
+        Sem serviço ou conexão disponível, `send` é chamado com backend None
+        (para consumir o payload). Falhas viram uma resposta de erro para o
+        cliente. Retorna a função que cancela a requisição no serviço.
         """
         self.increment_request_count()
-        target = self.get_next_target()
+        service = self.get_available_service(key)
+        start_time = time.time()
         
-        # Simula o processamento da requisição
-        response = {
-            "status": "success",
-            "target": target,
-            "request_count": self.request_count,
-            "data": request_data
-        }
+        def callback(response_type, payload, flags=0):
+            self.pools[service].release(backend)
+            self.strategy.on_complete(service)
+            if response_type is None:
+                self.mark_service_error(service, str(payload))
+                reply(*_failure(payload))
+                return
+            self.mark_service_success(service, time.time() - start_time)
+            reply(response_type, payload, flags)
+        
+        if service is None:
+            send(None, None, None)
+            reply(FRAME_RESPONSE, json.dumps({"status": "error", "error": "Nenhum serviço disponível"}).encode())
+            return
+        self.strategy.on_dispatch(service)
+        pool = self.pools[service]
+        try:
+            backend = pool.acquire()
+        except (BackendError, PoolTimeoutError) as e:
+            send(None, None, None)
+            self.strategy.on_complete(service)
+            logger.error(f"{self.name}: {str(e)}")
+            if isinstance(e, BackendError):
+                self.mark_service_error(service, str(e))
+            reply(FRAME_RESPONSE, json.dumps({"status": "error", "error": str(e)}).encode())
+            return
+        try:
+            request_id = send(service, backend, callback)
+        except BackendError as e:
+            pool.release(backend)
+            self.strategy.on_complete(service)
+            logger.error(f"{self.name}: {str(e)}")
+            self.mark_service_error(service, str(e))
+            reply(FRAME_RESPONSE, json.dumps({"status": "error", "error": str(e)}).encode())
+            return None
+        except Exception:
+            pool.release(backend)
+            self.strategy.on_complete(service)
+            raise
         
-        return response 
\ No newline at end of file
+        def cancel():
+            if backend.cancel(request_id):
+                pool.release(backend)
+                self.strategy.on_complete(service)
+        return cancel
+    
+    def _send_from_client(self, client_socket: socket.socket, frame_type: int, flags: int, length: int,
+                          head: bytes = b''):
+        """
+        Cria a função de envio que lê o payload do socket do cliente (após
+        `head`, o início do payload já lido) quando o serviço já foi escolhido.
+        """
+        def send(service, backend, callback):
+            if backend is None:
+                discard(client_socket, length)
+                return None
+            return backend.forward_from_client(client_socket, frame_type, flags, length, callback, head)
+        return send
+    
+    def _send_buffered(self, payload, frame_type: int, flags: int):
+        """Cria a função de envio de um payload já em memória."""
+        def send(service, backend, callback):
+            if backend is None:
+                return None
+            return backend.forward(payload, frame_type, flags, callback)
+        return send
+    
+    def _forward(self, client_socket: socket.socket, frame_type: int, flags: int, length: int,
+                 reply) -> Optional[Callable[[], None]]:
+        """
+        Encaminha uma requisição recebida do cliente e retorna a função que a
+        cancela. Com algoritmos que usam a chave de afinidade ou com hedging,
+        o payload é lido antes de escolher o serviço (para calcular o hash ou
+        reenviá-lo); nos demais casos, só depois que uma conexão com o serviço
+        escolhido foi obtida.
+        """
+        head = b''
+        if flags & FLAG_TRACE:
+            head, length = self._trace_request(client_socket, flags, length, time.time())
+            reply = self._traced_reply(reply)
+        if not self.strategy.uses_key and self.hedging is None:
+            return self._dispatch(frame_type, flags,
+                                  self._send_from_client(client_socket, frame_type, flags, length, head), reply)
+        payload = recv_exact(client_socket, length)
+        return self._forward_buffered(head + payload if head else payload, frame_type, flags, reply)
+    
+    def _trace_request(self, client_socket: socket.socket, flags: int, length: int,
+                       received_at: float) -> Tuple[bytes, int]:
+        """
+        Lê do cliente só o prazo e o rastro do início do payload e acrescenta
+        ao rastro os instantes de recebimento e encaminhamento. Retorna o
+        início regravado e os bytes restantes do payload (ainda no socket).
+        """
+        prefix = Trace.prefix_size(flags)
+        if length < prefix + TRACE_LENGTH.size:
+            raise ValueError("Frame com rastro sem o cabeçalho do rastro")
+        start = recv_exact(client_socket, prefix + TRACE_LENGTH.size)
+        (trace_length,) = TRACE_LENGTH.unpack_from(start, prefix)
+        if prefix + TRACE_LENGTH.size + trace_length > length:
+            raise ValueError("Rastro truncado")
+        encoded = start[prefix:] + recv_exact(client_socket, trace_length)
+        trace, _ = Trace.decode(memoryview(encoded))
+        trace.stamp(self.name, TRACE_RECEIVED, received_at)
+        trace.stamp(self.name, TRACE_FORWARDED)
+        return bytes(start[:prefix]) + trace.encode(), length - len(start) - trace_length
+    
+    def _traced_reply(self, reply):
+        """Envolve `reply` para acrescentar ao rastro da resposta os instantes de chegada e envio."""
+        def traced(response_type, payload, flags=0):
+            if flags & FLAG_TRACE:
+                received_at = time.time()
+                trace, data = Trace.split(flags, payload)
+                trace.stamp(self.name, TRACE_REPLY_RECEIVED, received_at)
+                trace.stamp(self.name, TRACE_REPLIED)
+                payload = [trace.encode(), data]
+            reply(response_type, payload, flags)
+        return traced
+    
+    def _forward_buffered(self, payload, frame_type: int, flags: int, reply) -> Optional[Callable[[], None]]:
+        """Encaminha uma requisição com o payload em memória (com hedging, se ativado)."""
+        key = self.affinity_key(frame_type, flags, payload) if self.strategy.uses_key else None
+        if self.hedging is not None:
+            request = _HedgedRequest(self, payload, frame_type, flags, reply, key)
+            request.start()
+            return request.cancel
+        return self._dispatch(frame_type, flags, self._send_buffered(payload, frame_type, flags), reply, key)
+    
+    def _handle_client(self, client_socket: socket.socket, address):
+        """Atende um cliente: uma requisição (v1) ou uma conexão multiplexada (v2)."""
+        try:
+            header = recv_header(client_socket, LENGTH_PREFIX)
+            if header is None:
+                return
+            if header == HELLO:
+                self._relay_multiplexed(client_socket, address)
+                return
+            
+            size = int.from_bytes(header, 'big')
+            if size > MAX_PAYLOAD_SIZE:
+                raise ValueError(f"Payload de {size} bytes excede o limite de {MAX_PAYLOAD_SIZE} bytes")
+            response = Future()
+            cancel = self._forward(client_socket, FRAME_IMAGE, 0, size,
+                                   lambda frame_type, payload, flags=0: response.set_result(payload))
+            try:
+                payload = response.result(timeout=self.request_timeout)
+            except FutureTimeoutError:
+                if cancel is not None:
+                    cancel()
+                payload = _failure(socket.timeout(f"Sem resposta em {self.request_timeout}s"))[1]
+            send_message(client_socket, payload)
+        except Exception as e:
+            logger.error(f"{self.name}: erro na conexão com {address}: {str(e)}")
+        finally:
+            client_socket.close()
+            with self._connections_lock:
+                self.active_connections -= 1
+    
+    def _relay_multiplexed(self, client_socket: socket.socket, address):
+        """
+        Encaminha os frames de uma conexão v2, cada um ao serviço escolhido
+        naquele momento. FRAME_CANCEL do cliente cancela a requisição
+        correspondente nos serviços. Após o EOF do cliente, as respostas
+        pendentes são aguardadas por até `request_timeout` segundos e as que
+        faltarem são canceladas.
+        """
+        client_socket.sendall(HELLO)
+        send_lock = threading.Lock()
+        in_flight: Dict[int, Callable[[], None]] = {}
+        drained = threading.Condition()
+        
+        def replier(request_id: int):
+            def reply(frame_type, payload, flags=0):
+                try:
+                    with send_lock:
+                        send_frame(client_socket, request_id, frame_type, payload, flags)
+                except OSError as e:
+                    logger.error(f"{self.name}: erro ao responder {address}: {str(e)}")
+                finally:
+                    # Só sai de in_flight depois de enviada: a conexão não fecha no meio do envio
+                    reply.done = True
+                    with drained:
+                        in_flight.pop(request_id, None)
+                        drained.notify_all()
+            reply.done = False
+            return reply
+        
+        closed_cleanly = False
+        try:
+            self._relay_frames(client_socket, in_flight, replier)
+            closed_cleanly = True
+        finally:
+            # Como Service._serve_multiplexed: após o EOF do cliente, responde o que já foi
+            # encaminhado antes de fechar; se a conexão falhou, apenas cancela
+            deadline = time.monotonic() + (self.request_timeout if closed_cleanly else 0.0)
+            with drained:
+                while in_flight and time.monotonic() < deadline:
+                    drained.wait(deadline - time.monotonic())
+                pending = list(in_flight.values())
+                in_flight.clear()
+            for cancel in pending:
+                cancel()
+    
+    def _relay_frames(self, client_socket: socket.socket, in_flight: Dict[int, Callable[[], None]], replier):
+        """Lê os frames do cliente até o fim da conexão e os encaminha (ver _relay_multiplexed)."""
+        while self.running:
+            # A conexão pode ficar ociosa entre frames; client_timeout vale só dentro de um frame
+            client_socket.settimeout(None)
+            header = recv_header(client_socket, FRAME_HEADER.size)
+            if header is None:
+                break
+            client_socket.settimeout(self.client_timeout)
+            request_id, frame_type, flags, length = FRAME_HEADER.unpack(header)
+            if length > MAX_PAYLOAD_SIZE:
+                raise ValueError(f"Frame de {length} bytes excede o limite de {MAX_PAYLOAD_SIZE} bytes")
+            if frame_type == FRAME_CANCEL:
+                discard(client_socket, length)
+                cancel = in_flight.pop(request_id, None)
+                if cancel is not None:
+                    cancel()
+                continue
+            reply = replier(request_id)
+            cancel = self._forward(client_socket, frame_type, flags, length, reply)
+            if cancel is not None:
+                in_flight[request_id] = cancel
+            # A resposta pode ter chegado antes do registro
+            if reply.done:
+                in_flight.pop(request_id, None)
+
+class _Attempt:
+    """Uma cópia de uma requisição com hedging, enviada a um serviço."""
+    __slots__ = ('service', 'backend', 'request_id', 'start_time', 'hedge', 'finished')
+
+    def __init__(self, service: str, backend: BackendConnection, hedge: bool):
+        self.service = service
+        self.backend = backend
+        self.request_id = None
+        self.start_time = time.time()
+        self.hedge = hedge
+        self.finished = False
+
+class _HedgedRequest:
+    """
+    Requisição encaminhada com hedging: a primeira cópia vai ao serviço
+    escolhido pelo algoritmo; se não houver resposta após a espera da
+    política, uma duplicata vai a outro serviço. Erros e rejeições por
+    sobrecarga são tentados de novo em outro serviço. Duplicatas e novas
+    tentativas gastam o orçamento da política; a primeira resposta vence e
+    as cópias restantes são canceladas.
+    """
+
+    def __init__(self, lb: LoadBalancerProxy, payload, frame_type: int, flags: int, reply,
+                 key: Optional[bytes]):
+        self.lb = lb
+        self.policy = lb.hedging
+        self.payload = payload
+        self.frame_type = frame_type
+        self.flags = flags
+        self.reply = reply
+        self.key = key
+        self.start_time = time.monotonic()
+        self.retries_left = self.policy.max_retries
+        self.attempts: List[_Attempt] = []
+        self.tried = set()
+        self.done = False
+        self.timer = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.lb.increment_request_count()
+        self.policy.budget.record_request()
+        error = self._launch(hedge=False)
+        if error is not None:
+            self._retry_or_fail(error)
+            return
+        with self._lock:
+            if not self.done:
+                self.timer = self.lb.hedge_timer.schedule(self.policy.delay(), self._hedge)
+
+    def cancel(self):
+        """Cancelamento pedido pelo cliente: nenhuma resposta é enviada."""
+        self._finish(None, None)
+
+    def _launch(self, hedge: bool) -> Optional[Exception]:
+        """Envia uma cópia a um serviço ainda não usado; retorna o erro se não conseguir."""
+        lb = self.lb
+        with self._lock:
+            if self.done:
+                return None
+            service = lb.get_available_service(self.key, exclude=self.tried)
+            if service is None:
+                return BackendError("Nenhum serviço disponível")
+            self.tried.add(service)
+        lb.strategy.on_dispatch(service)
+        try:
+            backend = lb.pools[service].acquire()
+        except (BackendError, PoolTimeoutError) as e:
+            lb.strategy.on_complete(service)
+            logger.error(f"{lb.name}: {str(e)}")
+            if isinstance(e, BackendError):
+                lb.mark_service_error(service, str(e))
+            return e
+        attempt = _Attempt(service, backend, hedge)
+        with self._lock:
+            self.attempts.append(attempt)
+        try:
+            attempt.request_id = backend.forward(self.payload, self.frame_type, self.flags,
+                                                 lambda response_type, payload, flags=0: self._on_response(
+                                                     attempt, response_type, payload, flags))
+        except BackendError as e:
+            self._release(attempt)
+            logger.error(f"{lb.name}: {str(e)}")
+            lb.mark_service_error(service, str(e))
+            return e
+        return None
+
+    def _release(self, attempt: _Attempt) -> bool:
+        """Devolve a conexão da cópia ao pool (uma única vez); False se já devolvida."""
+        with self._lock:
+            if attempt.finished:
+                return False
+            attempt.finished = True
+        self.lb.pools[attempt.service].release(attempt.backend)
+        self.lb.strategy.on_complete(attempt.service)
+        return True
+
+    def _on_response(self, attempt: _Attempt, response_type: Optional[int], payload, flags: int = 0):
+        if not self._release(attempt):
+            return
+        lb = self.lb
+        if response_type is None:
+            lb.mark_service_error(attempt.service, str(payload))
+            self._retry_or_fail(_failure(payload) if isinstance(payload, socket.timeout)
+                                else BackendError(str(payload)))
+            return
+        if response_type == FRAME_ERROR:
+            # Rejeitada sem processamento (sobrecarga ou prazo): outro serviço pode atender
+            self._retry_or_fail((response_type, payload))
+            return
+        lb.mark_service_success(attempt.service, time.time() - attempt.start_time)
+        self.policy.record(time.monotonic() - self.start_time)
+        if attempt.hedge:
+            self.policy.count('hedge_wins')
+        self._finish(response_type, payload, flags)
+
+    def _retry_or_fail(self, error):
+        """Após uma falha: espera as outras cópias, tenta outro serviço ou responde com o erro."""
+        while True:
+            with self._lock:
+                if self.done:
+                    return
+                self.last_error = error
+                if any(not a.finished for a in self.attempts):
+                    return  # Outra cópia ainda pode responder
+                can_retry = self.retries_left > 0
+                if can_retry:
+                    self.retries_left -= 1
+            if not can_retry or not self.policy.budget.try_spend():
+                break
+            self.policy.count('retried')
+            error = self._launch(hedge=False)
+            if error is None:
+                return
+        if isinstance(error, tuple):
+            self._finish(*error)
+        else:
+            self._finish(*_failure(error))
+
+    def _hedge(self):
+        """
+        Disparado pelo HedgeTimer (em uma thread do executor dele, não na que
+        acompanha os prazos): envia a duplicata se a requisição ainda estiver
+        pendente. Pode esperar por uma conexão do pool sem atrasar outros disparos.
+        """
+        with self._lock:
+            if self.done:
+                return
+            tried = set(self.tried)
+        if not any(s not in tried for s in self.lb.health.available_services()):
+            return  # Nenhum outro serviço para a duplicata
+        if not self.policy.budget.try_spend():
+            return
+        self.policy.count('hedged')
+        self._launch(hedge=True)
+
+    def _finish(self, response_type: Optional[int], payload, flags: int = 0):
+        """Conclui a requisição: cancela as cópias pendentes e responde ao cliente (se houver resposta)."""
+        with self._lock:
+            if self.done:
+                return
+            self.done = True
+            pending = [a for a in self.attempts if not a.finished]
+            if self.timer is not None:
+                HedgeTimer.cancel(self.timer)
+        for attempt in pending:
+            if attempt.request_id is not None and attempt.backend.cancel(attempt.request_id):
+                self._release(attempt)
+        if response_type is not None:
+            self.reply(response_type, payload, flags)
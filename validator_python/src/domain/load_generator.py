@@ -0,0 +1,225 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Type
+import logging
+import math
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ArrivalProcess(ABC):
+    """
+    Instantes de chegada das requisições do gerador de carga: next_interval()
+    retorna o intervalo até a próxima chegada, com média 1 / `rate`.
+    """
+    name = ""
+
+    def __init__(self, rate: float, seed: Optional[int] = None, **params):
+        if rate <= 0:
+            raise ValueError(f"Taxa de requisições inválida: {rate}")
+        self.rate = float(rate)
+        self.params = params
+        self.rng = np.random.default_rng(seed)
+
+    @abstractmethod
+    def next_interval(self) -> float:
+        pass
+
+class ConstantArrivals(ArrivalProcess):
+    """Uma chegada a cada 1 / rate segundos."""
+    name = "constant"
+
+    def next_interval(self) -> float:
+        return 1.0 / self.rate
+
+class PoissonArrivals(ArrivalProcess):
+    """Chegadas independentes (intervalos exponenciais), como muitos clientes sem coordenação."""
+    name = "poisson"
+
+    def next_interval(self) -> float:
+        return float(self.rng.exponential(1.0 / self.rate))
+
+class BurstyArrivals(ArrivalProcess):
+    """
+    Rajadas: em cada período de `period` segundos as chegadas se concentram
+    na fração `on_fraction` inicial (Poisson a rate / on_fraction) e o resto
+    do período fica sem chegadas; a taxa média continua sendo `rate`.
+    """
+    name = "bursty"
+
+    def __init__(self, rate: float, seed: Optional[int] = None, period: float = 1.0,
+                 on_fraction: float = 0.2, **params):
+        super().__init__(rate, seed, **params)
+        self.period = period
+        self.on_fraction = min(1.0, max(0.01, on_fraction))
+        self._on_time = 0.0  # tempo acumulado só dentro das rajadas
+        self._last = 0.0
+
+    def _real_time(self, on_time: float) -> float:
+        burst = self.period * self.on_fraction
+        return math.floor(on_time / burst) * self.period + math.fmod(on_time, burst)
+
+    def next_interval(self) -> float:
+        self._on_time += float(self.rng.exponential(self.on_fraction / self.rate))
+        now = self._real_time(self._on_time)
+        interval, self._last = now - self._last, now
+        return interval
+
+ARRIVAL_PROCESSES: Dict[str, Type[ArrivalProcess]] = {
+    ConstantArrivals.name: ConstantArrivals,
+    PoissonArrivals.name: PoissonArrivals,
+    BurstyArrivals.name: BurstyArrivals,
+}
+
+def create_arrival_process(arrival: str, rate: float, options: Dict[str, Any] = None) -> ArrivalProcess:
+    """Cria o processo de chegadas pelo nome usado em `load.arrival` na configuração."""
+    arrival = arrival or PoissonArrivals.name
+    if arrival not in ARRIVAL_PROCESSES:
+        raise ValueError(f"Processo de chegadas desconhecido: {arrival} "
+                         f"(opções: {', '.join(ARRIVAL_PROCESSES)})")
+    return ARRIVAL_PROCESSES[arrival](rate, **(options or {}))
+
+class OpenLoopGenerator:
+    """
+    Gerador de carga em malha aberta: as requisições são disparadas nos
+    instantes sorteados pelo processo de chegadas, sem esperar as anteriores
+    terminarem, e executadas por até `concurrency` workers.
+
+    A latência de cada requisição é medida a partir do instante em que ela
+    deveria ter sido enviada (correção de coordinated omission): se os
+    workers estão todos ocupados ou o disparo atrasa, a espera entra na
+    latência, como aconteceria com um cliente real. O tempo desde o envio
+    efetivo é reportado à parte (service_time). Acima de `max_pending`
+    requisições em andamento as novas chegadas são descartadas e contadas,
+    sinal de que a taxa oferecida passou da capacidade do sistema.
+    """
+
+    def __init__(self, send: Callable[[int], Any], arrivals: ArrivalProcess, concurrency: int = 64,
+                 max_pending: int = 10000,
+                 on_complete: Callable[[int, Any, float, float], None] = None):
+        self.send = send
+        self.arrivals = arrivals
+        self.concurrency = max(1, int(concurrency))
+        self.max_pending = max(1, int(max_pending))
+        self.on_complete = on_complete
+        self._lock = threading.Lock()
+        self._reset()
+
+    @classmethod
+    def from_config(cls, send: Callable[[int], Any], rate: float, config: Dict[str, Any] = None,
+                    on_complete: Callable[[int, Any, float, float], None] = None) -> "OpenLoopGenerator":
+        """Cria o gerador a partir da seção `load` da configuração do Source."""
+        config = config or {}
+        return cls(
+            send,
+            create_arrival_process(config.get('arrival', 'poisson'), rate, config.get('arrival_options')),
+            concurrency=config.get('concurrency', 64),
+            max_pending=config.get('max_pending', 10000),
+            on_complete=on_complete
+        )
+
+    def _reset(self):
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.pending = 0  # enviadas e ainda não concluídas (inclui as na fila dos workers)
+        self.running = 0
+        self.max_in_flight = 0
+        self.latencies: List[float] = []
+        self.service_times: List[float] = []
+        self.schedule_lag = 0.0
+        self.duration = 0.0
+        self.elapsed = 0.0
+
+    def _execute(self, index: int, intended: float):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self.max_in_flight = max(self.max_in_flight, self.running)
+        ok = True
+        try:
+            result = self.send(index)
+        except Exception:
+            # O próprio send registra o erro; aqui só entra na contagem
+            result, ok = None, False
+        finished = time.perf_counter()
+        latency, service_time = finished - intended, finished - started
+        with self._lock:
+            self.pending -= 1
+            self.running -= 1
+            if ok:
+                self.completed += 1
+                self.latencies.append(latency)
+                self.service_times.append(service_time)
+            else:
+                self.errors += 1
+            self._last_finish = finished
+        if ok and self.on_complete is not None:
+            self.on_complete(index, result, latency, service_time)
+
+    def run(self, duration: float) -> Dict[str, Any]:
+        """Gera carga por `duration` segundos, espera as requisições pendentes e retorna stats()."""
+        self._reset()
+        self.duration = duration
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="load")
+        start = self._last_finish = time.perf_counter()
+        intended = start
+        index = 0
+        try:
+            while True:
+                intended += self.arrivals.next_interval()
+                if intended - start >= duration:
+                    break
+                now = time.perf_counter()
+                if intended > now:
+                    time.sleep(intended - now)
+                else:
+                    self.schedule_lag = max(self.schedule_lag, now - intended)
+                index += 1
+                with self._lock:
+                    if self.pending >= self.max_pending:
+                        self.dropped += 1
+                        continue
+                    self.pending += 1
+                    self.sent += 1
+                executor.submit(self._execute, index, intended)
+        finally:
+            executor.shutdown(wait=True)
+        self.elapsed = max(duration, self._last_finish - start)
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        offered = self.sent + self.dropped
+        stats = {
+            "offered": offered,
+            "sent": self.sent,
+            "completed": self.completed,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "offered_rate": offered / self.duration if self.duration else 0.0,
+            "achieved_rate": self.completed / self.elapsed if self.elapsed else 0.0,
+            "max_in_flight": self.max_in_flight,
+            "schedule_lag": self.schedule_lag,
+        }
+        for name, values in (("latency", self.latencies), ("service_time", self.service_times)):
+            values = np.array(values) if values else np.zeros(1)
+            stats[name] = {
+                "mean": float(np.mean(values)),
+                "p50": float(np.percentile(values, 50)),
+                "p90": float(np.percentile(values, 90)),
+                "p99": float(np.percentile(values, 99)),
+                "max": float(np.max(values)),
+            }
+        return stats
+
+    def summary(self) -> str:
+        stats = self.stats()
+        latency, service_time = stats['latency'], stats['service_time']
+        return (f"taxa oferecida {stats['offered_rate']:.1f} req/s, atingida {stats['achieved_rate']:.1f} req/s "
+                f"({stats['completed']} concluídas, {stats['errors']} erros, {stats['dropped']} descartadas, "
+                f"até {stats['max_in_flight']} em andamento); latência p50 {latency['p50'] * 1000:.1f}ms "
+                f"p99 {latency['p99'] * 1000:.1f}ms (sem correção: p50 {service_time['p50'] * 1000:.1f}ms "
+                f"p99 {service_time['p99'] * 1000:.1f}ms)")
@@ -0,0 +1,137 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Any, Tuple
+import numpy as np
+from .preprocessing import PREPROCESSING_VERSION
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = "pasid-knn"
+ARTIFACT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+class ModelArtifactError(Exception):
+    """Artefato de modelo ausente, corrompido ou de versão incompatível."""
+    pass
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def arrays_from_sklearn(model, scaler, projection=None) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Converte KNeighborsClassifier + StandardScaler (+ projeção) em arrays brutos e metadados."""
+    arrays = {
+        'mean': np.asarray(scaler.mean_, dtype=np.float32),
+        'scale': np.asarray(scaler.scale_, dtype=np.float32),
+        'train_X': np.ascontiguousarray(model._fit_X, dtype=np.float32),
+        'train_y': np.asarray(model.classes_[model._y]),
+        'classes': np.asarray(model.classes_),
+    }
+    meta = {'n_neighbors': int(model.n_neighbors), 'projection': None}
+    if projection is not None:
+        arrays['projection_mean'] = np.asarray(projection.mean, dtype=np.float32)
+        arrays['projection_components'] = np.asarray(projection.components, dtype=np.float32)
+        meta['projection'] = projection.name
+    return arrays, meta
+
+def save_artifact(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+    """
+    Grava o artefato como um diretório com um .npy por array e um manifest.json
+    com versão do formato, formas, tipos e SHA-256 de cada arquivo.
+
+    Cada gravação monta um diretório versionado novo ao lado e `path` é um link
+    simbólico para a versão atual, trocado atomicamente com os.replace: quem
+    carrega o modelo vê sempre uma versão completa, e uma falha ao publicar
+    mantém a anterior. A versão substituída só é removida depois da troca.
+    """
+    # Sufixo único por processo e thread: no modo thread, vários serviços podem gravar ao mesmo tempo
+    suffix = f"{os.getpid()}-{threading.get_ident()}"
+    version_path = f"{path}.v-{time.time_ns()}-{suffix}"
+    os.makedirs(version_path)
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'preprocessing_version': PREPROCESSING_VERSION,
+        'meta': meta,
+        'arrays': {}
+    }
+    link_path = f"{path}.link-{suffix}"
+    try:
+        for name, array in arrays.items():
+            file_name = f"{name}.npy"
+            file_path = os.path.join(version_path, file_name)
+            np.save(file_path, np.ascontiguousarray(array))
+            manifest['arrays'][name] = {
+                'file': file_name,
+                'dtype': str(array.dtype),
+                'shape': list(array.shape),
+                'sha256': _file_sha256(file_path)
+            }
+        with open(os.path.join(version_path, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        previous = None
+        if os.path.islink(path):
+            previous = os.path.join(os.path.dirname(path), os.readlink(path))
+        elif os.path.isdir(path):
+            # Artefato no formato antigo (diretório em `path`): vira uma versão como as outras
+            previous = f"{path}.v-0-{suffix}"
+            os.rename(path, previous)
+
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(os.path.basename(version_path), link_path)
+        os.replace(link_path, path)
+    except BaseException:
+        # Nada foi publicado: o artefato anterior continua valendo
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        shutil.rmtree(version_path, ignore_errors=True)
+        raise
+
+    # Processos que já mapearam a versão anterior continuam lendo os arquivos removidos
+    if previous and os.path.realpath(previous) != os.path.realpath(path):
+        shutil.rmtree(previous, ignore_errors=True)
+
+def load_artifact(path: str, verify: bool = False) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Abre o artefato mapeando os arrays em memória (somente leitura), de modo que
+    processos no mesmo host compartilhem uma única cópia no page cache.
+    Com `verify`, confere o SHA-256 de cada arquivo (gravado no manifesto ao
+    publicar) antes de usá-lo, ao custo de ler todos os arrays do disco.
+    """
+    # Resolve o link uma vez: uma troca durante a carga não mistura versões
+    path = os.path.realpath(path)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise ModelArtifactError(f"Manifesto não encontrado em {path}")
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ModelArtifactError(f"Formato de artefato desconhecido: {manifest.get('format')}")
+    if manifest.get('version') != ARTIFACT_VERSION:
+        raise ModelArtifactError(f"Versão de artefato incompatível: {manifest.get('version')} "
+                                 f"(esperada {ARTIFACT_VERSION})")
+    if manifest.get('preprocessing_version') != PREPROCESSING_VERSION:
+        raise ModelArtifactError("Artefato gerado com outra versão do pré-processamento")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        file_path = os.path.join(path, entry['file'])
+        if verify and _file_sha256(file_path) != entry['sha256']:
+            raise ModelArtifactError(f"Checksum inválido para {entry['file']}")
+        array = np.load(file_path, mmap_mode='r')
+        if list(array.shape) != entry['shape'] or str(array.dtype) != entry['dtype']:
+            raise ModelArtifactError(f"Forma/tipo inesperado em {entry['file']}")
+        arrays[name] = array
+    return arrays, manifest['meta']
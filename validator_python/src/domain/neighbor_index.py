@@ -0,0 +1,150 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Tuple, Type
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class NeighborIndex(ABC):
+    """
+    Interface dos índices de vizinhos mais próximos usados pelo InferenceEngine.
+    As distâncias retornadas são euclidianas ao quadrado.
+    """
+    name = ""
+
+    def __init__(self, **params):
+        self.params = params
+
+    @abstractmethod
+    def fit(self, X: np.ndarray) -> "NeighborIndex":
+        """Constrói o índice sobre a matriz de treinamento (float32, já normalizada)."""
+        pass
+
+    @abstractmethod
+    def search(self, Q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (distâncias, índices) dos k vizinhos de cada linha de Q."""
+        pass
+
+def _squared_distances(Q: np.ndarray, X: np.ndarray, x_sq_norms: np.ndarray) -> np.ndarray:
+    """||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2 para todas as combinações de linhas."""
+    return np.einsum('ij,ij->i', Q, Q)[:, None] - 2.0 * (Q @ X.T) + x_sq_norms
+
+def _top_k(distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Seleciona (sem ordenar por completo) os k menores valores de cada linha."""
+    if k < distances.shape[1]:
+        indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.broadcast_to(np.arange(distances.shape[1]), distances.shape).copy()
+    return np.take_along_axis(distances, indices, axis=1), indices
+
+class BruteForceIndex(NeighborIndex):
+    """Busca exata comparando a consulta com todas as amostras (um produto de matrizes)."""
+    name = "brute"
+
+    def fit(self, X: np.ndarray) -> "BruteForceIndex":
+        self.X = X
+        self.sq_norms = np.einsum('ij,ij->i', X, X)
+        return self
+
+    def search(self, Q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return _top_k(_squared_distances(Q, self.X, self.sq_norms), k)
+
+class TreeIndex(NeighborIndex):
+    """
+    Busca exata com árvore (BallTree ou KDTree do scikit-learn).
+    Parâmetros: `tree` ("ball" ou "kd") e `leaf_size`.
+    """
+    name = "tree"
+
+    def fit(self, X: np.ndarray) -> "TreeIndex":
+        from sklearn.neighbors import BallTree, KDTree
+        tree_class = KDTree if self.params.get('tree', 'ball') == 'kd' else BallTree
+        self.tree = tree_class(X, leaf_size=self.params.get('leaf_size', 40))
+        return self
+
+    def search(self, Q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances, indices = self.tree.query(Q, k=k)
+        return distances ** 2, indices
+
+class IVFIndex(NeighborIndex):
+    """
+    Busca aproximada por arquivo invertido (IVF): as amostras são agrupadas
+    por k-means em `n_lists` listas e cada consulta só examina as `n_probe`
+    listas de centróides mais próximos. Mais listas examinadas aumentam o
+    recall e o custo da consulta.
+    Parâmetros: `n_lists`, `n_probe`, `n_iter`, `train_size`, `seed`.
+    """
+    name = "ivf"
+
+    # Linhas processadas por vez na atribuição aos centróides (limita a memória)
+    _chunk_size = 4096
+
+    def fit(self, X: np.ndarray) -> "IVFIndex":
+        n_lists = max(1, min(int(self.params.get('n_lists', 64)), len(X)))
+        n_iter = int(self.params.get('n_iter', 10))
+        train_size = int(self.params.get('train_size', 50000))
+        rng = np.random.default_rng(self.params.get('seed', 0))
+
+        self.X = X
+        self.sq_norms = np.einsum('ij,ij->i', X, X)
+
+        # k-means treinado sobre uma amostra das linhas
+        sample = X[rng.choice(len(X), size=min(train_size, len(X)), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = self._assign(sample, centroids)
+            for list_id in range(n_lists):
+                members = sample[assignment == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+        self.centroids = centroids
+
+        assignment = self._assign(X, centroids)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        logger.info(f"Índice IVF construído: {n_lists} listas, {len(X)} amostras")
+        return self
+
+    def _assign(self, X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignment = np.empty(len(X), dtype=np.int64)
+        for start in range(0, len(X), self._chunk_size):
+            chunk = X[start:start + self._chunk_size]
+            assignment[start:start + len(chunk)] = _squared_distances(chunk, centroids, centroid_norms).argmin(axis=1)
+        return assignment
+
+    def search(self, Q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        n_probe = max(1, min(int(self.params.get('n_probe', 8)), len(self.lists)))
+        centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        _, probes = _top_k(_squared_distances(Q, self.centroids, centroid_norms), n_probe)
+
+        distances = np.full((len(Q), k), np.inf, dtype=np.float32)
+        indices = np.zeros((len(Q), k), dtype=np.int64)
+        for row, query in enumerate(Q):
+            candidates = np.concatenate([self.lists[i] for i in probes[row]])
+            if len(candidates) == 0:
+                continue
+            candidate_distances = _squared_distances(query[None, :], self.X[candidates], self.sq_norms[candidates])
+            found_distances, found = _top_k(candidate_distances, min(k, len(candidates)))
+            distances[row, :found.shape[1]] = found_distances[0]
+            indices[row, :found.shape[1]] = candidates[found[0]]
+        return distances, indices
+
+INDEX_BACKENDS: Dict[str, Type[NeighborIndex]] = {
+    BruteForceIndex.name: BruteForceIndex,
+    TreeIndex.name: TreeIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+def create_index(config: Dict[str, Any] = None) -> NeighborIndex:
+    """
+    Cria o índice a partir da configuração, por exemplo
+    {"backend": "ivf", "n_lists": 256, "n_probe": 16}.
+    """
+    config = dict(config or {})
+    backend = config.pop('backend', BruteForceIndex.name)
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Backend de índice desconhecido: {backend} "
+                         f"(opções: {', '.join(INDEX_BACKENDS)})")
+    return INDEX_BACKENDS[backend](**config)
@@ -3,6 +3,7 @@ import threading
 import logging
 import json
 from typing import Dict, Any, Callable
+from .framing import configure_socket, recv_message, send_message as send_framed
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,7 @@ class NetworkManager:
         while self.is_running:
             try:
                 client_socket, address = self.server_socket.accept()
+                configure_socket(client_socket)
                 logger.info(f"Conexão aceita de {address}")
                 self.connections.append(client_socket)
                 client_thread = threading.Thread(
@@ -42,11 +44,11 @@ class NetworkManager:
                     logger.error(f"Erro ao aceitar conexão: {str(e)}")
 
     def _handle_client(self, client_socket: socket.socket):
-        """Gerencia a comunicação com um cliente específico."""
+        """Gerencia a comunicação com um cliente específico (mensagens com prefixo de tamanho)."""
         try:
             while self.is_running:
-                data = client_socket.recv(4096)
-                if not data:
+                data = recv_message(client_socket)
+                if data is None:
                     break
                 message = data.decode('utf-8')
                 if self.message_handler:
@@ -61,7 +63,7 @@ class NetworkManager:
     def connect_to_server(self, host: str, port: int) -> socket.socket:
         """Conecta a um servidor remoto."""
         try:
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.client_socket = configure_socket(socket.socket(socket.AF_INET, socket.SOCK_STREAM))
             self.client_socket.connect((host, port))
             logger.info(f"Conectado ao servidor {host}:{port}")
             return self.client_socket
@@ -72,11 +74,12 @@ class NetworkManager:
     def send_message(self, message: str, target_socket: socket.socket = None):
         """Envia uma mensagem para um socket específico ou para todos os clientes conectados."""
         try:
+            payload = message.encode('utf-8')
             if target_socket:
-                target_socket.sendall(message.encode('utf-8'))
+                send_framed(target_socket, payload)
             else:
                 for conn in self.connections:
-                    conn.sendall(message.encode('utf-8'))
+                    send_framed(conn, payload)
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem: {str(e)}")
             raise
@@ -0,0 +1,101 @@
+import numpy as np
+import cv2
+import struct
+import threading
+from typing import Optional, Tuple
+
+# Formato das features usado no treinamento e na classificação
+FEATURE_SHAPE = (64, 64)
+FEATURE_LENGTH = FEATURE_SHAPE[0] * FEATURE_SHAPE[1]
+# Incrementar sempre que o pré-processamento mudar de forma incompatível
+PREPROCESSING_VERSION = 1
+
+# Modos de decodificação reduzida (fator de escala, flag do OpenCV), do maior para o menor
+_REDUCED_MODES = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+
+# Marcadores JPEG SOFn que carregam as dimensões da imagem
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                     0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_local = threading.local()
+
+def thread_buffer() -> np.ndarray:
+    """Retorna o buffer de features (1 x 4096, uint8) reutilizável da thread atual."""
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = np.empty((1, FEATURE_LENGTH), dtype=np.uint8)
+        _local.buffer = buffer
+    return buffer
+
+def probe_jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """Lê (largura, altura) do cabeçalho JPEG sem decodificar a imagem."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return width, height
+        segment_length = struct.unpack_from('>H', data, offset + 2)[0]
+        offset += 2 + segment_length
+    return None
+
+def select_decode_flag(data) -> int:
+    """
+    Escolhe o modo de decodificação em escala de cinza.
+
+    Para JPEGs muito maiores que 64x64 usa a decodificação reduzida do
+    libjpeg (1/2, 1/4 ou 1/8), que evita reconstruir a imagem inteira.
+    Demais formatos são decodificados direto em escala de cinza.
+    """
+    size = probe_jpeg_size(data)
+    if size is not None:
+        smallest = min(size)
+        for factor, flag in _REDUCED_MODES:
+            if smallest // factor >= FEATURE_SHAPE[0]:
+                return flag
+    return cv2.IMREAD_GRAYSCALE
+
+def extract_features(image_data, out: np.ndarray = None) -> np.ndarray:
+    """
+    Decodifica a imagem e escreve o vetor de features (4096 pixels em escala
+    de cinza) em `out`, que deve ser um buffer uint8 contíguo de 4096 posições.
+    """
+    nparr = np.frombuffer(image_data, np.uint8)
+    img = cv2.imdecode(nparr, select_decode_flag(nparr))
+    if img is None:
+        raise ValueError("Imagem inválida")
+
+    if out is None:
+        out = np.empty(FEATURE_LENGTH, dtype=np.uint8)
+    cv2.resize(img, FEATURE_SHAPE, dst=out.reshape(FEATURE_SHAPE))
+    return out
+
+def extract_features_from_file(path: str, out: np.ndarray = None) -> np.ndarray:
+    """Aplica o mesmo pré-processamento da classificação a um arquivo de imagem."""
+    return extract_features(np.fromfile(path, dtype=np.uint8), out)
+
+def feature_spec() -> dict:
+    """Descreve o vetor de features esperado (anunciado aos clientes pelo Service)."""
+    return {
+        'shape': list(FEATURE_SHAPE),
+        'dtype': 'uint8',
+        'length': FEATURE_LENGTH,
+        'preprocessing_version': PREPROCESSING_VERSION
+    }
+
+def features_from_bytes(data) -> np.ndarray:
+    """Interpreta um vetor de features recebido pela rede (sem cópia)."""
+    if len(data) != FEATURE_LENGTH:
+        raise ValueError(f"Vetor de features com {len(data)} bytes (esperado {FEATURE_LENGTH})")
+    return np.frombuffer(data, dtype=np.uint8)
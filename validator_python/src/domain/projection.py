@@ -0,0 +1,82 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Type
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class Projection(ABC):
+    """
+    Estágio de redução de dimensionalidade aplicado depois do StandardScaler.
+    A projeção é linear: transform(X) = (X - mean) @ components.T
+    """
+    name = ""
+
+    def __init__(self, dim: int = 128, seed: int = 0):
+        self.dim = int(dim)
+        self.seed = seed
+        self.mean: np.ndarray = None
+        self.components: np.ndarray = None
+
+    @abstractmethod
+    def fit(self, X: np.ndarray) -> "Projection":
+        """Ajusta a projeção sobre as features de treinamento já normalizadas."""
+        pass
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return ((X - self.mean) @ self.components.T).astype(np.float32)
+
+    def fit_transform(self, X: np.ndarray) -> np.ndarray:
+        return self.fit(X).transform(X)
+
+class PCAProjection(Projection):
+    """Componentes principais (preserva a maior variância possível em `dim` dimensões)."""
+    name = "pca"
+
+    def fit(self, X: np.ndarray) -> "PCAProjection":
+        from sklearn.decomposition import PCA
+        dim = min(self.dim, X.shape[0], X.shape[1])
+        if dim < self.dim:
+            logger.warning(f"Dimensão da PCA reduzida de {self.dim} para {dim} (poucas amostras)")
+        pca = PCA(n_components=dim, random_state=self.seed).fit(X)
+        self.dim = dim
+        self.mean = pca.mean_.astype(np.float32)
+        self.components = pca.components_.astype(np.float32)
+        logger.info(f"PCA ajustada: {X.shape[1]} -> {dim} dimensões "
+                    f"({pca.explained_variance_ratio_.sum() * 100:.1f}% da variância)")
+        return self
+
+class RandomProjection(Projection):
+    """Projeção gaussiana aleatória (não depende dos dados, preserva distâncias em média)."""
+    name = "random"
+
+    def fit(self, X: np.ndarray) -> "RandomProjection":
+        rng = np.random.default_rng(self.seed)
+        self.mean = np.zeros(X.shape[1], dtype=np.float32)
+        self.components = (rng.standard_normal((self.dim, X.shape[1])) / np.sqrt(self.dim)).astype(np.float32)
+        return self
+
+PROJECTIONS: Dict[str, Type[Projection]] = {
+    PCAProjection.name: PCAProjection,
+    RandomProjection.name: RandomProjection,
+}
+
+def restore_projection(method: str, mean: np.ndarray, components: np.ndarray) -> Projection:
+    """Recria uma projeção já ajustada a partir dos arrays persistidos."""
+    projection = PROJECTIONS[method](dim=components.shape[0])
+    projection.mean = mean
+    projection.components = components
+    return projection
+
+def create_projection(config: Dict[str, Any] = None) -> Optional[Projection]:
+    """
+    Cria a projeção a partir da configuração, por exemplo
+    {"method": "pca", "dim": 128}. Retorna None se o estágio estiver desativado.
+    """
+    config = dict(config or {})
+    method = config.pop('method', None)
+    if not method or method == 'none':
+        return None
+    if method not in PROJECTIONS:
+        raise ValueError(f"Projeção desconhecida: {method} (opções: {', '.join(PROJECTIONS)})")
+    return PROJECTIONS[method](**config)
@@ -0,0 +1,154 @@
+"""
+Protocolo de comunicação com o Service.
+
+v1 (legado): o cliente envia [8 bytes com o tamanho, big-endian][imagem], o
+serviço responde [8 bytes com o tamanho][JSON] e fecha a conexão.
+
+v2 (persistente e multiplexado): o cliente abre a conexão enviando HELLO (8
+bytes que, lidos como tamanho v1, seriam absurdos) e o serviço responde com o
+mesmo HELLO. A partir daí ambos trocam frames
+
+    [request_id: 8][tipo: 1][flags: 1][tamanho: 8][payload]
+
+na mesma conexão. Várias requisições podem estar em andamento ao mesmo tempo
+e as respostas voltam com o request_id da requisição, em qualquer ordem.
+Servidores que não respondem HELLO são tratados como v1.
+
+Além de imagens codificadas, o v2 aceita o vetor de features já extraído
+pelo cliente (FRAME_FEATURES: 64x64 bytes uint8 em escala de cinza, ver
+preprocessing). O formato esperado e a versão do pré-processamento são
+obtidos com FRAME_INFO; clientes só devem usar features se a versão
+coincidir com a sua.
+
+FRAME_BATCH leva várias imagens e/ou vetores de features em um único frame
+
+    [quantidade: 4] ([tipo do item: 1][tamanho: 4][dados])*
+
+e recebe uma única resposta JSON com listas paralelas de classes,
+confianças e erros (um por item, na ordem do envio).
+
+Quando a fila de trabalho do serviço está cheia, a requisição é respondida
+na hora com FRAME_ERROR (no v1, o mesmo JSON com "code": "overloaded"),
+para que clientes e balanceadores tentem outro serviço ou esperem.
+
+Com FLAG_DEADLINE nas flags, o payload começa com o orçamento de tempo da
+requisição em milissegundos ([orçamento: 4][payload]). O prazo é relativo,
+contado a partir do recebimento do frame, para não depender de relógios
+sincronizados; requisições cujo prazo expira na fila são descartadas e
+respondidas com FRAME_ERROR ("code": "deadline_exceeded").
+
+FRAME_CANCEL (payload vazio) cancela a requisição de mesmo request_id
+enviada antes na mesma conexão, por exemplo a cópia perdedora de uma
+requisição duplicada (hedging). Se ela ainda estiver na fila, é descartada
+sem resposta; se já estiver em processamento, a resposta é enviada
+normalmente e o cliente a ignora.
+
+Com FLAG_TRACE, o payload (depois do prazo, se houver) começa com o rastro da
+requisição (ver tracing.Trace): os próximos saltos que ela deve percorrer e
+os instantes registrados por cada componente. Balanceadores e serviços
+acrescentam seus eventos ao repassá-la; o serviço que recebe uma imagem com
+saltos restantes extrai as features e as encaminha (FRAME_FEATURES) ao
+próximo salto. A resposta volta com FLAG_TRACE e o rastro completo antes do
+JSON; respostas de erro não levam rastro.
+
+As funções de E/S em sockets bloqueantes ficam em framing.
+"""
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+HELLO = b'PASID\x00v2'
+LENGTH_PREFIX = 8
+# Limite de tamanho de um payload (protege contra tamanhos corrompidos ou maliciosos)
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+FRAME_HEADER = struct.Struct('>QBBQ')
+
+# Tipos de frame
+FRAME_IMAGE = 1       # requisição: bytes da imagem codificada
+FRAME_RESPONSE = 2    # resposta: JSON
+FRAME_FEATURES = 3    # requisição: vetor de features uint8 (FEATURE_LENGTH bytes)
+FRAME_INFO = 4        # requisição (payload vazio): formato das features e versões
+FRAME_BATCH = 5       # requisição: lote de imagens e/ou vetores de features
+FRAME_ERROR = 6       # resposta: requisição rejeitada sem processamento (JSON com "code", ex.: "overloaded")
+FRAME_CANCEL = 7      # requisição (payload vazio): cancela a requisição de mesmo request_id, sem resposta
+
+# Flags de frame
+FLAG_DEADLINE = 0x01  # payload prefixado com o orçamento de tempo (DEADLINE_BUDGET)
+FLAG_TRACE = 0x02     # payload (após o prazo) e resposta prefixados com o rastro (tracing.Trace)
+
+DEADLINE_BUDGET = struct.Struct('>I')
+BATCH_COUNT = struct.Struct('>I')
+BATCH_ITEM = struct.Struct('>BI')
+
+Frame = Tuple[int, int, int, bytes]
+BatchItem = Tuple[int, bytes]
+
+def encode_frame(request_id: int, frame_type: int, payload: bytes, flags: int = 0) -> bytes:
+    return FRAME_HEADER.pack(request_id, frame_type, flags, len(payload)) + payload
+
+def encode_deadline(budget: float) -> bytes:
+    """Codifica um orçamento de tempo (em segundos) como prefixo de payload."""
+    return DEADLINE_BUDGET.pack(max(0, min(int(budget * 1000), 0xFFFFFFFF)))
+
+def split_deadline(flags: int, payload, received_at: float) -> Tuple[Optional[float], memoryview]:
+    """
+    Separa o prazo do payload de um frame. Retorna (prazo absoluto em
+    time.monotonic(), ou None se o frame não tiver prazo, payload sem o prefixo).
+    """
+    if not flags & FLAG_DEADLINE:
+        return None, payload
+    view = memoryview(payload).cast('B')
+    if len(view) < DEADLINE_BUDGET.size:
+        raise ValueError("Frame com prazo sem o orçamento de tempo")
+    (budget_ms,) = DEADLINE_BUDGET.unpack_from(view)
+    return received_at + budget_ms / 1000.0, view[DEADLINE_BUDGET.size:]
+
+def encode_batch(items: Sequence[BatchItem]) -> List[bytes]:
+    """
+    Monta o payload de FRAME_BATCH a partir de pares (tipo, dados). Retorna a
+    lista de partes (cabeçalhos e dados, sem cópia) para envio com send_parts.
+    """
+    parts = [BATCH_COUNT.pack(len(items))]
+    for item_type, data in items:
+        if item_type not in (FRAME_IMAGE, FRAME_FEATURES):
+            raise ValueError(f"Tipo de item inválido em lote: {item_type}")
+        parts.append(BATCH_ITEM.pack(item_type, len(data)))
+        parts.append(data)
+    return parts
+
+def decode_batch(payload, max_items: int = None) -> List[Tuple[int, memoryview]]:
+    """Separa o payload de FRAME_BATCH em pares (tipo, dados), sem copiar os dados."""
+    view = memoryview(payload).cast('B')
+    if len(view) < BATCH_COUNT.size:
+        raise ValueError("Lote sem cabeçalho")
+    (count,) = BATCH_COUNT.unpack_from(view)
+    if max_items is not None and count > max_items:
+        raise ValueError(f"Lote com {count} itens excede o limite de {max_items}")
+    offset = BATCH_COUNT.size
+    items = []
+    for _ in range(count):
+        if offset + BATCH_ITEM.size > len(view):
+            raise ValueError("Lote truncado")
+        item_type, length = BATCH_ITEM.unpack_from(view, offset)
+        offset += BATCH_ITEM.size
+        if offset + length > len(view):
+            raise ValueError("Lote truncado")
+        items.append((item_type, view[offset:offset + length]))
+        offset += length
+    if offset != len(view):
+        raise ValueError("Bytes extras após o último item do lote")
+    return items
+
+async def read_frame(reader) -> Optional[Frame]:
+    """Versão asyncio de recv_frame (reader é um asyncio.StreamReader)."""
+    import asyncio
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    request_id, frame_type, flags, length = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame de {length} bytes excede o limite de {MAX_FRAME_SIZE} bytes")
+    return request_id, frame_type, flags, await reader.readexactly(length)
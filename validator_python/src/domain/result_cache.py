@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Cache de resultados de classificação endereçado pelo conteúdo da imagem.
+
+    A chave é um hash BLAKE2b dos bytes recebidos, de modo que uma imagem
+    repetida dispensa decodificação e inferência. O tamanho é limitado a
+    `max_entries` (descarte LRU) e cada entrada expira após `ttl` segundos.
+    Quando `version_fn` retorna uma versão de modelo diferente (novo
+    treinamento ou recarga), o cache inteiro é invalidado.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0,
+                 version_fn: Callable[[], Any] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = version_fn() if version_fn else None
+
+        # Estatísticas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(data: bytes, namespace: bytes = b'') -> bytes:
+        """Calcula a chave do cache para os bytes de uma imagem (ou de outro tipo de entrada, via `namespace`)."""
+        return hashlib.blake2b(data, digest_size=16, person=namespace).digest()
+
+    def _check_version(self):
+        """Descarta todas as entradas se o modelo mudou. Deve ser chamado com o lock."""
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                logger.info("Modelo alterado, cache de resultados invalidado")
+            self._entries.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Retorna o resultado armazenado ou None (miss ou entrada expirada)."""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, value: Any, version: Any = None):
+        """
+        Armazena um resultado, descartando o menos usado recentemente se necessário.
+        Se `version` for informada e o modelo já tiver mudado, o resultado
+        (calculado com o modelo antigo) é descartado.
+        """
+        with self._lock:
+            self._check_version()
+            if version is not None and version != self._version:
+                return
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import threading
+import logging
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class OverloadedError(Exception):
+    """Fila de trabalho cheia: a requisição foi rejeitada sem ser processada."""
+    pass
+
+class DeadlineExceededError(Exception):
+    """O prazo da requisição expirou antes do processamento; ela foi descartada."""
+    pass
+
+def overloaded_response(error: Exception) -> Dict[str, Any]:
+    """Resposta enviada a uma requisição rejeitada pelo controle de admissão."""
+    return {"status": "error", "code": "overloaded", "error": str(error)}
+
+def deadline_response(error: Exception) -> Dict[str, Any]:
+    """Resposta enviada a uma requisição descartada por prazo expirado."""
+    return {"status": "error", "code": "deadline_exceeded", "error": str(error)}
+
+def rejection_response(error: Exception) -> Dict[str, Any]:
+    """Resposta FRAME_ERROR para uma requisição rejeitada (sobrecarga ou prazo)."""
+    if isinstance(error, DeadlineExceededError):
+        return deadline_response(error)
+    return overloaded_response(error)
+
+class RequestScheduler:
+    """
+    Fila de trabalho limitada do Service (controle de admissão).
+
+    Um número fixo de threads (`max_concurrency`) executa as requisições; as
+    demais esperam em uma fila de no máximo `max_queue` itens. Com a fila
+    cheia, submit() lança OverloadedError imediatamente, para que a
+    sobrecarga apareça como rejeições rápidas e não como latência e memória
+    crescendo sem limite.
+
+    A fila é ordenada pelo prazo (earliest deadline first): requisições com
+    prazo são atendidas antes das sem prazo, e as que já expiraram quando
+    chegam à frente da fila são descartadas sem gastar CPU. Os prazos são
+    instantes absolutos de time.monotonic().
+    Requisições canceladas (Future.cancel()) enquanto esperam também são
+    descartadas.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_queue: int = 128, name: str = "request"):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.name = name
+        self._queue = []  # heap de (prazo, sequência, future, fn, args)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = []
+        self.running = False
+
+        # Estatísticas
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_depth = 0
+        self.dropped = 0
+        self.late = 0
+        self.cancelled = 0
+
+    def start(self):
+        """Inicia as threads de execução."""
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        for i in range(self.max_concurrency):
+            worker = threading.Thread(target=self._run, name=f"{self.name}-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Fila de requisições iniciada (concorrência: {self.max_concurrency}, "
+                    f"fila máxima: {self.max_queue})")
+
+    def stop(self):
+        """Para as threads e falha as requisições que ainda estavam na fila."""
+        with self._cond:
+            self.running = False
+            pending, self._queue = self._queue, []
+            self._cond.notify_all()
+        for _, _, future, _, _ in pending:
+            future.set_exception(RuntimeError("Fila de requisições finalizada"))
+
+    @property
+    def depth(self) -> int:
+        """Número de requisições aguardando na fila."""
+        return len(self._queue)
+
+    def submit(self, fn: Callable, *args, deadline: Optional[float] = None) -> Future:
+        """
+        Enfileira fn(*args) e retorna um Future; lança OverloadedError se a fila
+        estiver cheia. Se o `deadline` passar antes da execução, o Future falha
+        com DeadlineExceededError.
+        """
+        future = Future()
+        with self._cond:
+            if not self.running:
+                raise RuntimeError("Fila de requisições não está em execução")
+            if len(self._queue) + self.in_flight >= self.max_queue + self.max_concurrency:
+                self.rejected += 1
+                raise OverloadedError(f"Serviço sobrecarregado ({len(self._queue)} requisições na fila)")
+            key = deadline if deadline is not None else float('inf')
+            heapq.heappush(self._queue, (key, next(self._seq), future, fn, args))
+            self.accepted += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_depth,
+                "queue_limit": self.max_queue,
+                "in_flight": self.in_flight,
+                "concurrency_limit": self.max_concurrency,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "late": self.late,
+                "cancelled": self.cancelled
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and not self._queue:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                deadline, _, future, fn, args = heapq.heappop(self._queue)
+                if future.cancelled():
+                    # Cancelada pelo cliente enquanto esperava (FRAME_CANCEL)
+                    self.cancelled += 1
+                    continue
+                if time.monotonic() > deadline:
+                    self.dropped += 1
+                    future.set_exception(DeadlineExceededError("Prazo da requisição expirou na fila"))
+                    continue
+                self.in_flight += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+                    if not future.cancelled() and future.exception() is None:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    if time.monotonic() > deadline:
+                        self.late += 1
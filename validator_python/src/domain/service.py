@@ -1,58 +1,123 @@
 import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.preprocessing import StandardScaler
-import cv2
-import pickle
 import os
 import logging
 import time
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import json
 import socket
 import threading
+import multiprocessing
 import yaml
+from concurrent.futures import Future, ProcessPoolExecutor, wait as futures_wait
+from .inference import InferenceEngine
+from .neighbor_index import create_index
+from .projection import create_projection
+from .preprocessing import (FEATURE_LENGTH, PREPROCESSING_VERSION, extract_features, extract_features_from_file, feature_spec,
+                            features_from_bytes, thread_buffer)
+from .batcher import InferenceBatcher
+from .async_server import AsyncServiceServer
+from .protocol import (HELLO, LENGTH_PREFIX, FRAME_IMAGE, FRAME_RESPONSE, FRAME_FEATURES, FRAME_INFO,
+                       FRAME_BATCH, FRAME_ERROR, FRAME_CANCEL, FLAG_TRACE, decode_batch, split_deadline)
+from .scheduler import (DeadlineExceededError, OverloadedError, RequestScheduler, overloaded_response,
+                        rejection_response)
+from .framing import configure_socket, recv_exact, recv_frame, recv_header, send_frame, send_message
+from .result_cache import ResultCache
+from .service_client import ServiceClient
+from .connection_pool import ConnectionPool
+from .tracing import Trace, TracedForward, TRACE_RECEIVED, TRACE_STARTED, TRACE_FINISHED, TRACE_FORWARDED, \
+    TRACE_REPLY_RECEIVED, TRACE_REPLIED
+from .hedging import HedgeTimer
+from .feature_store import FeatureStore
+from .model_artifact import arrays_from_sklearn, load_artifact, save_artifact
 
 logger = logging.getLogger(__name__)
 
+# Um treinamento por vez em cada processo (ver ImageClassifierService._train_model)
+_training_lock = threading.Lock()
+
+# Timeouts das requisições encaminhadas ao próximo salto (ver Service.forward_traced).
+# O cancelamento (envio de FRAME_CANCEL) roda no executor do HedgeTimer, fora da
+# thread que acompanha os prazos: um socket preso não atrasa os demais timeouts
+_forward_timeouts = HedgeTimer("forward-timeouts")
+
+def _extract_training_image(img_path: str) -> Tuple[np.ndarray, str]:
+    """Extrai as features de uma imagem de treinamento (executada nos processos do pool)."""
+    try:
+        return extract_features_from_file(img_path), None
+    except Exception as e:
+        return None, str(e)
+
 class ImageClassifierService:
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, model_config: Dict[str, Any] = None):
+        self.model_config = model_config or {}
         self.model = None
         self.scaler = StandardScaler()
+        self.projection = None
+        self.engine = None
+        # Incrementada a cada novo modelo (invalida caches de resultados)
+        self.model_version = 0
         self.is_training = False
-        self.model_path = model_path or 'vehicle_classifier.pkl'
+        
+        # Artefato do modelo (diretório com arrays mapeáveis em memória); o
+        # pickle legado de mesmo nome não é convertido (ver _load_model)
+        model_path = model_path or 'vehicle_classifier.model'
+        base, ext = os.path.splitext(model_path)
+        if ext == '.pkl':
+            self.model_path, self.legacy_model_path = base + '.model', model_path
+        else:
+            self.model_path, self.legacy_model_path = model_path, base + '.pkl'
         
         # Carrega o modelo se existir
         if os.path.exists(self.model_path):
             self._load_model()
         else:
+            if os.path.exists(self.legacy_model_path):
+                # As features do pickle vêm do pré-processamento anterior à versão 1 e só
+                # poderiam ser refeitas a partir das imagens, isto é, treinando de novo
+                logger.warning(f"Modelo legado {self.legacy_model_path} usa um pré-processamento "
+                               f"incompatível com a versão {PREPROCESSING_VERSION}: treinando um modelo novo")
             self._train_model()
     
     def _load_model(self):
-        """Carrega o modelo treinado."""
+        """
+        Carrega o artefato do modelo. Os checksums já são calculados ao
+        publicar o artefato; conferi-los a cada partida (`verify_checksum` na
+        configuração do modelo) é opcional, pois lê todos os arrays do disco.
+        """
         try:
-            with open(self.model_path, 'rb') as f:
-                data = pickle.load(f)
-                self.model = data['model']
-                self.scaler = data['scaler']
+            arrays, meta = load_artifact(self.model_path, verify=self.model_config.get('verify_checksum', False))
+            self.engine = self._build_engine(arrays, meta)
+            self.projection = self.engine.projection
+            self.model_version += 1
             logger.info("Modelo carregado com sucesso")
         except Exception as e:
             logger.error(f"Erro ao carregar modelo: {str(e)}")
             self._train_model()
     
-    def _save_model(self):
+    def _build_engine(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> InferenceEngine:
+        """Cria o motor de inferência com o índice de vizinhos definido na configuração."""
+        index = create_index(self.model_config.get('index'))
+        logger.info(f"Índice de vizinhos: {index.name}")
+        return InferenceEngine.from_arrays(arrays, meta, index=index)
+    
+    def _save_model(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
         """Salva o modelo treinado."""
         try:
-            with open(self.model_path, 'wb') as f:
-                pickle.dump({
-                    'model': self.model,
-                    'scaler': self.scaler
-                }, f)
+            save_artifact(self.model_path, arrays, meta)
             logger.info("Modelo salvo com sucesso")
         except Exception as e:
             logger.error(f"Erro ao salvar modelo: {str(e)}")
     
     def _train_model(self):
         """Treina o modelo KNN com imagens de carros e motos."""
+        # Serviços no mesmo processo (modo thread) treinam um de cada vez: cada
+        # treinamento usa todos os núcleos e grava o mesmo cache e artefato
+        with _training_lock:
+            self._train_model_locked()
+    
+    def _train_model_locked(self):
         logger.info("Iniciando treinamento do modelo...")
         self.is_training = True
         
@@ -60,127 +125,231 @@ class ImageClassifierService:
         car_dir = "data/train/cars"
         bike_dir = "data/train/bikes"
         
-        # Carrega e processa as imagens
-        X = []  # Features
-        y = []  # Labels (0 para carros, 1 para motos)
-        
-        # Processa imagens de carros
-        for img_name in os.listdir(car_dir):
-            if img_name.endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                img_path = os.path.join(car_dir, img_name)
-                try:
-                    img = cv2.imread(img_path)
-                    if img is not None:
-                        # Redimensiona para 64x64 e converte para escala de cinza
-                        img = cv2.resize(img, (64, 64))
-                        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                        # Aplana a imagem
-                        features = img.flatten()
-                        X.append(features)
-                        y.append(0)  # 0 para carros
-                        logger.info(f"Imagem processada: {img_path}")
-                except Exception as e:
-                    logger.error(f"Erro ao processar imagem {img_path}: {str(e)}")
+        # Lista as imagens de treinamento (0 para carros, 1 para motos)
+        samples = []
+        for label, train_dir in ((0, car_dir), (1, bike_dir)):
+            if not os.path.isdir(train_dir):
+                logger.warning(f"Diretório de treinamento não encontrado: {train_dir}")
+                continue
+            for img_name in os.listdir(train_dir):
+                if img_name.endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                    samples.append((os.path.join(train_dir, img_name), label))
         
-        # Processa imagens de motos
-        for img_name in os.listdir(bike_dir):
-            if img_name.endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                img_path = os.path.join(bike_dir, img_name)
-                try:
-                    img = cv2.imread(img_path)
-                    if img is not None:
-                        img = cv2.resize(img, (64, 64))
-                        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                        features = img.flatten()
-                        X.append(features)
-                        y.append(1)  # 1 para motos
-                        logger.info(f"Imagem processada: {img_path}")
-                except Exception as e:
-                    logger.error(f"Erro ao processar imagem {img_path}: {str(e)}")
+        X, y = self._extract_training_features(samples)
         
-        if not X:
+        if not len(y):
             raise ValueError("Nenhuma imagem válida encontrada para treinamento")
         
-        # Converte para arrays numpy
-        X = np.array(X)
-        y = np.array(y)
-        
         # Normaliza os dados
         X = self.scaler.fit_transform(X)
         
+        # Reduz a dimensionalidade, se configurado
+        self.projection = create_projection(self.model_config.get('projection'))
+        if self.projection is not None:
+            X = self.projection.fit_transform(X)
+        
         # Treina o modelo KNN
         self.model = KNeighborsClassifier(n_neighbors=5)
         self.model.fit(X, y)
+        arrays, meta = arrays_from_sklearn(self.model, self.scaler, self.projection)
+        self.engine = self._build_engine(arrays, meta)
+        self.model_version += 1
         
         # Salva o modelo
-        self._save_model()
+        self._save_model(arrays, meta)
         self.is_training = False
         logger.info("Treinamento concluído com sucesso")
     
+    def _extract_training_features(self, samples: List[Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extrai as features das imagens de treinamento. Imagens inalteradas vêm do
+        cache em disco; as novas ou modificadas são decodificadas em paralelo
+        por um pool de processos.
+        """
+        training = self.model_config.get('training', {})
+        cache_path = training.get('feature_cache', 'feature_cache')
+        store = FeatureStore(cache_path) if cache_path else None
+        
+        # Preenche o buffer de features pré-alocado com o que já está no cache
+        X = np.empty((len(samples), FEATURE_LENGTH), dtype=np.uint8)
+        valid = np.ones(len(samples), dtype=bool)
+        stamps = []
+        missing = []
+        for row, (img_path, _) in enumerate(samples):
+            try:
+                stamp = FeatureStore.stamp(img_path)
+            except OSError as e:
+                logger.error(f"Erro ao processar imagem {img_path}: {str(e)}")
+                stamp, valid[row] = None, False
+            stamps.append(stamp)
+            cached = store.lookup(img_path, stamp) if store and stamp else None
+            if cached is not None:
+                X[row] = cached
+            elif stamp:
+                missing.append(row)
+        logger.info(f"Features em cache: {len(samples) - len(missing)} imagens, a processar: {len(missing)}")
+        
+        # Decodifica as imagens restantes, em paralelo se compensar
+        paths = [samples[row][0] for row in missing]
+        workers = training.get('workers') or os.cpu_count() or 1
+        if workers > 1 and len(paths) >= 2 * workers:
+            # "spawn": o treinamento pode rodar em uma thread de um servidor já em execução,
+            # e um fork copiaria o processo com as travas das outras threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                chunksize = max(1, len(paths) // (workers * 4))
+                results = list(executor.map(_extract_training_image, paths, chunksize=chunksize))
+        else:
+            results = [_extract_training_image(path) for path in paths]
+        
+        for row, (features, error) in zip(missing, results):
+            img_path = samples[row][0]
+            if features is None:
+                logger.error(f"Erro ao processar imagem {img_path}: {error}")
+                valid[row] = False
+                continue
+            X[row] = features
+            logger.info(f"Imagem processada: {img_path}")
+        
+        X = X[valid]
+        y = np.array([label for (_, label), ok in zip(samples, valid) if ok])
+        if store and len(y):
+            try:
+                store.save([path for (path, _), ok in zip(samples, valid) if ok],
+                           [stamp for stamp, ok in zip(stamps, valid) if ok], X)
+            except Exception as e:
+                logger.error(f"Erro ao salvar cache de features: {str(e)}")
+        return X, y
+    
+    def extract_features(self, image_data: bytes, out: np.ndarray = None) -> np.ndarray:
+        """Decodifica a imagem e retorna o vetor de features (64x64 em escala de cinza)."""
+        return extract_features(image_data, out)
+    
+    def predict_features(self, features: np.ndarray) -> List[Tuple[str, float]]:
+        """Classifica uma matriz de features (uma linha por imagem) em uma única chamada."""
+        # Normalização e busca de vizinhos em um único passo
+        predictions, confidences = self.engine.predict(features)
+        
+        results = []
+        for prediction, confidence in zip(predictions, confidences):
+            class_name = "Carro" if prediction == 0 else "Moto"
+            results.append((class_name, confidence))
+        return results
+    
     def classify_image(self, image_data: bytes) -> Tuple[str, float]:
         """Classifica uma imagem e retorna a classe e a confiança."""
         try:
-            # Converte os bytes da imagem para array numpy
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                raise ValueError("Imagem inválida")
-            
-            # Processa a imagem
-            img = cv2.resize(img, (64, 64))
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            features = img.flatten().reshape(1, -1)
-            
-            # Normaliza os dados
-            features = self.scaler.transform(features)
-            
-            # Faz a predição
-            prediction = self.model.predict(features)[0]
-            probabilities = self.model.predict_proba(features)[0]
-            confidence = probabilities[prediction]
-            
-            # Retorna a classe e a confiança
-            class_name = "Carro" if prediction == 0 else "Moto"
-            return class_name, confidence
+            features = self.extract_features(image_data, out=thread_buffer()[0])
+            features = features.reshape(1, -1)
+            return self.predict_features(features)[0]
             
         except Exception as e:
             logger.error(f"Erro ao classificar imagem: {str(e)}")
             raise
+    
+    def classify_features(self, features: np.ndarray) -> Tuple[str, float]:
+        """Classifica um vetor de features já extraído pelo cliente."""
+        return self.predict_features(features.reshape(1, -1))[0]
 
 class Service:
     def __init__(self, config_path: str):
+        self.config_path = config_path
         with open(config_path, 'r') as f:
             self.config = yaml.safe_load(f)
         
-        self.classifier = ImageClassifierService()
+        self.classifier = ImageClassifierService(model_config=self.config.get('model'))
         self.running = False
         self.server_socket = None
         
         # Configuração do servidor
         self.host = self.config['service'].get('host', 'localhost')
         self.port = self.config['service'].get('port', 0)
+        self.reuse_port = self.config['service'].get('reuse_port', False) and hasattr(socket, 'SO_REUSEPORT')
+        self.train_on_start = self.config['service'].get('train_on_start', True)
+        self.backlog = self.config['service'].get('backlog', 128)
+        # Limite de itens por requisição em lote (FRAME_BATCH)
+        self.max_batch_items = self.config['service'].get('max_batch_items', 1024)
+        # "threaded" (uma thread por conexão) ou "asyncio" (event loop + executor limitado)
+        self.server_mode = self.config['service'].get('server_mode', 'threaded')
+        self.async_server = None
+        # Fila de trabalho limitada (controle de admissão): as requisições
+        # excedentes são rejeitadas com "overloaded" em vez de acumularem
+        admission = self.config['service'].get('admission', {})
+        self.scheduler = RequestScheduler(
+            max_concurrency=admission.get('max_concurrency',
+                                          self.config['service'].get('multiplex_workers', 32)),
+            max_queue=admission.get('max_queue', 128)
+        )
+        
+        # Configuração do micro-batching de inferência
+        batching = self.config['service'].get('batching', {})
+        self.batcher = None
+        if batching.get('enabled', False):
+            self.batcher = InferenceBatcher(
+                self.classifier,
+                max_batch_size=batching.get('max_batch_size', 32),
+                max_wait=batching.get('max_wait_ms', 5) / 1000.0
+            )
+        
+        # Cache de resultados endereçado pelo conteúdo da imagem
+        cache = self.config['service'].get('cache', {})
+        self.result_cache = None
+        if cache.get('enabled', False):
+            self.result_cache = ResultCache(
+                max_entries=cache.get('max_entries', 1024),
+                ttl=cache.get('ttl_seconds', 300),
+                version_fn=lambda: self.classifier.model_version
+            )
+        
+        # Encaminhamento de requisições rastreadas ao próximo salto (ver process_traced)
+        self.forwarding = self.config['service'].get('forwarding', {})
+        self.downstream: Dict[str, ConnectionPool] = {}
+        self._downstream_lock = threading.Lock()
         
         logger.info(f"Serviço inicializado em {self.host}:{self.port}")
     
+    @property
+    def address(self) -> str:
+        """Endereço do serviço (nome do componente no rastro das requisições)."""
+        return f"{self.host}:{self.port}"
+    
+    def _start_background_tasks(self):
+        """Inicia o treinamento em segundo plano e o batcher de inferência."""
+        # Inicia o treinamento do modelo em uma thread separada
+        if self.train_on_start:
+            training_thread = threading.Thread(target=self.classifier._train_model)
+            training_thread.daemon = True
+            training_thread.start()
+        
+        if self.batcher:
+            self.batcher.start()
+    
     def start(self):
         """Inicia o servidor."""
+        if self.server_mode == 'asyncio':
+            self.async_server = AsyncServiceServer(self)
+            self._start_background_tasks()
+            self.running = True
+            self.async_server.run()
+            return
+        
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                # Permite que vários processos escutem na mesma porta (o kernel distribui as conexões)
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            self.server_socket.listen(self.backlog)
             self.port = self.server_socket.getsockname()[1]  # Obtém a porta real se foi especificado 0
             logger.info(f"Servidor iniciado em {self.host}:{self.port}")
-            
-            # Inicia o treinamento do modelo em uma thread separada
-            training_thread = threading.Thread(target=self.classifier._train_model)
-            training_thread.daemon = True
-            training_thread.start()
+            self.running = True
+            self.scheduler.start()
+            self._start_background_tasks()
             
             while True:
                 try:
                     client_socket, address = self.server_socket.accept()
+                    configure_socket(client_socket)
                     logger.info(f"Conexão aceita de {address}")
                     client_thread = threading.Thread(
                         target=self._handle_client,
@@ -202,59 +371,354 @@ class Service:
                 self.server_socket.close()
                 logger.info("Servidor encerrado")
     
+    def _classify(self, data: bytes, frame_type: int = FRAME_IMAGE) -> Tuple[str, float, bool]:
+        """
+        Classifica uma imagem (ou um vetor de features, em FRAME_FEATURES)
+        consultando antes o cache de resultados. Retorna (classe, confiança, cache_hit).
+        """
+        is_features = frame_type == FRAME_FEATURES
+        key = None
+        if self.result_cache is not None:
+            key = self.result_cache.key(data, namespace=b'features' if is_features else b'')
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached[0], cached[1], True
+        
+        version = self.classifier.model_version
+        if is_features:
+            features = features_from_bytes(data)
+            if self.batcher:
+                class_name, confidence = self.batcher.classify_features(features)
+            else:
+                class_name, confidence = self.classifier.classify_features(features)
+        elif self.batcher:
+            class_name, confidence = self.batcher.classify(data)
+        else:
+            class_name, confidence = self.classifier.classify_image(data)
+        
+        if key is not None:
+            self.result_cache.put(key, (class_name, confidence), version=version)
+        return class_name, confidence, False
+    
+    def handle_request(self, frame_type: int, payload: bytes, trace: Trace = None,
+                       deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Atende uma requisição do protocolo v2 de acordo com o tipo do frame.
+        Requisições rastreadas registram seus eventos em `trace` e, no
+        primeiro estágio de uma cadeia, retornam um TracedForward (ver
+        process_traced).
+        """
+        if trace is not None:
+            return self.process_traced(frame_type, payload, trace, deadline)
+        if frame_type in (FRAME_IMAGE, FRAME_FEATURES):
+            return self.process_image(payload, frame_type)
+        if frame_type == FRAME_BATCH:
+            return self.process_batch(payload)
+        if frame_type == FRAME_INFO:
+            return self.describe()
+        raise ValueError(f"Tipo de frame desconhecido: {frame_type}")
+    
+    def process_traced(self, frame_type: int, payload: bytes, trace: Trace,
+                       deadline: Optional[float] = None):
+        """
+        Atende uma requisição rastreada. Se a rota ainda tiver saltos, este é
+        o primeiro estágio da cadeia: extrai as features da imagem e retorna
+        um TracedForward, que quem chamou entrega a forward_traced depois de
+        liberar o worker; caso contrário, classifica como process_image. Em
+        ambos os casos o rastro recebe os instantes de início e fim do
+        processamento.
+        """
+        trace.stamp(self.address, TRACE_STARTED)
+        next_hop = trace.next_hop() if frame_type == FRAME_IMAGE else None
+        if next_hop is None:
+            response = self.process_image(payload, frame_type)
+            trace.stamp(self.address, TRACE_FINISHED)
+            return response
+        
+        features = self.classifier.extract_features(payload)
+        trace.stamp(self.address, TRACE_FINISHED)
+        return TracedForward(next_hop, features, deadline)
+    
+    def forward_traced(self, forward: TracedForward, trace: Trace) -> Future:
+        """
+        Encaminha as features (FRAME_FEATURES, com o rastro e o que resta do
+        prazo) ao próximo salto sem esperar a resposta: o Future retornado é
+        concluído com a resposta (dict) pelo callback da resposta do próximo
+        salto. Sem resposta até o prazo (ou o timeout de `forwarding`), a
+        requisição é cancelada no próximo salto (FRAME_CANCEL) e o Future
+        falha com socket.timeout; cancelar o Future também a cancela.
+        """
+        budget = None
+        if forward.deadline is not None:
+            budget = forward.deadline - time.monotonic()
+            if budget <= 0:
+                raise DeadlineExceededError("Prazo da requisição expirou antes do encaminhamento")
+        pool = self._downstream_pool(forward.next_hop)
+        client = pool.acquire()
+        try:
+            trace.stamp(self.address, TRACE_FORWARDED)
+            downstream = client.submit(forward.features, FRAME_FEATURES, deadline=budget, trace=trace)
+        except Exception:
+            pool.release(client)
+            raise
+        timeout = client.timeout if budget is None else min(client.timeout, budget)
+        result = Future()
+        
+        def on_reply(f):
+            HedgeTimer.cancel(timer)
+            pool.release(client)
+            if not result.set_running_or_notify_cancel():
+                return  # Cancelada pelo cliente
+            try:
+                if f.cancelled():
+                    raise socket.timeout(f"Sem resposta de {forward.next_hop} em {timeout:.3f}s")
+                response = json.loads(f.result())
+                if f.trace is None:
+                    raise RuntimeError(f"{forward.next_hop} respondeu sem o rastro da requisição")
+            except Exception as e:
+                result.set_exception(e)
+                return
+            # O rastro devolvido já contém os eventos anteriores ao encaminhamento
+            trace.events = f.trace.events
+            trace.stamp(self.address, TRACE_REPLY_RECEIVED)
+            result.set_result(response)
+        
+        def on_cancel(r):
+            if r.cancelled():
+                client.cancel(downstream)
+        
+        # ServiceClient.cancel falha o Future (on_reply entrega o timeout) antes de enviar FRAME_CANCEL
+        timer = _forward_timeouts.schedule(timeout, lambda: client.cancel(downstream))
+        result.add_done_callback(on_cancel)
+        downstream.add_done_callback(on_reply)
+        return result
+    
+    def _downstream_pool(self, address: str) -> ConnectionPool:
+        pool = self.downstream.get(address)
+        if pool is None:
+            with self._downstream_lock:
+                pool = self.downstream.get(address)
+                if pool is None:
+                    timeout = self.forwarding.get('timeout', 10)
+                    pool = self.downstream[address] = ConnectionPool.from_config(
+                        lambda: ServiceClient(address, timeout=timeout).connect(),
+                        self.forwarding.get('connection_pool'), name=f"{self.address}->{address}")
+        return pool
+    
+    def _serve_multiplexed(self, client_socket: socket.socket, address: Tuple[str, int]):
+        """
+        Atende uma conexão persistente do protocolo v2: os frames são lidos em
+        sequência e cada requisição entra na fila de trabalho do serviço; as
+        respostas são enviadas assim que ficam prontas, em qualquer ordem.
+        Com a fila cheia, a requisição é respondida na hora com FRAME_ERROR;
+        frames com prazo são ordenados por ele e descartados se expirarem.
+        FRAME_CANCEL retira da fila a requisição indicada, sem resposta.
+        Respostas de requisições rastreadas levam o rastro (FLAG_TRACE); no
+        primeiro estágio de uma cadeia, o worker é liberado após extrair as
+        features e a resposta do próximo salto conclui a requisição.
+        """
+        client_socket.sendall(HELLO)
+        send_lock = threading.Lock()
+        in_flight: Dict[int, Future] = {}
+        traces: Dict[int, Trace] = {}
+        
+        def send(request_id: int, frame_type: int, response: Dict[str, Any], trace: Trace = None):
+            try:
+                data = json.dumps(response).encode()
+                with send_lock:
+                    if trace is None:
+                        send_frame(client_socket, request_id, frame_type, data)
+                    else:
+                        trace.stamp(self.address, TRACE_REPLIED)
+                        send_frame(client_socket, request_id, frame_type, [trace.encode(), data], FLAG_TRACE)
+            except OSError as e:
+                logger.error(f"Erro ao enviar resposta {request_id} para {address}: {str(e)}")
+        
+        def respond(request_id: int, future):
+            in_flight.pop(request_id, None)
+            trace = traces.pop(request_id, None)
+            if future.cancelled():
+                return
+            try:
+                response = future.result()
+                if isinstance(response, TracedForward):
+                    # A resposta do próximo salto conclui a requisição, sem ocupar um worker até lá
+                    forwarded = self.forward_traced(response, trace)
+                    traces[request_id] = trace
+                    in_flight[request_id] = forwarded
+                    forwarded.add_done_callback(lambda f: respond(request_id, f))
+                    return
+            except DeadlineExceededError as e:
+                logger.warning(f"Requisição {request_id} de {address} descartada: {str(e)}")
+                send(request_id, FRAME_ERROR, rejection_response(e))
+                return
+            except Exception as e:
+                logger.error(f"Erro ao processar requisição {request_id}: {str(e)}")
+                send(request_id, FRAME_RESPONSE, {"status": "error", "error": str(e)})
+                return
+            send(request_id, FRAME_RESPONSE, response, trace)
+        
+        logger.info(f"Conexão persistente (v2) com {address}")
+        while self.running:
+            frame = recv_frame(client_socket)
+            if frame is None:
+                break
+            request_id, frame_type, flags, payload = frame
+            if frame_type == FRAME_INFO:
+                # Consulta barata, respondida mesmo com a fila cheia
+                send(request_id, FRAME_RESPONSE, self.describe())
+                continue
+            if frame_type == FRAME_CANCEL:
+                future = in_flight.get(request_id)
+                if future is not None:
+                    future.cancel()
+                continue
+            received_at = time.time()
+            try:
+                deadline, payload = split_deadline(flags, payload, time.monotonic())
+                trace, payload = Trace.split(flags, payload)
+            except ValueError as e:
+                send(request_id, FRAME_RESPONSE, {"status": "error", "error": str(e)})
+                continue
+            if trace is not None:
+                trace.stamp(self.address, TRACE_RECEIVED, received_at)
+            try:
+                future = self.scheduler.submit(self.handle_request, frame_type, payload, trace, deadline,
+                                               deadline=deadline)
+            except OverloadedError as e:
+                logger.warning(f"Requisição {request_id} de {address} rejeitada: {str(e)}")
+                send(request_id, FRAME_ERROR, overloaded_response(e))
+                continue
+            if trace is not None:
+                traces[request_id] = trace
+            in_flight[request_id] = future
+            future.add_done_callback(lambda f, request_id=request_id: respond(request_id, f))
+        
+        # Aguarda as respostas pendentes antes de fechar a conexão
+        futures_wait(list(in_flight.values()))
+    
+    def describe(self) -> Dict[str, Any]:
+        """Informa aos clientes o formato das features aceito em FRAME_FEATURES e a versão do modelo."""
+        return {
+            "status": "success",
+            "features": feature_spec(),
+            "model_version": self.classifier.model_version,
+            "frame_types": {"image": FRAME_IMAGE, "features": FRAME_FEATURES, "info": FRAME_INFO,
+                            "batch": FRAME_BATCH, "cancel": FRAME_CANCEL},
+            "max_batch_items": self.max_batch_items,
+            "deadlines": True,
+            "tracing": True,
+            "admission": self.admission_stats()
+        }
+    
+    def admission_stats(self) -> Dict[str, Any]:
+        """Profundidade da fila e contadores de rejeição do controle de admissão."""
+        if self.async_server is not None:
+            return self.async_server.stats()
+        return self.scheduler.stats()
+    
+    def process_batch(self, payload: bytes) -> Dict[str, Any]:
+        """
+        Classifica um lote de imagens e/ou vetores de features. As features de
+        todos os itens vão para uma única matriz e a inferência é feita em uma
+        só chamada; itens inválidos recebem um erro sem afetar os demais.
+        """
+        start_time = time.time()
+        items = decode_batch(payload, self.max_batch_items)
+        n = len(items)
+        classes: List[Any] = [None] * n
+        confidences: List[Any] = [None] * n
+        errors: List[Any] = [None] * n
+        
+        X = np.empty((n, FEATURE_LENGTH), dtype=np.uint8)
+        keys = [None] * n
+        pending = []
+        for i, (item_type, data) in enumerate(items):
+            is_features = item_type == FRAME_FEATURES
+            try:
+                if self.result_cache is not None:
+                    keys[i] = self.result_cache.key(data, namespace=b'features' if is_features else b'')
+                    cached = self.result_cache.get(keys[i])
+                    if cached is not None:
+                        classes[i], confidences[i] = cached[0], float(cached[1])
+                        continue
+                if is_features:
+                    X[i] = features_from_bytes(data)
+                elif item_type == FRAME_IMAGE:
+                    self.classifier.extract_features(data, out=X[i])
+                else:
+                    raise ValueError(f"Tipo de item desconhecido: {item_type}")
+                pending.append(i)
+            except Exception as e:
+                errors[i] = str(e)
+        
+        if pending:
+            version = self.classifier.model_version
+            results = self.classifier.predict_features(X[pending])
+            for i, (class_name, confidence) in zip(pending, results):
+                classes[i], confidences[i] = class_name, float(confidence)
+                if keys[i] is not None:
+                    self.result_cache.put(keys[i], (class_name, confidence), version=version)
+        
+        processing_time = time.time() - start_time
+        logger.info(f"Lote de {n} itens classificado em {processing_time:.3f}s "
+                    f"({len(pending)} inferências, {sum(e is not None for e in errors)} erros)")
+        return {
+            "status": "success",
+            "classes": classes,
+            "confidences": confidences,
+            "errors": errors,
+            "processing_time": processing_time
+        }
+    
+    def process_image(self, image_data: bytes, frame_type: int = FRAME_IMAGE) -> Dict[str, Any]:
+        """Classifica a imagem (ou reutiliza o resultado de uma imagem idêntica) e monta a resposta."""
+        start_time = time.time()
+        class_name, confidence, cached = self._classify(image_data, frame_type)
+        processing_time = time.time() - start_time
+        
+        logger.info(f"Classificação: {class_name} (Confiança: {confidence:.2f})")
+        logger.info(f"Tempo de processamento: {processing_time:.3f}s")
+        
+        return {
+            "status": "success",
+            "class": class_name,
+            "confidence": float(confidence),
+            "processing_time": processing_time,
+            "cached": cached
+        }
+    
     def _handle_client(self, client_socket: socket.socket, address: Tuple[str, int]):
         """Manipula a conexão com um cliente."""
         try:
             logger.info(f"Processando requisição de {address}")
             
-            # Recebe o tamanho da imagem
-            size_data = client_socket.recv(8)
-            if not size_data:
+            # Recebe o tamanho da imagem (ou o HELLO do protocolo v2)
+            size_data = recv_header(client_socket, LENGTH_PREFIX)
+            if size_data is None:
                 logger.error("Nenhum dado recebido do cliente")
                 return
+            if size_data == HELLO:
+                self._serve_multiplexed(client_socket, address)
+                return
             
             size = int.from_bytes(size_data, 'big')
             logger.info(f"Tamanho da imagem recebida: {size} bytes")
             
-            # Recebe a imagem
-            image_data = b''
-            bytes_received = 0
-            while bytes_received < size:
-                chunk = client_socket.recv(min(size - bytes_received, 8192))
-                if not chunk:
-                    break
-                image_data += chunk
-                bytes_received += len(chunk)
-            
+            # Recebe a imagem direto em um buffer pré-alocado
+            image_data = recv_exact(client_socket, size)
             logger.info(f"Imagem recebida completamente: {len(image_data)} bytes")
             
-            # Classifica a imagem
-            start_time = time.time()
-            class_name, confidence = self.classifier.classify_image(image_data)
-            processing_time = time.time() - start_time
-            
-            logger.info(f"Classificação: {class_name} (Confiança: {confidence:.2f})")
-            logger.info(f"Tempo de processamento: {processing_time:.3f}s")
-            
-            # Prepara a resposta
-            response = {
-                "status": "success",
-                "class": class_name,
-                "confidence": float(confidence),
-                "processing_time": processing_time
-            }
+            try:
+                response = self.scheduler.submit(self.process_image, image_data).result()
+            except OverloadedError as e:
+                logger.warning(f"Requisição de {address} rejeitada: {str(e)}")
+                response = overloaded_response(e)
             
-            # Envia a resposta
+            # Envia a resposta (tamanho + JSON em uma única chamada)
             response_data = json.dumps(response).encode()
-            response_size = len(response_data)
-            logger.info(f"Enviando resposta de {response_size} bytes")
-            
-            # Envia o tamanho da resposta primeiro
-            size_bytes = response_size.to_bytes(8, 'big')
-            client_socket.sendall(size_bytes)
-            
-            # Envia a resposta
-            client_socket.sendall(response_data)
+            logger.info(f"Enviando resposta de {len(response_data)} bytes")
+            send_message(client_socket, response_data)
             logger.info("Resposta enviada com sucesso")
             
         except Exception as e:
@@ -265,11 +729,7 @@ class Service:
                     "status": "error",
                     "error": str(e)
                 }
-                error_data = json.dumps(error_response).encode()
-                error_size = len(error_data)
-                size_bytes = error_size.to_bytes(8, 'big')
-                client_socket.sendall(size_bytes)
-                client_socket.sendall(error_data)
+                send_message(client_socket, json.dumps(error_response).encode())
             except:
                 pass
         finally:
@@ -281,4 +741,22 @@ class Service:
         self.running = False
         if self.server_socket:
             self.server_socket.close()
+        if self.async_server:
+            self.async_server.stop()
+        self.scheduler.stop()
+        if self.server_mode != 'asyncio':
+            stats = self.scheduler.stats()
+            logger.info(f"Fila de requisições: {stats['accepted']} aceitas, {stats['rejected']} rejeitadas, "
+                        f"profundidade máxima {stats['max_queue_depth']}, {stats['dropped']} descartadas "
+                        f"por prazo, {stats['late']} concluídas após o prazo, {stats['cancelled']} canceladas")
+        if self.batcher:
+            self.batcher.stop()
+            logger.info(f"Batcher: {self.batcher.item_count} imagens em {self.batcher.batch_count} lotes "
+                        f"(média {self.batcher.average_batch_size:.1f} por lote)")
+        for pool in self.downstream.values():
+            pool.close()
+        if self.result_cache is not None:
+            stats = self.result_cache.stats()
+            logger.info(f"Cache de resultados: {stats['hits']} hits, {stats['misses']} misses "
+                        f"(taxa {stats['hit_rate'] * 100:.1f}%), {stats['evictions']} descartes")
         logger.info("Serviço finalizado") 
\ No newline at end of file
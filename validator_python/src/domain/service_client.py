@@ -0,0 +1,329 @@
+import itertools
+import json
+import logging
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from .protocol import (HELLO, FRAME_IMAGE, FRAME_FEATURES, FRAME_INFO, FRAME_BATCH, FRAME_ERROR, FRAME_CANCEL,
+                       FLAG_DEADLINE, FLAG_TRACE, encode_batch, encode_deadline)
+from .tracing import Trace
+from .scheduler import DeadlineExceededError, OverloadedError
+from .preprocessing import FEATURE_LENGTH, PREPROCESSING_VERSION, extract_features
+from .framing import configure_socket, recv_frame, recv_header, recv_message, send_frame, send_message
+
+logger = logging.getLogger(__name__)
+
+class ServiceClient:
+    """
+    Cliente do Service com conexão persistente e multiplexada (protocolo v2).
+
+    Uma única conexão TCP é reutilizada entre requisições; cada frame leva um
+    request_id e uma thread leitora entrega as respostas aos Futures
+    correspondentes, então várias requisições podem estar em andamento ao
+    mesmo tempo. Se o servidor fechar a conexão ou responder outra coisa ao
+    HELLO, o cliente passa a usar o protocolo v1 (uma conexão por requisição);
+    timeouts e erros de conexão no handshake são repassados a quem chamou e o
+    v2 é tentado de novo na próxima requisição.
+    """
+
+    def __init__(self, address: str, timeout: float = 10.0, handshake_timeout: float = 1.0):
+        host, port = address.split(':')
+        self.address = address
+        self.host, self.port = host, int(port)
+        self.timeout = timeout
+        self.handshake_timeout = handshake_timeout
+        self.legacy = False
+
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._info: Optional[Dict[str, Any]] = None
+
+    @property
+    def connected(self) -> bool:
+        """Se a conexão persistente está aberta (servidores v1 não mantêm conexão)."""
+        return self.legacy or self._sock is not None
+
+    def connect(self) -> "ServiceClient":
+        """Abre a conexão (ou detecta um servidor v1) agora, em vez de na primeira requisição."""
+        self._ensure_connected()
+        return self
+
+    def _connect(self) -> Optional[socket.socket]:
+        """Abre a conexão v2 (ou detecta um servidor v1). Deve ser chamado com _connect_lock."""
+        sock = configure_socket(socket.create_connection((self.host, self.port), timeout=self.timeout))
+        try:
+            sock.settimeout(self.handshake_timeout)
+            sock.sendall(HELLO)
+            reply = recv_header(sock, len(HELLO))
+        except OSError as e:
+            # Timeout ou conexão reiniciada não provam que o servidor é v1 (pode
+            # estar só sobrecarregado): a próxima requisição tenta o v2 de novo
+            sock.close()
+            raise ConnectionError(f"Handshake com {self.address} falhou: {str(e)}") from e
+        if reply != HELLO:
+            # Resposta definitiva: o servidor fechou a conexão ou respondeu outra coisa
+            sock.close()
+            reason = "conexão fechada" if reply is None else "resposta diferente do HELLO"
+            logger.info(f"{self.address} não suporta o protocolo v2 ({reason}), usando v1")
+            self.legacy = True
+            return None
+        sock.settimeout(None)
+        reader = threading.Thread(target=self._read_loop, args=(sock,), name=f"client-{self.address}")
+        reader.daemon = True
+        reader.start()
+        return sock
+
+    def _ensure_connected(self) -> Optional[socket.socket]:
+        with self._connect_lock:
+            if self._sock is None and not self.legacy:
+                self._sock = self._connect()
+            return self._sock
+
+    def _read_loop(self, sock: socket.socket):
+        """
+        Entrega cada resposta recebida ao Future de mesmo request_id. O rastro
+        de respostas com FLAG_TRACE fica em `future.trace`.
+        """
+        error: Exception = ConnectionError("Conexão fechada pelo servidor")
+        try:
+            while True:
+                frame = recv_frame(sock)
+                if frame is None:
+                    break
+                request_id, frame_type, flags, payload = frame
+                with self._pending_lock:
+                    future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if flags & FLAG_TRACE:
+                    future.trace, payload = Trace.split(flags, payload)
+                    payload = bytes(payload)
+                if frame_type == FRAME_ERROR:
+                    future.set_exception(self._rejection(payload))
+                else:
+                    future.set_result(payload)
+        except Exception as e:
+            error = e
+        finally:
+            self._drop_connection(sock, error)
+
+    @staticmethod
+    def _rejection(payload: bytes) -> Exception:
+        """Converte uma resposta FRAME_ERROR na exceção correspondente."""
+        try:
+            error = json.loads(payload)
+        except ValueError:
+            return RuntimeError("Requisição rejeitada pelo serviço")
+        if error.get('code') == 'overloaded':
+            return OverloadedError(error.get('error', 'Serviço sobrecarregado'))
+        if error.get('code') == 'deadline_exceeded':
+            return DeadlineExceededError(error.get('error', 'Prazo da requisição expirou'))
+        return RuntimeError(error.get('error', 'Requisição rejeitada pelo serviço'))
+
+    def _drop_connection(self, sock: socket.socket, error: Exception):
+        """Fecha a conexão e falha as requisições pendentes nela."""
+        with self._connect_lock:
+            if self._sock is sock:
+                self._sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def submit(self, payload: bytes, frame_type: int = FRAME_IMAGE, flags: int = 0,
+               deadline: Optional[float] = None, trace: Optional[Trace] = None) -> Future:
+        """
+        Envia uma requisição e retorna um Future com os bytes da resposta. Com
+        `deadline` (orçamento em segundos), o serviço descarta a requisição se
+        não conseguir começar a processá-la a tempo (protocolo v2). Com
+        `trace`, a requisição leva o rastro (FLAG_TRACE) e o rastro devolvido
+        pela cadeia fica em `future.trace` (None se a resposta não tiver).
+
+        Servidores v1 só recebem a imagem: outros tipos de frame (features,
+        info, lote), flags e rastro lançam ConnectionError, e o prazo vira o
+        tempo limite da conexão v1.
+        """
+        sock = self._ensure_connected()
+        if sock is None:
+            if frame_type != FRAME_IMAGE:
+                raise ConnectionError(f"{self.address} usa o protocolo v1 e só aceita imagens "
+                                      f"(frame do tipo {frame_type})")
+            if flags or trace is not None:
+                raise ConnectionError(f"{self.address} usa o protocolo v1, sem suporte a flags nem a rastro")
+            future = Future()
+            future.trace = None
+            timeout = self.timeout if deadline is None else min(self.timeout, deadline)
+            try:
+                future.set_result(self._request_v1(payload, timeout))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if trace is not None:
+            flags |= FLAG_TRACE
+            payload = [trace.encode()] + (payload if isinstance(payload, list) else [payload])
+        if deadline is not None:
+            flags |= FLAG_DEADLINE
+            payload = [encode_deadline(deadline)] + (payload if isinstance(payload, list) else [payload])
+        request_id = next(self._ids)
+        future = Future()
+        future.request_id = request_id
+        future.trace = None
+        with self._pending_lock:
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                send_frame(sock, request_id, frame_type, payload, flags)
+        except Exception as e:
+            self._drop_connection(sock, e)
+        return future
+
+    def request(self, payload: bytes, frame_type: int = FRAME_IMAGE, flags: int = 0,
+                deadline: Optional[float] = None) -> bytes:
+        """Envia uma requisição e aguarda os bytes da resposta."""
+        future = self.submit(payload, frame_type, flags, deadline)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.cancel(future)
+            raise socket.timeout(f"Sem resposta de {self.address} em {self.timeout}s")
+
+    def cancel(self, future: Future) -> bool:
+        """
+        Desiste de uma requisição enviada com submit(): o Future é cancelado e
+        o serviço recebe FRAME_CANCEL, para descartá-la se ainda estiver na fila.
+        """
+        request_id = getattr(future, 'request_id', None)
+        with self._pending_lock:
+            if request_id is None or self._pending.pop(request_id, None) is None:
+                return False
+        future.cancel()
+        sock = self._sock
+        if sock is not None:
+            try:
+                with self._send_lock:
+                    send_frame(sock, request_id, FRAME_CANCEL, b'')
+            except OSError as e:
+                self._drop_connection(sock, e)
+        return True
+
+    def request_json(self, payload: bytes, frame_type: int = FRAME_IMAGE) -> Dict[str, Any]:
+        return json.loads(self.request(payload, frame_type))
+
+    def info(self) -> Optional[Dict[str, Any]]:
+        """Consulta (uma vez) o formato de features aceito pelo serviço. None em servidores sem suporte."""
+        if self._info is None:
+            if self._ensure_connected() is None:
+                return None
+            try:
+                info = self.request_json(b'', FRAME_INFO)
+            except socket.timeout:
+                return None
+            self._info = info if info.get('status') == 'success' else {}
+        return self._info or None
+
+    def accepts_features(self) -> bool:
+        """Indica se o serviço aceita features extraídas com o pré-processamento local."""
+        info = self.info()
+        if not info:
+            return False
+        spec = info.get('features', {})
+        return (spec.get('preprocessing_version') == PREPROCESSING_VERSION
+                and spec.get('length') == FEATURE_LENGTH and spec.get('dtype') == 'uint8')
+
+    def featurize(self, image_data: bytes) -> bytes:
+        """Extrai localmente o vetor de features de uma imagem, no formato de FRAME_FEATURES."""
+        return extract_features(image_data).tobytes()
+
+    def request_features(self, features: np.ndarray) -> Dict[str, Any]:
+        """Classifica um vetor de features já extraído (FEATURE_LENGTH valores uint8, array ou bytes)."""
+        if isinstance(features, (bytes, bytearray, memoryview)):
+            features = np.frombuffer(features, dtype=np.uint8)
+        features = np.ascontiguousarray(features, dtype=np.uint8).reshape(-1)
+        if features.size != FEATURE_LENGTH:
+            raise ValueError(f"Vetor de features com {features.size} valores (esperado {FEATURE_LENGTH})")
+        if self._ensure_connected() is None:
+            raise ConnectionError(f"{self.address} não aceita vetores de features (protocolo v1)")
+        return self.request_json(features, FRAME_FEATURES)
+
+    def classify(self, image_data: bytes) -> Dict[str, Any]:
+        """
+        Classifica uma imagem. Se o serviço aceitar o pré-processamento local,
+        envia só o vetor de features (4 KB em vez da imagem inteira e sem
+        decodificação no servidor); caso contrário envia a imagem.
+        """
+        if self.accepts_features():
+            return self.request_features(extract_features(image_data))
+        return self.request_json(image_data)
+
+    def classify_batch(self, images: Sequence[bytes], featurize: bool = False,
+                       chunk_size: int = 256) -> List[Dict[str, Any]]:
+        """
+        Classifica várias imagens com requisições em lote (FRAME_BATCH) de até
+        `chunk_size` itens, enviadas em paralelo na mesma conexão. Com
+        `featurize`, as features são extraídas localmente (se o serviço aceitar).
+        Retorna um dicionário por imagem com "class", "confidence" e "error".
+        """
+        if self._ensure_connected() is None:
+            raise ConnectionError(f"{self.address} não suporta requisições em lote (protocolo v1)")
+        use_features = featurize and self.accepts_features()
+        
+        futures = []
+        for start in range(0, len(images), chunk_size):
+            items = []
+            for image_data in images[start:start + chunk_size]:
+                if use_features:
+                    try:
+                        items.append((FRAME_FEATURES, extract_features(image_data)))
+                        continue
+                    except ValueError:
+                        pass  # Deixa o serviço relatar o erro do item
+                items.append((FRAME_IMAGE, image_data))
+            futures.append(self.submit(encode_batch(items), FRAME_BATCH))
+        
+        results = []
+        for future in futures:
+            try:
+                response = json.loads(future.result(timeout=self.timeout))
+            except FutureTimeoutError:
+                raise socket.timeout(f"Sem resposta de {self.address} em {self.timeout}s")
+            if response.get('status') != 'success':
+                raise RuntimeError(f"Erro no lote: {response.get('error', 'erro desconhecido')}")
+            for class_name, confidence, error in zip(response['classes'], response['confidences'],
+                                                     response['errors']):
+                results.append({"class": class_name, "confidence": confidence, "error": error})
+        return results
+
+    def _request_v1(self, payload: bytes, timeout: Optional[float] = None) -> bytes:
+        """Requisição no protocolo v1: uma conexão por requisição."""
+        timeout = self.timeout if timeout is None else timeout
+        with configure_socket(socket.create_connection((self.host, self.port), timeout=timeout)) as s:
+            send_message(s, payload)
+            response = recv_message(s)
+            if response is None:
+                raise ConnectionError(f"{self.address} fechou a conexão sem responder")
+            # No v1 a rejeição por sobrecarga chega como uma resposta JSON comum
+            try:
+                status = json.loads(response)
+            except ValueError:
+                return response
+            if isinstance(status, dict) and status.get('code') == 'overloaded':
+                raise OverloadedError(status.get('error', 'Serviço sobrecarregado'))
+            return response
+
+    def close(self):
+        with self._connect_lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            self._drop_connection(sock, ConnectionError("Cliente fechado"))
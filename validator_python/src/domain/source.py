@@ -1,21 +1,32 @@
 import time
 import yaml
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import matplotlib.pyplot as plt
 import numpy as np
 from .load_balancer_proxy import LoadBalancerProxy
 from .service_proxy import ServiceProxy
 from .network_manager import NetworkManager
+from .service_client import ServiceClient
+from .connection_pool import ConnectionPool
+from .hedging import HedgePolicy, hedged_call
+from .load_generator import OpenLoopGenerator
+from .protocol import FRAME_IMAGE
+from .tracing import Trace, TRACE_SENT, TRACE_RECEIVED, TRACE_STARTED, TRACE_FORWARDED, TRACE_REPLY_RECEIVED, \
+    TRACE_REPLIED
 import logging
 from datetime import datetime
 import threading
 import json
 import socket
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import cv2
 import os
 
 logger = logging.getLogger(__name__)
 
+# Nome do Source nos rastros das requisições
+SOURCE_COMPONENT = "source"
+
 class Source:
     def __init__(self, config_path: str):
         with open(config_path, 'r') as f:
@@ -32,8 +43,40 @@ class Source:
         )
         
         # Inicializa os LoadBalancers
-        self.lb1 = LoadBalancerProxy(self.config['loadbalancer1']['services'])
-        self.lb2 = LoadBalancerProxy(self.config['loadbalancer2']['services'])
+        self.lb1 = LoadBalancerProxy(self.config['loadbalancer1']['services'],
+                                     algorithm=self.config['loadbalancer1'].get('algorithm', 'round-robin'),
+                                     algorithm_options=self.config['loadbalancer1'].get('algorithm_options'),
+                                     health_check=self.config['loadbalancer1'].get('health_check'),
+                                     connection_pool=self.config['loadbalancer1'].get('connection_pool'))
+        self.lb2 = LoadBalancerProxy(self.config['loadbalancer2']['services'],
+                                     algorithm=self.config['loadbalancer2'].get('algorithm', 'round-robin'),
+                                     algorithm_options=self.config['loadbalancer2'].get('algorithm_options'),
+                                     health_check=self.config['loadbalancer2'].get('health_check'),
+                                     connection_pool=self.config['loadbalancer2'].get('connection_pool'))
+        
+        # Com os balanceadores em execução (start_services), o Source envia as
+        # requisições às portas deles e a escolha do serviço é feita lá
+        self.route_via_load_balancers = self.config['source'].get('route_via_load_balancers', False)
+        self.lb1_address = self._lb_address('loadbalancer1')
+        self.lb2_address = self._lb_address('loadbalancer2')
+        if not self.route_via_load_balancers:
+            # Seleção local: a saúde dos serviços é verificada em segundo plano
+            self.lb1.start_health_checks()
+            self.lb2.start_health_checks()
+        
+        # Tempo máximo de espera por uma resposta (source.connection.timeout)
+        self.request_timeout = self.config['source'].get('connection', {}).get('timeout', 10)
+        
+        # Pools de conexões persistentes com os serviços (um por endereço)
+        self.pools: Dict[str, ConnectionPool] = {}
+        self._pools_lock = threading.Lock()
+        
+        # Duplicatas de requisições lentas e novas tentativas (desativadas por padrão)
+        self.hedging = HedgePolicy.from_config(self.config['source'].get('hedging'))
+        
+        # Geração de carga em malha aberta (chegadas, concorrência)
+        self.load_config = self.config['source'].get('load')
+        self.load_generator = None
         
         # Carrega imagens de teste
         self.test_images = self._load_test_images()
@@ -48,6 +91,10 @@ class Source:
             logger.info(f"  - {service}")
         logger.info("===============================")
 
+    def _lb_address(self, name: str) -> str:
+        lb_config = self.config[name]
+        return f"{lb_config.get('host', 'localhost')}:{lb_config['port']}"
+
     def _load_test_images(self) -> List[bytes]:
         """Carrega imagens de teste do diretório data/test."""
         test_images = []
@@ -122,241 +169,261 @@ class Source:
             logger.error(f"Erro ao processar mensagem: {str(e)}")
 
     def run_experiment(self, duration: int = 30):
-        """Executa o experimento por um determinado tempo."""
+        """
+        Executa o experimento por um determinado tempo, em malha aberta: as
+        requisições chegam na taxa `request_rate` (processo de chegadas de
+        `source.load`), sem esperar as anteriores, e várias ficam em andamento
+        ao mesmo tempo. Os tempos de resposta contam desde o instante previsto
+        de cada chegada (ver OpenLoopGenerator).
+        """
         if not self.test_images:
             logger.error("Nenhuma imagem de teste disponível. Adicione imagens em data/test/")
             return
-            
-        start_time = time.time()
-        end_time = start_time + duration
-        request_count = 0
         
         logger.info(f"\n=== Iniciando Experimento ({duration}s) ===")
         
-        while time.time() < end_time:
-            request_count += 1
-            # Seleciona uma imagem aleatória
-            image_data = np.random.choice(self.test_images)
-            
-            # Registra o tempo inicial
-            t1_start = time.time()
-            
-            # Envia a requisição
-            response = self.send_request(image_data, request_count)
-            
-            # Registra os tempos
-            metrics = {
-                "t1_source_lb1": response.get("t1", 0),
-                "t2_lb1_service": response.get("t2", 0),
-                "t3_service_lb2": response.get("t3", 0),
-                "t4_lb2_service": response.get("t4", 0),
-                "t_processamento": response.get("t5", 0),
-                "t5_service_source": response.get("t6", 0),
-                "t5_total": response.get("mrt", 0),
-                "average_intermediate": response.get("mrt", 0) / 6.0
-            }
-            
-            self.metrics_history.append(metrics)
-            
-            # Log do fluxo da requisição
-            logger.info(f"---> Fluxo Req {request_count}:")
-            logger.info(f"     Nó 01 (Source) -> Nó 02 (LB1) [{metrics['t1_source_lb1']:.3f}s]")
-            logger.info(f"     Nó 02 (LB1) -> Serviço (escolhido: {response.get('lb1_service', 'unknown')}) [{metrics['t2_lb1_service']:.3f}s]")
-            logger.info(f"     Serviço ({response.get('lb1_service', 'unknown')}) -> Nó 03 (LB2) [{metrics['t3_service_lb2']:.3f}s]")
-            logger.info(f"     Nó 03 (LB2) -> Serviço (escolhido: {response.get('lb2_service', 'unknown')}) [{metrics['t4_lb2_service']:.3f}s]")
-            logger.info(f"     Serviço ({response.get('lb2_service', 'unknown')}) Processamento [{metrics['t_processamento']:.3f}s]")
-            logger.info(f"     Serviço ({response.get('lb2_service', 'unknown')}) -> Nó 01 (Source) [{metrics['t5_service_source']:.3f}s]")
-            logger.info("<---")
-            logger.info(f"     Média dos Tempos Intermediários: {metrics['average_intermediate']:.3f}s")
-            logger.info("")
-            
-            # Log do resumo da requisição
-            logger.info(f"=== Resumo da Requisição {request_count} ===")
-            logger.info("Tempos:")
-            logger.info(f"  T1 (Source -> LB1): {metrics['t1_source_lb1']:.3f}s")
-            logger.info(f"  T2 (LB1 -> Serviço): {metrics['t2_lb1_service']:.3f}s")
-            logger.info(f"  T3 (Serviço S1 -> LB2): {metrics['t3_service_lb2']:.3f}s")
-            logger.info(f"  T4 (LB2 -> Serviço): {metrics['t4_lb2_service']:.3f}s")
-            logger.info(f"  T5 (Processamento Serviço): {metrics['t_processamento']:.3f}s")
-            logger.info(f"  T5 (Serviço S2 -> Source): {metrics['t5_service_source']:.3f}s")
-            logger.info(f"  T5 (Tempo Total): {metrics['t5_total']:.3f}s")
-            logger.info(f"  Média dos Tempos Intermediários: {metrics['average_intermediate']:.3f}s")
-            logger.info("=============================")
-            
-            # Aguarda o intervalo correto baseado na taxa de requisições
-            time.sleep(1.0 / self.request_rate)
+        self.measure(self.request_rate, duration)
         
         logger.info(f"\n=== Experimento Concluído ===")
-        logger.info(f"Total de requisições: {request_count}")
+        logger.info(f"Total de requisições: {self.load_generator.sent}")
         self._print_summary()
         self.generate_graphs()
 
+    def measure(self, rate: float, duration: float) -> Dict[str, Any]:
+        """
+        Gera carga em malha aberta na taxa `rate` por `duration` segundos e
+        retorna as estatísticas do gerador (ver OpenLoopGenerator.stats) com
+        o MRT médio das requisições concluídas nesse intervalo ("mrt").
+        """
+        def send(request_num: int) -> Dict[str, Any]:
+            # Seleciona uma imagem aleatória
+            image_data = self.test_images[np.random.randint(len(self.test_images))]
+            return self.send_request(image_data, request_num)
+        
+        first = len(self.metrics_history)
+        self.load_generator = OpenLoopGenerator.from_config(send, rate, self.load_config,
+                                                            on_complete=self._record_request)
+        stats = self.load_generator.run(duration)
+        times = [m["t5_total"] for m in self.metrics_history[first:]]
+        stats['mrt'] = float(np.mean(times)) if times else None
+        return stats
+
+    def _record_request(self, request_num: int, response: Dict[str, Any], latency: float, service_time: float):
+        """Registra os tempos de uma requisição concluída (chamado pelos workers do gerador)."""
+        metrics = {
+            "t1_source_lb1": response.get("t1", 0),
+            "t2_lb1_service": response.get("t2", 0),
+            "t_processamento_s1": response.get("t_s1", 0),
+            "t3_service_lb2": response.get("t3", 0),
+            "t4_lb2_service": response.get("t4", 0),
+            "t_processamento": response.get("t5", 0),
+            "t5_service_source": response.get("t6", 0),
+            "t5_total": response.get("mrt", 0),
+            "average_intermediate": response.get("mrt", 0) / 7.0,
+            "latency": latency,
+            "service_time": service_time
+        }
+        
+        self.metrics_history.append(metrics)
+        
+        # Um único registro por requisição, para não intercalar as linhas de
+        # requisições concorrentes
+        lb1_service = response.get('lb1_service', 'unknown')
+        lb2_service = response.get('lb2_service', 'unknown')
+        logger.info("\n".join([
+            f"---> Fluxo Req {request_num}:",
+            f"     Nó 01 (Source) -> Nó 02 (LB1) [{metrics['t1_source_lb1']:.3f}s]",
+            f"     Nó 02 (LB1) -> Serviço (escolhido: {lb1_service}) [{metrics['t2_lb1_service']:.3f}s]",
+            f"     Serviço ({lb1_service}) Extração de features [{metrics['t_processamento_s1']:.3f}s]",
+            f"     Serviço ({lb1_service}) -> Nó 03 (LB2) [{metrics['t3_service_lb2']:.3f}s]",
+            f"     Nó 03 (LB2) -> Serviço (escolhido: {lb2_service}) [{metrics['t4_lb2_service']:.3f}s]",
+            f"     Serviço ({lb2_service}) Processamento [{metrics['t_processamento']:.3f}s]",
+            f"     Serviço ({lb2_service}) -> Nó 01 (Source) [{metrics['t5_service_source']:.3f}s]",
+            "<---",
+            f"     Média dos Tempos Intermediários: {metrics['average_intermediate']:.3f}s",
+            f"     Tempo de resposta (desde a chegada prevista): {latency:.3f}s"
+        ]))
+        logger.debug(f"Rastro da Req {request_num}: " + ", ".join(
+            f"{step} {seconds * 1000:.2f}ms" for step, seconds in response.get('timeline', [])))
+
+    def _exchange(self, service: str, payload: bytes, trace: Trace = None) -> Tuple[bytes, Optional[Trace]]:
+        """
+        Envia um payload ao serviço e retorna os bytes da resposta e o rastro
+        devolvido (com `trace`, ver tracing). Usa uma conexão persistente
+        emprestada do pool do serviço (protocolo v2), evitando um novo
+        handshake TCP a cada requisição; serviços antigos caem no protocolo
+        v1. O tempo limite vai junto como prazo, para que o serviço não gaste
+        CPU com requisições que o Source já abandonou.
+        """
+        if self.hedging is not None:
+            return self._exchange_hedged(service, payload, trace)
+        pool = self._pool(service)
+        client = pool.acquire()
+        try:
+            future = client.submit(payload, deadline=client.timeout, trace=trace)
+            try:
+                response = future.result(timeout=client.timeout)
+            except FutureTimeoutError:
+                client.cancel(future)
+                raise socket.timeout(f"Sem resposta de {service} em {client.timeout}s")
+            return response, getattr(future, 'trace', None)
+        finally:
+            pool.release(client)
+
+    def _exchange_hedged(self, service: str, payload: bytes, trace: Trace = None) -> Tuple[bytes, Optional[Trace]]:
+        """
+        Como _exchange, com hedging: se a resposta passar do percentil
+        configurado, uma duplicata vai a outro serviço do mesmo balanceador
+        (ou de novo ao balanceador, que escolhe outro serviço); a primeira
+        resposta vence e a outra cópia é cancelada. Erros são tentados de
+        novo dentro do orçamento de tentativas.
+        """
+        used: List[str] = []
+        futures = []
+
+        def submit(hedge: bool):
+            target = self._alternate(service, used) if used else service
+            used.append(target)
+            pool = self._pool(target)
+            client = pool.acquire()
+            try:
+                future = client.submit(payload, deadline=client.timeout, trace=trace)
+            except Exception:
+                # hedged_call não terá um finish para esta tentativa: devolve a conexão aqui
+                pool.release(client)
+                raise
+            futures.append(future)
+
+            def finish():
+                if not future.done():
+                    client.cancel(future)
+                pool.release(client)
+            return future, finish
+        response = hedged_call(self.hedging, submit, timeout=self.request_timeout)
+        winner = next(f for f in futures if f.done() and not f.cancelled() and f.exception() is None)
+        return response, getattr(winner, 'trace', None)
+
+    def _alternate(self, service: str, used: List[str]) -> str:
+        """Outro serviço do balanceador de `service` para uma duplicata ou nova tentativa."""
+        if not self.route_via_load_balancers:
+            for lb in (self.lb1, self.lb2):
+                if service in lb.services:
+                    return lb.get_available_service(exclude=used) or service
+        return service
+
+    def _pool(self, service: str) -> ConnectionPool:
+        pool = self.pools.get(service)
+        if pool is None:
+            with self._pools_lock:
+                pool = self.pools.get(service)
+                if pool is None:
+                    pool = self.pools[service] = ConnectionPool.from_config(
+                        lambda: ServiceClient(service, timeout=self.request_timeout).connect(),
+                        self.config['source'].get('connection_pool'), name=f"Source->{service}")
+        return pool
+
     def send_request(self, image_data: bytes, request_num: int) -> Dict[str, Any]:
+        """
+        Envia a imagem em uma única passagem pela cadeia Source -> LB1 -> S1
+        -> LB2 -> S2 -> Source: a requisição leva um rastro (ver tracing) com
+        o próximo salto de S1, e cada componente registra nele os instantes
+        de recebimento, processamento e envio. Os tempos de cada salto e de
+        cada serviço são calculados a partir do rastro devolvido.
+        """
         try:
-            # Seleciona serviços baseado em disponibilidade
-            lb1_service = self.lb1.get_available_service()
-            if not lb1_service:
-                raise Exception("Nenhum serviço disponível no LB1")
-                
-            lb2_service = self.lb2.get_available_service()
-            if not lb2_service:
-                raise Exception("Nenhum serviço disponível no LB2")
+            if self.route_via_load_balancers:
+                # Os balanceadores escolhem o serviço a cada requisição
+                lb1_service, lb2_service = self.lb1_address, self.lb2_address
+            else:
+                # Seleciona serviços baseado em disponibilidade (e na imagem,
+                # se o algoritmo usar afinidade de cache)
+                key = LoadBalancerProxy.affinity_key(FRAME_IMAGE, 0, image_data)
+                lb1_service = self.lb1.get_available_service(key)
+                if not lb1_service:
+                    raise Exception("Nenhum serviço disponível no LB1")
+                    
+                lb2_service = self.lb2.get_available_service(key)
+                if not lb2_service:
+                    raise Exception("Nenhum serviço disponível no LB2")
             
             logger.info(f"Request {request_num}: Usando serviços {lb1_service} -> {lb2_service}")
             
-            # T1: Source -> LB1
-            start_time = time.time()
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)  # Aumentado para 10 segundos
-                host, port = lb1_service.split(':')
-                s.connect((host, int(port)))
-                # Envia o tamanho da imagem primeiro
-                size_bytes = len(image_data).to_bytes(8, 'big')
-                s.sendall(size_bytes)
-                s.sendall(image_data)
-                # Recebe o tamanho da resposta
-                size_data = s.recv(8)
-                size = int.from_bytes(size_data, 'big')
-                response = b''
-                bytes_received = 0
-                while bytes_received < size:
-                    chunk = s.recv(min(size - bytes_received, 8192))
-                    if not chunk:
-                        break
-                    response += chunk
-                    bytes_received += len(chunk)
-            t1 = time.time() - start_time
-            
-            # T2: LB1 -> Serviço
-            start_time = time.time()
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)
-                host, port = lb1_service.split(':')
-                s.connect((host, int(port)))
-                size_bytes = len(image_data).to_bytes(8, 'big')
-                s.sendall(size_bytes)
-                s.sendall(image_data)
-                size_data = s.recv(8)
-                size = int.from_bytes(size_data, 'big')
-                response = b''
-                bytes_received = 0
-                while bytes_received < size:
-                    chunk = s.recv(min(size - bytes_received, 8192))
-                    if not chunk:
-                        break
-                    response += chunk
-                    bytes_received += len(chunk)
-            t2 = time.time() - start_time
-            
-            # T3: Serviço S1 -> LB2
-            start_time = time.time()
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)
-                host, port = lb2_service.split(':')
-                s.connect((host, int(port)))
-                size_bytes = len(response).to_bytes(8, 'big')
-                s.sendall(size_bytes)
-                s.sendall(response)
-                size_data = s.recv(8)
-                size = int.from_bytes(size_data, 'big')
-                response = b''
-                bytes_received = 0
-                while bytes_received < size:
-                    chunk = s.recv(min(size - bytes_received, 8192))
-                    if not chunk:
-                        break
-                    response += chunk
-                    bytes_received += len(chunk)
-            t3 = time.time() - start_time
-            
-            # T4: LB2 -> Serviço
-            start_time = time.time()
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)
-                host, port = lb2_service.split(':')
-                s.connect((host, int(port)))
-                size_bytes = len(response).to_bytes(8, 'big')
-                s.sendall(size_bytes)
-                s.sendall(response)
-                size_data = s.recv(8)
-                size = int.from_bytes(size_data, 'big')
-                response = b''
-                bytes_received = 0
-                while bytes_received < size:
-                    chunk = s.recv(min(size - bytes_received, 8192))
-                    if not chunk:
-                        break
-                    response += chunk
-                    bytes_received += len(chunk)
-            t4 = time.time() - start_time
-            
-            # T5: Processamento Serviço
-            start_time = time.time()
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)
-                host, port = lb2_service.split(':')
-                s.connect((host, int(port)))
-                size_bytes = len(response).to_bytes(8, 'big')
-                s.sendall(size_bytes)
-                s.sendall(response)
-                size_data = s.recv(8)
-                size = int.from_bytes(size_data, 'big')
-                response = b''
-                bytes_received = 0
-                while bytes_received < size:
-                    chunk = s.recv(min(size - bytes_received, 8192))
-                    if not chunk:
-                        break
-                    response += chunk
-                    bytes_received += len(chunk)
-            t5 = time.time() - start_time
-            
-            # T6: Serviço S2 -> Source
-            start_time = time.time()
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)
-                host, port = lb2_service.split(':')
-                s.connect((host, int(port)))
-                size_bytes = len(response).to_bytes(8, 'big')
-                s.sendall(size_bytes)
-                s.sendall(response)
-                size_data = s.recv(8)
-                size = int.from_bytes(size_data, 'big')
-                response = b''
-                bytes_received = 0
-                while bytes_received < size:
-                    chunk = s.recv(min(size - bytes_received, 8192))
-                    if not chunk:
-                        break
-                    response += chunk
-                    bytes_received += len(chunk)
-            t6 = time.time() - start_time
+            trace = Trace(route=[lb2_service])
+            trace.stamp(SOURCE_COMPONENT, TRACE_SENT)
+            response, trace = self._exchange(lb1_service, image_data, trace)
+            received_at = time.time()
+            if trace is None:
+                raise Exception(f"Resposta sem rastro: {bytes(response[:200]).decode(errors='replace')}")
+            trace.stamp(SOURCE_COMPONENT, TRACE_REPLY_RECEIVED, received_at)
+            times = self._trace_times(trace)
             
             # Marca os serviços como bem-sucedidos
-            self.lb1.mark_service_success(lb1_service, t1 + t2)
-            self.lb2.mark_service_success(lb2_service, t3 + t4 + t5 + t6)
+            if not self.route_via_load_balancers:
+                self.lb1.mark_service_success(lb1_service, times['t1'] + times['t2'] + times['t_s1'])
+                self.lb2.mark_service_success(lb2_service, times['t3'] + times['t4'] + times['t5'])
             
-            return {
-                't1': t1,
-                't2': t2,
-                't3': t3,
-                't4': t4,
-                't5': t5,
-                't6': t6,
-                'mrt': t1 + t2 + t3 + t4 + t5 + t6,
-                'response': response.decode(),
-                'lb1_service': lb1_service,
-                'lb2_service': lb2_service
-            }
+            # Serviços efetivamente usados (escolhidos pelos balanceadores, se for o caso)
+            times['lb1_service'] = times.pop('s1')
+            times['lb2_service'] = times.pop('s2')
+            times['response'] = bytes(response).decode()
+            times['timeline'] = trace.timeline()
+            return times
         except Exception as e:
             logger.error(f"Erro ao processar request {request_num}: {str(e)}")
             # Marca os serviços como com erro
-            if 'lb1_service' in locals():
-                self.lb1.mark_service_error(lb1_service)
-            if 'lb2_service' in locals():
-                self.lb2.mark_service_error(lb2_service)
+            if not self.route_via_load_balancers:
+                if 'lb1_service' in locals():
+                    self.lb1.mark_service_error(lb1_service)
+                if 'lb2_service' in locals():
+                    self.lb2.mark_service_error(lb2_service)
             raise
 
+    @staticmethod
+    def _trace_times(trace: Trace) -> Dict[str, Any]:
+        """
+        Tempos de uma requisição a partir do rastro. Os serviços são os
+        componentes que registraram início de processamento (S1 e S2, nessa
+        ordem) e os balanceadores os componentes imediatamente antes deles;
+        sem balanceadores (seleção local), T2 e T4 ficam zerados. A soma de
+        T1, T2, S1, T3, T4, T5 e T6 é o tempo total (MRT).
+        """
+        services = trace.components(TRACE_STARTED)
+        if len(services) != 2:
+            raise ValueError(f"Rastro com {len(services)} serviços (esperados 2)")
+        s1, s2 = services
+        sent = trace.find(SOURCE_COMPONENT, TRACE_SENT)
+        end = trace.find(SOURCE_COMPONENT, TRACE_REPLY_RECEIVED)
+        s1_received = trace.find(s1, TRACE_RECEIVED)
+        s1_forwarded = trace.find(s1, TRACE_FORWARDED)
+        s2_received = trace.find(s2, TRACE_RECEIVED)
+        s2_replied = trace.find(s2, TRACE_REPLIED)
+        
+        def hop(start: float, service: str, service_received: float):
+            # Divide a ida até o serviço no trecho até o balanceador e no trecho depois dele
+            lb = trace.previous(service, TRACE_RECEIVED)
+            lb_received = trace.find(lb, TRACE_RECEIVED) if lb not in (None, SOURCE_COMPONENT, s1) else None
+            if lb_received is None:
+                return service_received - start, 0.0
+            return lb_received - start, service_received - lb_received
+        
+        t1, t2 = hop(sent, s1, s1_received)
+        t3, t4 = hop(s1_forwarded, s2, s2_received)
+        t5 = s2_replied - s2_received
+        t6 = end - s2_replied
+        t_s1 = s1_forwarded - s1_received
+        return {
+            't1': t1,
+            't2': t2,
+            't_s1': t_s1,
+            't3': t3,
+            't4': t4,
+            't5': t5,
+            't6': t6,
+            'mrt': end - sent,
+            's1': s1,
+            's2': s2
+        }
+
     def _print_summary(self):
         """Imprime um resumo das métricas coletadas."""
         if not self.metrics_history:
@@ -364,6 +431,7 @@ class Source:
 
         t1_avg = np.mean([m["t1_source_lb1"] for m in self.metrics_history])
         t2_avg = np.mean([m["t2_lb1_service"] for m in self.metrics_history])
+        t_s1_avg = np.mean([m["t_processamento_s1"] for m in self.metrics_history])
         t3_lb2_avg = np.mean([m["t3_service_lb2"] for m in self.metrics_history])
         t4_service_avg = np.mean([m["t4_lb2_service"] for m in self.metrics_history])
         t5_return_avg = np.mean([m["t5_service_source"] for m in self.metrics_history])
@@ -374,6 +442,7 @@ class Source:
         logger.info("\n=== Resumo das Médias ===")
         logger.info(f"Tempo Médio T1 (Source -> LB1): {t1_avg:.3f}s")
         logger.info(f"Tempo Médio T2 (LB1 -> Serviço): {t2_avg:.3f}s")
+        logger.info(f"Tempo Médio (Extração de features Serviço S1): {t_s1_avg:.3f}s")
         logger.info(f"Tempo Médio (Serviço S1 -> LB2): {t3_lb2_avg:.3f}s")
         logger.info(f"Tempo Médio (LB2 -> Serviço S2): {t4_service_avg:.3f}s")
         logger.info(f"Tempo Médio (Processamento Serviço S2): {t_process_avg:.3f}s")
@@ -382,6 +451,23 @@ class Source:
         logger.info(f"Média dos Tempos Intermediários: {average_intermediate_avg:.3f}s")
         logger.info("===========================")
 
+        if self.load_generator is not None:
+            logger.info(f"Carga: {self.load_generator.summary()}")
+
+        if self.hedging is not None:
+            logger.info(f"Hedging: {self.hedging.summary()}")
+
+        logger.info("\n=== Pools de Conexões ===")
+        for service, pool in self.pools.items():
+            stats = pool.stats()
+            logger.info(f"{service}: {stats['size']} conexões, {stats['creates']} criadas, "
+                        f"{stats['reuses']} reutilizações, {stats['waits']} esperas "
+                        f"({stats['wait_time'] * 1000:.1f}ms), {stats['timeouts']} timeouts, "
+                        f"{stats['invalidated']} inválidas, {stats['evicted']} ociosas fechadas")
+            logger.info(f"{service}: saturação {stats['saturation'] * 100:.1f}% "
+                        f"(pico de {stats['peak_in_use']}/{stats['capacity']} requisições em uso)")
+        logger.info("===========================")
+
     def generate_graphs(self):
         """Gera gráficos de desempenho."""
         if not self.metrics_history:
@@ -390,7 +476,7 @@ class Source:
 
         # Prepara os dados
         times = np.array([m["t5_total"] for m in self.metrics_history])
-        processing_times = np.array([m["t_processamento"] for m in self.metrics_history])
+        processing_times = np.array([m["t_processamento_s1"] + m["t_processamento"] for m in self.metrics_history])
         network_times = np.array([m["t1_source_lb1"] + m["t2_lb1_service"] + m["t3_service_lb2"] + m["t4_lb2_service"] + m["t5_service_source"] for m in self.metrics_history])
         
         # Calcula o MRT médio geral
@@ -435,4 +521,6 @@ class Source:
     def stop(self):
         """Para o servidor e limpa recursos."""
         self.network_manager.stop()
+        for pool in self.pools.values():
+            pool.close()
         logger.info("Source finalizado") 
\ No newline at end of file
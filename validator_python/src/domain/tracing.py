@@ -0,0 +1,169 @@
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+from .protocol import DEADLINE_BUDGET, FLAG_DEADLINE, FLAG_TRACE
+
+# Eventos registrados por cada componente no rastro
+TRACE_SENT = 1            # Source: requisição enviada
+TRACE_RECEIVED = 2        # requisição recebida (cabeçalho lido)
+TRACE_STARTED = 3         # serviço: processamento iniciado (fim da espera na fila)
+TRACE_FINISHED = 4        # serviço: processamento concluído
+TRACE_FORWARDED = 5       # requisição enviada ao próximo salto
+TRACE_REPLY_RECEIVED = 6  # resposta recebida do próximo salto
+TRACE_REPLIED = 7         # resposta enviada de volta
+
+TRACE_EVENT_NAMES = {
+    TRACE_SENT: "enviada",
+    TRACE_RECEIVED: "recebida",
+    TRACE_STARTED: "início do processamento",
+    TRACE_FINISHED: "fim do processamento",
+    TRACE_FORWARDED: "encaminhada",
+    TRACE_REPLY_RECEIVED: "resposta recebida",
+    TRACE_REPLIED: "resposta enviada",
+}
+
+TRACE_LENGTH = struct.Struct('>I')
+TRACE_COUNTS = struct.Struct('>BH')
+TRACE_EVENT = struct.Struct('>Bd')
+
+# (componente, evento, instante em time.time())
+TraceEvent = Tuple[str, int, float]
+
+@dataclass(frozen=True)
+class TracedForward:
+    """
+    Resultado do primeiro estágio de uma cadeia rastreada (ver
+    Service.process_traced): as features a encaminhar a `next_hop` e o prazo
+    absoluto (time.monotonic) da requisição. O encaminhamento é feito fora
+    do worker que calculou as features (Service.forward_traced).
+    """
+    next_hop: str
+    features: Any
+    deadline: Optional[float] = None
+
+def _encode_name(name: str) -> bytes:
+    data = name.encode()[:255]
+    return bytes((len(data),)) + data
+
+def _decode_name(view: memoryview, offset: int) -> Tuple[str, int]:
+    length = view[offset]
+    offset += 1
+    if offset + length > len(view):
+        raise ValueError("Rastro truncado")
+    return bytes(view[offset:offset + length]).decode(), offset + length
+
+class Trace:
+    """
+    Rastro de uma requisição que atravessa a cadeia inteira em uma só
+    passagem (Source -> LB1 -> S1 -> LB2 -> S2 -> Source), levado no próprio
+    frame (FLAG_TRACE, ver protocol).
+
+    `route` são os próximos saltos que o serviço que recebe a requisição
+    ainda deve percorrer (o primeiro serviço extrai as features e as
+    encaminha ao próximo endereço). `events` acumula os instantes de
+    recebimento, processamento e envio registrados por cada componente, na
+    ida e na volta; o Source calcula a partir deles o tempo de cada salto e
+    de cada serviço. Os tempos entre componentes diferentes comparam
+    relógios diferentes (válidos na mesma máquina ou com relógios
+    sincronizados); os tempos dentro de um componente usam um único relógio.
+
+    No frame, o rastro vem no início do payload (depois do prazo, se houver):
+
+        [tamanho: 4][saltos: 1][eventos: 2]([nome: 1+n])*([evento: 1][instante: 8][componente: 1+n])*
+    """
+
+    def __init__(self, route: Sequence[str] = (), events: List[TraceEvent] = None):
+        self.route = list(route)
+        self.events: List[TraceEvent] = events if events is not None else []
+
+    def stamp(self, component: str, event: int, at: float = None):
+        """Registra um evento do componente (agora, se `at` não for informado)."""
+        self.events.append((component, event, time.time() if at is None else at))
+
+    def next_hop(self) -> Optional[str]:
+        """Retira e retorna o próximo salto da rota (None no último serviço)."""
+        return self.route.pop(0) if self.route else None
+
+    def encode(self) -> bytes:
+        parts = [TRACE_COUNTS.pack(len(self.route), len(self.events))]
+        parts.extend(_encode_name(hop) for hop in self.route)
+        for component, event, at in self.events:
+            parts.append(TRACE_EVENT.pack(event, at))
+            parts.append(_encode_name(component))
+        body = b''.join(parts)
+        return TRACE_LENGTH.pack(len(body)) + body
+
+    @classmethod
+    def decode(cls, view: memoryview) -> Tuple["Trace", int]:
+        """Lê um rastro do início de `view`; retorna (rastro, bytes consumidos)."""
+        if len(view) < TRACE_LENGTH.size + TRACE_COUNTS.size:
+            raise ValueError("Frame com rastro sem o cabeçalho do rastro")
+        (length,) = TRACE_LENGTH.unpack_from(view)
+        end = TRACE_LENGTH.size + length
+        if end > len(view):
+            raise ValueError("Rastro truncado")
+        hops, count = TRACE_COUNTS.unpack_from(view, TRACE_LENGTH.size)
+        offset = TRACE_LENGTH.size + TRACE_COUNTS.size
+        route = []
+        for _ in range(hops):
+            hop, offset = _decode_name(view, offset)
+            route.append(hop)
+        events = []
+        for _ in range(count):
+            if offset + TRACE_EVENT.size > end:
+                raise ValueError("Rastro truncado")
+            event, at = TRACE_EVENT.unpack_from(view, offset)
+            component, offset = _decode_name(view, offset + TRACE_EVENT.size)
+            events.append((component, event, at))
+        return cls(route, events), end
+
+    @classmethod
+    def split(cls, flags: int, payload) -> Tuple[Optional["Trace"], memoryview]:
+        """
+        Separa o rastro do payload (já sem o prazo). Retorna (rastro, ou None
+        se o frame não tiver FLAG_TRACE, payload sem o rastro).
+        """
+        if not flags & FLAG_TRACE:
+            return None, payload
+        view = memoryview(payload).cast('B')
+        trace, size = cls.decode(view)
+        return trace, view[size:]
+
+    @staticmethod
+    def prefix_size(flags: int) -> int:
+        """Bytes do prazo no início do payload (o rastro vem logo depois)."""
+        return DEADLINE_BUDGET.size if flags & FLAG_DEADLINE else 0
+
+    def find(self, component: str, event: int) -> Optional[float]:
+        """Instante do primeiro evento `event` do componente (None se não houver)."""
+        for name, kind, at in self.events:
+            if name == component and kind == event:
+                return at
+        return None
+
+    def components(self, event: int) -> List[str]:
+        """Componentes que registraram `event`, na ordem do rastro."""
+        return [name for name, kind, _ in self.events if kind == event]
+
+    def previous(self, component: str, event: int) -> Optional[str]:
+        """Componente do evento imediatamente anterior a (`component`, `event`)."""
+        for i, (name, kind, _) in enumerate(self.events):
+            if name == component and kind == event:
+                return self.events[i - 1][0] if i > 0 else None
+        return None
+
+    def timeline(self) -> List[Tuple[str, float]]:
+        """
+        Intervalos entre eventos consecutivos: "A -> B" para a rede (e as
+        filas de envio/recebimento) entre dois componentes e "A: evento ->
+        evento" para o tempo dentro de um componente.
+        """
+        steps = []
+        for (a, first, start), (b, second, end) in zip(self.events, self.events[1:]):
+            if a == b:
+                label = f"{a}: {TRACE_EVENT_NAMES.get(first, first)} -> {TRACE_EVENT_NAMES.get(second, second)}"
+            else:
+                label = f"{a} -> {b}"
+            steps.append((label, end - start))
+        return steps
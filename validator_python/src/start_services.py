@@ -2,10 +2,13 @@ import os
 import sys
 import yaml
 import logging
+import argparse
 import threading
+import multiprocessing
 import signal
 import time
-from domain.service import Service
+from domain.service import Service, ImageClassifierService
+from domain.load_balancer_proxy import LoadBalancerProxy
 
 # Configuração de logging
 logging.basicConfig(
@@ -14,17 +17,128 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Portas dos serviços
+SERVICE_PORTS = [8083, 8084, 8085, 8086]
+# Configuração com os balanceadores (loadbalancer1 e loadbalancer2)
+SOURCE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'source.yaml')
+
+def create_load_balancer(name: str, lb_config: dict) -> LoadBalancerProxy:
+    """Cria um balanceador a partir da sua seção (loadbalancer1/loadbalancer2) na configuração do Source."""
+    return LoadBalancerProxy(
+        lb_config['services'],
+        host=lb_config.get('host', 'localhost'),
+        port=lb_config['port'],
+        max_connections=lb_config.get('max_connections', 1000),
+        name=name,
+        algorithm=lb_config.get('algorithm', 'round-robin'),
+        algorithm_options=lb_config.get('algorithm_options'),
+        health_check=lb_config.get('health_check'),
+        connection_pool=lb_config.get('connection_pool'),
+        hedging=lb_config.get('hedging'),
+        request_timeout=lb_config.get('request_timeout', 30),
+        client_timeout=lb_config.get('client_timeout', 30)
+    )
+
+def start_load_balancers(config_path: str = SOURCE_CONFIG):
+    """Inicia os balanceadores declarados na configuração do Source, cada um em uma thread."""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    
+    balancers = []
+    for name in ('loadbalancer1', 'loadbalancer2'):
+        lb_config = config.get(name)
+        if not lb_config:
+            continue
+        balancer = create_load_balancer(name, lb_config)
+        thread = threading.Thread(target=balancer.start, name=name)
+        thread.daemon = True
+        thread.start()
+        balancers.append(balancer)
+    return balancers
+
+def run_service_worker(config_path: str):
+    """Ponto de entrada de um processo de serviço (modo multiprocesso)."""
+    service = Service(config_path)
+    
+    def stop(signum, frame):
+        service.stop()
+    
+    # O supervisor trata Ctrl+C e repassa SIGTERM aos processos filhos
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    service.start()
+
+def run_load_balancer_worker(name: str, lb_config: dict):
+    """Ponto de entrada de um processo de balanceador (usado pela varredura de capacidade)."""
+    balancer = create_load_balancer(name, lb_config)
+    
+    def stop(signum, frame):
+        balancer.stop()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    balancer.start()
+
 class ServiceManager:
-    def __init__(self):
+    def __init__(self, mode: str = 'thread', workers: int = 1, server_mode: str = 'threaded'):
+        self.mode = mode
+        self.server_mode = server_mode
+        self.workers = max(1, workers)
         self.service_threads = []
+        self.processes = {}
+        self.restarts = {}
         self.running = True
     
-    def create_service_config(self, port: int) -> str:
+    def create_service_config(self, port: int, reuse_port: bool = False, train_on_start: bool = True) -> str:
         """Cria um arquivo de configuração temporário para o serviço."""
         config = {
             'service': {
                 'host': 'localhost',
-                'port': port
+                'port': port,
+                'reuse_port': reuse_port,
+                'train_on_start': train_on_start,
+                'server_mode': self.server_mode,
+                'backlog': 1024,
+                'admission': {
+                    'max_concurrency': 32,
+                    'max_queue': 128
+                },
+                'executor': {
+                    'type': 'thread',
+                    'max_workers': os.cpu_count()
+                },
+                'batching': {
+                    'enabled': True,
+                    'max_batch_size': 32,
+                    'max_wait_ms': 5
+                },
+                'cache': {
+                    'enabled': True,
+                    'max_entries': 1024,
+                    'ttl_seconds': 300
+                },
+                # Conexões com o próximo salto das requisições rastreadas (S1 -> LB2)
+                'forwarding': {
+                    'timeout': 10,
+                    'connection_pool': {
+                        'max_size': 4,
+                        'max_streams': 32
+                    }
+                }
+            },
+            'model': {
+                'index': {
+                    'backend': 'brute'
+                },
+                # Projeção desativada por padrão (altera a acurácia); para ativar, use
+                # {'method': 'pca' | 'random', 'dim': N}, escolhendo N por bench_projection.py
+                'projection': {
+                    'method': 'none'
+                },
+                'training': {
+                    'workers': os.cpu_count(),
+                    'feature_cache': 'feature_cache'
+                }
             }
         }
         
@@ -36,12 +150,20 @@ class ServiceManager:
         
         return config_path
     
-    def start_service(self, port: int):
-        """Inicia um serviço em uma porta específica."""
-        config_path = self.create_service_config(port)
+    def start_service(self, config_path: str):
+        """Inicia um serviço a partir do seu arquivo de configuração."""
         service = Service(config_path)
         service.start()
     
+    def prepare_model(self, config_path: str):
+        """
+        Treina (ou carrega) o modelo uma única vez antes de iniciar os serviços;
+        cada serviço apenas carrega o artefato já gravado em disco.
+        """
+        with open(config_path, 'r') as f:
+            model_config = yaml.safe_load(f).get('model')
+        ImageClassifierService(model_config=model_config)
+    
     def signal_handler(self, signum, frame):
         """Manipula sinais para encerrar os serviços graciosamente."""
         logger.info("Recebido sinal para encerrar. Aguardando serviços finalizarem...")
@@ -53,12 +175,20 @@ class ServiceManager:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         
-        # Portas dos serviços
-        ports = [8083, 8084, 8085, 8086]
+        if self.mode == 'process':
+            self.start_processes()
+        else:
+            self.start_threads()
+        
+        logger.info("Todos os serviços encerrados.")
+    
+    def start_threads(self):
+        """Inicia cada serviço em uma thread deste processo."""
+        config_paths = {port: self.create_service_config(port, train_on_start=False) for port in SERVICE_PORTS}
+        self.prepare_model(config_paths[SERVICE_PORTS[0]])
         
-        # Inicia cada serviço em uma thread separada
-        for port in ports:
-            thread = threading.Thread(target=self.start_service, args=(port,))
+        for port in SERVICE_PORTS:
+            thread = threading.Thread(target=self.start_service, args=(config_paths[port],))
             thread.daemon = True
             self.service_threads.append(thread)
             thread.start()
@@ -75,13 +205,96 @@ class ServiceManager:
         # Aguarda as threads terminarem
         for thread in self.service_threads:
             thread.join(timeout=5)
+    
+    def start_processes(self):
+        """
+        Inicia `workers` processos por porta, compartilhando a porta com
+        SO_REUSEPORT, e os supervisiona: processos que terminam são
+        reiniciados (com espera crescente se caírem logo após iniciar).
+        """
+        config_paths = {
+            port: self.create_service_config(port, reuse_port=True, train_on_start=False)
+            for port in SERVICE_PORTS
+        }
         
-        logger.info("Todos os serviços encerrados.")
+        # Cada processo apenas mapeia o artefato já gravado em disco
+        self.prepare_model(config_paths[SERVICE_PORTS[0]])
+        
+        for port in SERVICE_PORTS:
+            for slot in range(self.workers):
+                self.spawn_process(port, slot, config_paths[port])
+        
+        try:
+            while self.running:
+                self.supervise(config_paths)
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.running = False
+        
+        logger.info("Encerrando processos de serviço...")
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=5)
+            if process.is_alive():
+                logger.warning(f"Processo {process.name} não finalizou, forçando encerramento")
+                process.kill()
+    
+    def spawn_process(self, port: int, slot: int, config_path: str):
+        """Cria o processo de serviço `slot` da porta `port`."""
+        process = multiprocessing.Process(
+            target=run_service_worker,
+            args=(config_path,),
+            name=f"service-{port}-{slot}"
+        )
+        process.start()
+        self.processes[(port, slot)] = process
+        restart = self.restarts.setdefault((port, slot), {'count': 0, 'delay': 1.0, 'started': 0.0, 'next': 0.0})
+        restart['started'] = time.time()
+        logger.info(f"Processo {process.name} iniciado (pid {process.pid})")
+    
+    def supervise(self, config_paths):
+        """Reinicia os processos de serviço que terminaram."""
+        now = time.time()
+        for (port, slot), process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            restart = self.restarts[(port, slot)]
+            if restart['next'] == 0.0:
+                logger.warning(f"Processo {process.name} terminou (código {process.exitcode})")
+                # Quedas logo após iniciar dobram a espera até o próximo reinício
+                if now - restart['started'] < 10:
+                    restart['delay'] = min(restart['delay'] * 2, 30.0)
+                else:
+                    restart['delay'] = 1.0
+                restart['next'] = now + restart['delay']
+            if now >= restart['next']:
+                restart['count'] += 1
+                restart['next'] = 0.0
+                logger.info(f"Reiniciando {process.name} (reinício {restart['count']})")
+                self.spawn_process(port, slot, config_paths[port])
 
 def main():
     """Função principal que inicia o gerenciador de serviços."""
-    manager = ServiceManager()
-    manager.start()
+    parser = argparse.ArgumentParser(description="Inicia os serviços de classificação")
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help="thread: todos os serviços em um processo; process: um processo por serviço")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processos por porta no modo process (compartilham a porta via SO_REUSEPORT)")
+    parser.add_argument('--server-mode', choices=['threaded', 'asyncio'], default='threaded',
+                        help="threaded: uma thread por conexão; asyncio: event loop com executor limitado")
+    parser.add_argument('--no-load-balancers', action='store_true',
+                        help="não inicia os balanceadores das portas 8081/8082 (o Source acessa os serviços direto)")
+    args = parser.parse_args()
+    
+    balancers = [] if args.no_load_balancers else start_load_balancers()
+    manager = ServiceManager(mode=args.mode, workers=args.workers, server_mode=args.server_mode)
+    try:
+        manager.start()
+    finally:
+        for balancer in balancers:
+            balancer.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+from collections import Counter
+import pytest
+from domain.balancing import (BALANCING_STRATEGIES, EWMALatencyStrategy, LeastOutstandingStrategy,
+                              PowerOfTwoChoicesStrategy, RendezvousHashStrategy, RoundRobinStrategy,
+                              WeightedRoundRobinStrategy, create_strategy)
+
+SERVICES = ["localhost:8001", "localhost:8002", "localhost:8003"]
+
+def test_create_strategy_by_name():
+    assert isinstance(create_strategy(), RoundRobinStrategy)
+    for name, cls in BALANCING_STRATEGIES.items():
+        assert isinstance(create_strategy(name), cls)
+    with pytest.raises(ValueError):
+        create_strategy("aleatório")
+
+def test_round_robin_cycles():
+    strategy = RoundRobinStrategy()
+    assert [strategy.select(SERVICES) for _ in range(6)] == SERVICES * 2
+
+def test_weighted_round_robin_is_smooth():
+    strategy = WeightedRoundRobinStrategy(weights={"a": 2})
+    picks = [strategy.select(["a", "b"]) for _ in range(6)]
+    assert picks == ["a", "b", "a", "a", "b", "a"]
+
+def test_least_outstanding_avoids_busy_services():
+    strategy = LeastOutstandingStrategy()
+    strategy.on_dispatch(SERVICES[0])
+    strategy.on_dispatch(SERVICES[1])
+    assert strategy.select(SERVICES) == SERVICES[2]
+    strategy.on_complete(SERVICES[0])
+    strategy.on_complete(SERVICES[0])
+    assert strategy.outstanding[SERVICES[0]] == 0
+
+def test_ewma_prefers_fast_service_and_tries_unmeasured():
+    strategy = EWMALatencyStrategy(alpha=0.5)
+    strategy.observe(SERVICES[0], 0.1)
+    strategy.observe(SERVICES[1], 0.01)
+    assert strategy.select(SERVICES) == SERVICES[2]
+    strategy.observe(SERVICES[2], 0.05)
+    assert strategy.select(SERVICES) == SERVICES[1]
+    strategy.observe(SERVICES[1], 0.03)
+    assert strategy.latency[SERVICES[1]] == pytest.approx(0.02)
+
+def test_power_of_two_never_picks_the_busiest():
+    strategy = PowerOfTwoChoicesStrategy()
+    for _ in range(3):
+        strategy.on_dispatch(SERVICES[0])
+    strategy.on_dispatch(SERVICES[1])
+    picks = Counter(strategy.select(SERVICES) for _ in range(200))
+    assert SERVICES[0] not in picks
+    assert strategy.select(SERVICES[:1]) == SERVICES[0]
+
+def test_rendezvous_is_stable_and_moves_only_removed_keys():
+    strategy = RendezvousHashStrategy()
+    keys = [os.urandom(16) for _ in range(200)]
+    before = {key: strategy.select(SERVICES, key) for key in keys}
+    assert before == {key: strategy.select(SERVICES, key) for key in keys}
+    after = {key: strategy.select(SERVICES[:2], key) for key in keys}
+    for key in keys:
+        if before[key] != SERVICES[2]:
+            assert after[key] == before[key]
+    assert len(set(before.values())) == 3
+
+def test_rendezvous_spills_over_when_loaded():
+    strategy = RendezvousHashStrategy(load_factor=1.0)
+    key = b'chave frequente'
+    preferred, second = strategy.rank(SERVICES, key)[:2]
+    for _ in range(3):
+        strategy.on_dispatch(preferred)
+    assert strategy.select(SERVICES, key) == second
+    assert strategy.spillovers == 1
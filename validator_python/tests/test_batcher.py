@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+import pytest
+from domain.batcher import InferenceBatcher
+
+class FakeClassifier:
+    """Classificador falso: a classe é a soma das features; registra o tamanho de cada lote."""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def predict_features(self, features):
+        self.batches.append(len(features))
+        if self.error is not None:
+            raise self.error
+        return [(str(int(row.sum())), 1.0) for row in features]
+
+@pytest.fixture
+def classifier():
+    return FakeClassifier()
+
+def test_concurrent_requests_share_a_batch(classifier):
+    batcher = InferenceBatcher(classifier, max_batch_size=8, max_wait=0.5)
+    batcher.start()
+    try:
+        futures = [batcher.submit(np.full(4, i, dtype=np.uint8)) for i in range(8)]
+        assert [f.result(5) for f in futures] == [(str(4 * i), 1.0) for i in range(8)]
+    finally:
+        batcher.stop()
+    assert classifier.batches == [8]
+    assert batcher.average_batch_size == 8
+
+def test_batch_is_flushed_after_max_wait(classifier):
+    batcher = InferenceBatcher(classifier, max_batch_size=32, max_wait=0.01)
+    batcher.start()
+    try:
+        assert batcher.classify_features(np.ones(3, dtype=np.uint8)) == ("3", 1.0)
+    finally:
+        batcher.stop()
+    assert classifier.batches == [1]
+
+def test_batch_size_is_limited(classifier):
+    batcher = InferenceBatcher(classifier, max_batch_size=3, max_wait=0.5)
+    batcher.start()
+    try:
+        futures = [batcher.submit(np.zeros(2, dtype=np.uint8)) for _ in range(7)]
+        for future in futures:
+            future.result(5)
+    finally:
+        batcher.stop()
+    assert classifier.batches == [3, 3, 1]
+
+def test_classifier_error_fails_the_whole_batch():
+    batcher = InferenceBatcher(FakeClassifier(error=ValueError("modelo")), max_wait=0.01)
+    batcher.start()
+    try:
+        with pytest.raises(ValueError):
+            batcher.classify_features(np.zeros(2, dtype=np.uint8))
+    finally:
+        batcher.stop()
+
+def test_submit_after_stop_fails(classifier):
+    batcher = InferenceBatcher(classifier)
+    batcher.start()
+    batcher.stop()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.zeros(2, dtype=np.uint8)).result(5)
+
+def test_concurrent_callers_get_their_own_results(classifier):
+    batcher = InferenceBatcher(classifier, max_batch_size=16, max_wait=0.005)
+    batcher.start()
+    results = {}
+
+    def call(i):
+        results[i] = batcher.classify_features(np.full(1, i, dtype=np.uint8))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(32)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        batcher.stop()
+    assert results == {i: (str(i), 1.0) for i in range(32)}
@@ -0,0 +1,110 @@
+import threading
+import time
+import pytest
+from domain.connection_pool import ConnectionPool, PoolTimeoutError
+
+class FakeConnection:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def close(self):
+        self.connected = False
+        self.closed = True
+
+def make_pool(**options):
+    created = []
+
+    def factory():
+        connection = FakeConnection()
+        created.append(connection)
+        return connection
+
+    return ConnectionPool(factory, **options), created
+
+def test_connection_is_multiplexed_up_to_max_streams():
+    pool, created = make_pool(min_size=0, max_size=2, max_streams=2)
+    leases = [pool.acquire() for _ in range(4)]
+    assert len(created) == 2
+    assert leases.count(created[0]) == 2 and leases.count(created[1]) == 2
+    stats = pool.stats()
+    assert stats["in_use"] == stats["peak_in_use"] == stats["capacity"] == 4
+
+def test_release_makes_connection_reusable():
+    pool, created = make_pool(min_size=0, max_size=1, max_streams=1)
+    connection = pool.acquire()
+    pool.release(connection)
+    assert pool.acquire() is connection
+    pool.release(connection)
+    stats = pool.stats()
+    assert (stats["creates"], stats["reuses"], stats["in_use"]) == (1, 1, 0)
+
+def test_saturated_pool_times_out():
+    pool, _ = make_pool(min_size=0, max_size=1, max_streams=1, acquire_timeout=0.05)
+    pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.05
+    stats = pool.stats()
+    assert (stats["waits"], stats["timeouts"], stats["saturation"]) == (1, 1, 0.5)
+
+def test_waiter_gets_released_connection():
+    pool, _ = make_pool(min_size=0, max_size=1, max_streams=1, acquire_timeout=5)
+    connection = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(connection,)).start()
+    assert pool.acquire() is connection
+
+def test_closed_connections_are_replaced():
+    pool, created = make_pool(min_size=0, max_size=1, max_streams=4)
+    connection = pool.acquire()
+    connection.close()
+    pool.release(connection)
+    replacement = pool.acquire()
+    assert replacement is not connection
+    assert pool.stats()["invalidated"] == 1
+    assert pool.stats()["in_use"] == 1
+
+def test_failed_factory_frees_its_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("recusada")
+        return FakeConnection()
+
+    pool = ConnectionPool(factory, min_size=0, max_size=1, max_streams=1, acquire_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert pool.acquire().connected
+    assert pool.stats()["in_use"] == 1
+
+def test_warm_opens_min_size():
+    pool, created = make_pool(min_size=3, max_size=4)
+    pool.warm()
+    assert len(created) == 3
+    assert pool.stats()["idle"] == 3
+
+def test_idle_connections_are_evicted():
+    pool, created = make_pool(min_size=1, max_size=3, max_streams=1, idle_timeout=0.0)
+    connections = [pool.acquire() for _ in range(3)]
+    for connection in connections:
+        pool.release(connection)
+    time.sleep(0.01)
+    pool._next_sweep = 0.0
+    pool.release(pool.acquire())
+    assert pool.stats()["size"] == 1
+    assert sum(c.closed for c in created) == 2
+
+def test_close_fails_later_acquires():
+    pool, created = make_pool(min_size=0)
+    pool.release(pool.acquire())
+    pool.close()
+    assert created[0].closed
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+def test_from_config_defaults():
+    pool = ConnectionPool.from_config(FakeConnection, {'max_size': 8}, name="teste")
+    assert (pool.min_size, pool.max_size, pool.max_streams, pool.name) == (1, 8, 32, "teste")
@@ -0,0 +1,71 @@
+import socket
+import threading
+import pytest
+from domain.protocol import FRAME_IMAGE, FRAME_BATCH, FLAG_DEADLINE, encode_batch, decode_batch
+from domain.framing import (IOV_MAX, recv_exact, recv_frame, recv_header, recv_message,
+                            send_frame, send_message, send_parts)
+
+@pytest.fixture
+def pair():
+    left, right = socket.socketpair()
+    left.settimeout(5)
+    right.settimeout(5)
+    yield left, right
+    left.close()
+    right.close()
+
+def send_in_background(fn, *args):
+    thread = threading.Thread(target=fn, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def test_frame_round_trip(pair):
+    left, right = pair
+    send_frame(left, 42, FRAME_IMAGE, b'imagem', FLAG_DEADLINE)
+    assert recv_frame(right) == (42, FRAME_IMAGE, FLAG_DEADLINE, bytearray(b'imagem'))
+
+def test_frame_from_list_of_parts(pair):
+    left, right = pair
+    send_frame(left, 1, FRAME_IMAGE, [b'ima', memoryview(b'gem'), bytearray(b'!')])
+    assert recv_frame(right)[3] == b'imagem!'
+
+def test_large_batch_exceeds_iov_max(pair):
+    left, right = pair
+    items = [(FRAME_IMAGE, bytes([i % 256]) * 3) for i in range(IOV_MAX)]
+    thread = send_in_background(send_frame, left, 3, FRAME_BATCH, encode_batch(items))
+    request_id, frame_type, _, payload = recv_frame(right)
+    thread.join()
+    assert (request_id, frame_type) == (3, FRAME_BATCH)
+    assert [(t, bytes(data)) for t, data in decode_batch(payload)] == items
+
+def test_partial_sends_are_resumed(pair):
+    left, right = pair
+    data = bytes(range(256)) * 8192
+    thread = send_in_background(send_parts, left, [data[:1000], data[1000:]])
+    assert recv_exact(right, len(data)) == data
+    thread.join()
+
+def test_message_round_trip(pair):
+    left, right = pair
+    send_message(left, b'resposta')
+    assert recv_message(right) == b'resposta'
+
+def test_clean_close_between_frames(pair):
+    left, right = pair
+    send_frame(left, 1, FRAME_IMAGE, b'x')
+    left.close()
+    assert recv_frame(right) is not None
+    assert recv_frame(right) is None
+    assert recv_message(right) is None
+
+def test_close_mid_frame_raises(pair):
+    left, right = pair
+    left.sendall(b'\x00' * 3)
+    left.close()
+    with pytest.raises(ConnectionError):
+        recv_header(right, 8)
+
+def test_oversized_payload_is_rejected(pair):
+    _, right = pair
+    with pytest.raises(ValueError):
+        recv_exact(right, 1 << 40)
@@ -0,0 +1,127 @@
+import socket
+import threading
+import time
+from concurrent.futures import Future
+import pytest
+from domain.hedging import HedgePolicy, HedgeTimer, RetryBudget, hedged_call
+
+def test_budget_starts_full_and_runs_out():
+    budget = RetryBudget(ratio=0.1, min_per_second=0.0, max_tokens=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    assert (budget.spent, budget.denied) == (2, 1)
+
+def test_budget_refills_per_request():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=2)
+    budget.tokens = 0.0
+    budget.record_request()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert budget.try_spend()
+
+def test_budget_is_capped():
+    budget = RetryBudget(ratio=1.0, min_per_second=0.0, max_tokens=2)
+    for _ in range(10):
+        budget.record_request()
+    assert budget.tokens == 2
+
+def test_budget_refills_over_time():
+    budget = RetryBudget(ratio=0.0, min_per_second=100.0, max_tokens=1)
+    budget.tokens = 0.0
+    time.sleep(0.02)
+    assert budget.try_spend()
+
+def test_policy_disabled_by_default():
+    assert HedgePolicy.from_config(None) is None
+    policy = HedgePolicy.from_config({'enabled': True, 'retry_budget': {'max_tokens': 3}})
+    assert policy.budget.max_tokens == 3
+
+def test_policy_delay_follows_percentile():
+    policy = HedgePolicy(percentile=50, window=10, min_samples=10, initial_delay=1.0)
+    for latency in range(1, 10):
+        policy.record(latency / 1000)
+    assert policy.delay() == 1.0
+    policy.record(0.010)
+    assert policy.delay() == pytest.approx(0.0055)
+
+def attempt(delay=None, error=None):
+    """Tentativa falsa: responde "delay" segundos depois (ou nunca, se None)."""
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    elif delay is not None:
+        threading.Timer(delay, future.set_result, args=(delay,)).start()
+    finished = []
+    return future, lambda: finished.append(True)
+
+def test_hedge_wins_over_slow_attempt():
+    policy = HedgePolicy(initial_delay=0.01)
+    calls = []
+
+    def submit(hedge):
+        calls.append(hedge)
+        return attempt(None if not hedge else 0.0)
+
+    assert hedged_call(policy, submit, timeout=5) == 0.0
+    assert calls == [False, True]
+    assert (policy.hedged, policy.hedge_wins) == (1, 1)
+
+def test_no_hedge_without_budget():
+    policy = HedgePolicy(initial_delay=0.01, budget=RetryBudget(max_tokens=0, min_per_second=0, ratio=0))
+    calls = []
+
+    def submit(hedge):
+        calls.append(hedge)
+        return attempt(None)
+
+    with pytest.raises(socket.timeout):
+        hedged_call(policy, submit, timeout=0.05)
+    assert calls == [False]
+    assert policy.budget.denied == 1
+
+def test_error_is_retried_once():
+    policy = HedgePolicy(initial_delay=5, max_retries=1)
+    errors = [ConnectionError("primeira"), ConnectionError("segunda")]
+
+    def submit(hedge):
+        return attempt(error=errors.pop(0))
+
+    with pytest.raises(ConnectionError, match="segunda"):
+        hedged_call(policy, submit, timeout=5)
+    assert policy.retried == 1
+
+def test_finish_runs_for_every_attempt():
+    policy = HedgePolicy(initial_delay=0.01)
+    finished = []
+
+    def submit(hedge):
+        future, _ = attempt(None if not hedge else 0.0)
+        return future, lambda: finished.append(hedge)
+
+    hedged_call(policy, submit, timeout=5)
+    assert sorted(finished) == [False, True]
+
+def test_timer_fires_in_order_and_skips_cancelled():
+    timer = HedgeTimer("teste")
+    fired = []
+    done = threading.Event()
+    timer.schedule(0.02, lambda: fired.append(2))
+    cancelled = timer.schedule(0.01, lambda: fired.append("cancelada"))
+    timer.schedule(0.0, lambda: fired.append(1))
+    timer.schedule(0.05, done.set)
+    HedgeTimer.cancel(cancelled)
+    assert done.wait(5)
+    timer.stop()
+    assert fired == [1, 2]
+
+def test_blocking_callback_does_not_delay_others():
+    timer = HedgeTimer("teste")
+    release = threading.Event()
+    fired = threading.Event()
+    timer.schedule(0.0, lambda: release.wait(5))
+    start = time.monotonic()
+    timer.schedule(0.01, fired.set)
+    assert fired.wait(1)
+    assert time.monotonic() - start < 0.5
+    release.set()
+    timer.stop()
@@ -0,0 +1,131 @@
+import json
+import socket
+import threading
+import time
+import pytest
+from domain.load_balancer_proxy import LoadBalancerProxy
+from domain.protocol import HELLO, FRAME_HEADER, FRAME_IMAGE, FRAME_RESPONSE
+from domain.framing import recv_exact, recv_frame, recv_message, send_frame, send_message
+from domain.service_client import ServiceClient
+from fake_service import FakeService
+
+def start_balancer(services, **options) -> LoadBalancerProxy:
+    lb = LoadBalancerProxy([s.address for s in services], name="LB-teste", **options)
+    threading.Thread(target=lb.start, daemon=True).start()
+    while not lb.running:
+        time.sleep(0.01)
+    return lb
+
+@pytest.fixture
+def services():
+    services = [FakeService(), FakeService()]
+    yield services
+    for service in services:
+        service.close()
+
+@pytest.fixture
+def lb(services):
+    lb = start_balancer(services, client_timeout=0.3)
+    yield lb
+    lb.stop()
+
+def open_v2(lb: LoadBalancerProxy) -> socket.socket:
+    sock = socket.create_connection(('localhost', lb.port), timeout=5)
+    sock.sendall(HELLO)
+    assert recv_exact(sock, len(HELLO)) == HELLO
+    return sock
+
+def test_requests_are_spread_over_services(lb, services):
+    client = ServiceClient(f"localhost:{lb.port}", timeout=5)
+    try:
+        futures = [client.submit(b'imagem') for _ in range(20)]
+        assert all(json.loads(f.result(5))["status"] == "success" for f in futures)
+    finally:
+        client.close()
+    assert [s.requests for s in services] == [10, 10]
+    stats = lb.pool_stats()
+    assert all(s["in_use"] == 0 for s in stats.values())
+
+def test_v1_client(lb):
+    with socket.create_connection(('localhost', lb.port), timeout=5) as sock:
+        send_message(sock, b'imagem')
+        assert json.loads(recv_message(sock))["status"] == "success"
+
+def test_handle_request(lb):
+    assert lb.handle_request({'payload': b'imagem'})["status"] == "success"
+
+def test_stalled_client_does_not_block_others(lb):
+    stalled = open_v2(lb)
+    try:
+        # Anuncia 1 MB e envia só uma parte: o payload fica pela metade
+        stalled.sendall(FRAME_HEADER.pack(1, FRAME_IMAGE, 0, 1 << 20) + b'\x00' * 1024)
+        time.sleep(0.05)
+        client = ServiceClient(f"localhost:{lb.port}", timeout=5)
+        try:
+            start = time.monotonic()
+            for _ in range(10):
+                assert json.loads(client.request(b'imagem'))["status"] == "success"
+            assert time.monotonic() - start < 0.3
+        finally:
+            client.close()
+        # Após client_timeout, o balanceador desiste do cliente travado
+        stalled.settimeout(2)
+        assert stalled.recv(1) == b''
+    finally:
+        stalled.close()
+
+def test_request_timeout_is_reported_and_cancelled():
+    service = FakeService(delay=2.0)
+    lb = start_balancer([service], request_timeout=0.2)
+    client = ServiceClient(f"localhost:{lb.port}", timeout=5)
+    try:
+        start = time.monotonic()
+        with pytest.raises(RuntimeError):
+            client.request(b'imagem')
+        assert time.monotonic() - start < 1.0
+        for _ in range(100):
+            if service.cancelled:
+                break
+            time.sleep(0.01)
+        assert service.cancelled == 1
+    finally:
+        client.close()
+        lb.stop()
+        service.close()
+
+def test_in_flight_replies_are_drained_after_client_eof():
+    service = FakeService(delay=0.1)
+    lb = start_balancer([service])
+    sock = open_v2(lb)
+    try:
+        for request_id in (1, 2, 3):
+            send_frame(sock, request_id, FRAME_IMAGE, b'imagem')
+        sock.shutdown(socket.SHUT_WR)
+        replies = []
+        while True:
+            frame = recv_frame(sock)
+            if frame is None:
+                break
+            replies.append(frame[:2])
+        assert sorted(replies) == [(1, FRAME_RESPONSE), (2, FRAME_RESPONSE), (3, FRAME_RESPONSE)]
+    finally:
+        sock.close()
+        lb.stop()
+        service.close()
+
+def test_hedged_request_wins_over_stalled_service():
+    slow, fast = FakeService(delay=2.0), FakeService()
+    lb = start_balancer([slow, fast], hedging={'enabled': True, 'initial_delay': 0.02},
+                        algorithm="round-robin")
+    client = ServiceClient(f"localhost:{lb.port}", timeout=5)
+    try:
+        start = time.monotonic()
+        for _ in range(4):
+            assert json.loads(client.request(b'imagem'))["status"] == "success"
+        assert time.monotonic() - start < 1.0
+        assert lb.hedging.hedged >= 1
+    finally:
+        client.close()
+        lb.stop()
+        slow.close()
+        fast.close()
@@ -0,0 +1,79 @@
+import pytest
+from domain.protocol import (FRAME_HEADER, FRAME_IMAGE, FRAME_FEATURES, FLAG_DEADLINE, FLAG_TRACE,
+                             encode_frame, encode_deadline, split_deadline, encode_batch, decode_batch)
+from domain.tracing import Trace, TRACE_RECEIVED, TRACE_REPLIED
+
+def test_encode_frame_header():
+    frame = encode_frame(7, FRAME_IMAGE, b'abc', FLAG_DEADLINE)
+    assert FRAME_HEADER.unpack_from(frame) == (7, FRAME_IMAGE, FLAG_DEADLINE, 3)
+    assert frame[FRAME_HEADER.size:] == b'abc'
+
+def test_deadline_round_trip():
+    payload = encode_deadline(0.25) + b'imagem'
+    deadline, data = split_deadline(FLAG_DEADLINE, payload, 100.0)
+    assert deadline == pytest.approx(100.25)
+    assert bytes(data) == b'imagem'
+
+def test_deadline_absent_keeps_payload():
+    deadline, data = split_deadline(0, b'imagem', 100.0)
+    assert deadline is None
+    assert data == b'imagem'
+
+def test_deadline_is_clamped():
+    assert split_deadline(FLAG_DEADLINE, encode_deadline(-1), 0.0)[0] == 0.0
+    assert split_deadline(FLAG_DEADLINE, encode_deadline(1e9), 0.0)[0] == pytest.approx(0xFFFFFFFF / 1000)
+
+def test_deadline_without_budget_is_rejected():
+    with pytest.raises(ValueError):
+        split_deadline(FLAG_DEADLINE, b'\x00', 0.0)
+
+def test_batch_round_trip():
+    items = [(FRAME_IMAGE, b'imagem'), (FRAME_FEATURES, bytes(range(10))), (FRAME_IMAGE, b'')]
+    decoded = decode_batch(b''.join(encode_batch(items)))
+    assert [(t, bytes(data)) for t, data in decoded] == items
+
+def test_batch_rejects_invalid_item_type():
+    with pytest.raises(ValueError):
+        encode_batch([(99, b'x')])
+
+@pytest.mark.parametrize("payload", [b'', b'\x00\x00\x00\x01\x01\x00\x00\x00\x05abc',
+                                     b''.join(encode_batch([(FRAME_IMAGE, b'abc')])) + b'extra'])
+def test_batch_rejects_malformed_payload(payload):
+    with pytest.raises(ValueError):
+        decode_batch(payload)
+
+def test_batch_item_limit():
+    payload = b''.join(encode_batch([(FRAME_IMAGE, b'a')] * 3))
+    assert len(decode_batch(payload, max_items=3)) == 3
+    with pytest.raises(ValueError):
+        decode_batch(payload, max_items=2)
+
+def test_trace_round_trip():
+    trace = Trace(["localhost:8001", "localhost:8002"])
+    trace.stamp("LB1", TRACE_RECEIVED, at=1.5)
+    trace.stamp("Serviço-ç", TRACE_REPLIED, at=2.5)
+    decoded, size = Trace.decode(memoryview(trace.encode() + b'resto'))
+    assert size == len(trace.encode())
+    assert decoded.route == trace.route
+    assert decoded.events == trace.events
+
+def test_trace_split_after_deadline():
+    trace = Trace(["localhost:8001"])
+    payload = encode_deadline(1.0) + trace.encode() + b'imagem'
+    flags = FLAG_DEADLINE | FLAG_TRACE
+    deadline, data = split_deadline(flags, payload, 0.0)
+    assert Trace.prefix_size(flags) == len(encode_deadline(1.0))
+    decoded, data = Trace.split(flags, data)
+    assert decoded.next_hop() == "localhost:8001"
+    assert decoded.next_hop() is None
+    assert bytes(data) == b'imagem'
+
+def test_trace_split_without_flag():
+    trace, data = Trace.split(0, b'imagem')
+    assert trace is None
+    assert data == b'imagem'
+
+def test_truncated_trace_is_rejected():
+    encoded = Trace(["localhost:8001"]).encode()
+    with pytest.raises(ValueError):
+        Trace.decode(memoryview(encoded[:-1]))
@@ -0,0 +1,47 @@
+import time
+from domain.result_cache import ResultCache
+
+def test_hit_and_miss():
+    cache = ResultCache()
+    key = ResultCache.key(b'imagem')
+    assert cache.get(key) is None
+    cache.put(key, ("Carro", 0.9))
+    assert cache.get(key) == ("Carro", 0.9)
+    assert cache.hit_rate == 0.5
+
+def test_namespaces_do_not_collide():
+    assert ResultCache.key(b'dados') != ResultCache.key(b'dados', b'features')
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put(b'a', 1)
+    cache.put(b'b', 2)
+    cache.get(b'a')
+    cache.put(b'c', 3)
+    assert cache.get(b'b') is None
+    assert (cache.get(b'a'), cache.get(b'c')) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire():
+    cache = ResultCache(ttl=0.01)
+    cache.put(b'a', 1)
+    time.sleep(0.02)
+    assert cache.get(b'a') is None
+    assert len(cache) == 0
+
+def test_model_change_invalidates():
+    version = [1]
+    cache = ResultCache(version_fn=lambda: version[0])
+    cache.put(b'a', 1)
+    version[0] = 2
+    assert cache.get(b'a') is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_result_from_old_model_is_discarded():
+    version = [1]
+    cache = ResultCache(version_fn=lambda: version[0])
+    version[0] = 2
+    cache.put(b'a', 1, version=1)
+    assert cache.get(b'a') is None
+    cache.put(b'a', 1, version=2)
+    assert cache.get(b'a') == 1
@@ -0,0 +1,93 @@
+import threading
+import time
+import pytest
+from domain.scheduler import DeadlineExceededError, OverloadedError, RequestScheduler
+
+@pytest.fixture
+def scheduler():
+    scheduler = RequestScheduler(max_concurrency=1, max_queue=8)
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+def block(scheduler):
+    """Ocupa a única thread do scheduler até o evento retornado ser acionado."""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    future = scheduler.submit(blocker)
+    assert started.wait(5)
+    return release, future
+
+def test_earliest_deadline_first(scheduler):
+    release, _ = block(scheduler)
+    order = []
+    now = time.monotonic()
+    futures = [
+        scheduler.submit(order.append, "sem prazo"),
+        scheduler.submit(order.append, "tarde", deadline=now + 20),
+        scheduler.submit(order.append, "cedo", deadline=now + 10),
+        scheduler.submit(order.append, "sem prazo 2"),
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert order == ["cedo", "tarde", "sem prazo", "sem prazo 2"]
+
+def test_full_queue_rejects():
+    scheduler = RequestScheduler(max_concurrency=1, max_queue=1)
+    scheduler.start()
+    try:
+        release, _ = block(scheduler)
+        queued = scheduler.submit(lambda: "ok")
+        with pytest.raises(OverloadedError):
+            scheduler.submit(lambda: "rejeitada")
+        release.set()
+        assert queued.result(5) == "ok"
+        assert scheduler.stats()["rejected"] == 1
+    finally:
+        scheduler.stop()
+
+def test_expired_request_is_dropped(scheduler):
+    release, _ = block(scheduler)
+    ran = []
+    future = scheduler.submit(ran.append, 1, deadline=time.monotonic() + 0.01)
+    time.sleep(0.02)
+    release.set()
+    with pytest.raises(DeadlineExceededError):
+        future.result(5)
+    assert ran == []
+    assert scheduler.stats()["dropped"] == 1
+
+def test_cancelled_request_is_skipped(scheduler):
+    release, _ = block(scheduler)
+    ran = []
+    future = scheduler.submit(ran.append, 1)
+    assert future.cancel()
+    release.set()
+    scheduler.submit(lambda: None).result(5)
+    assert ran == []
+    assert scheduler.stats()["cancelled"] == 1
+
+def test_exceptions_reach_the_future(scheduler):
+    def fail():
+        raise ValueError("falhou")
+
+    with pytest.raises(ValueError):
+        scheduler.submit(fail).result(5)
+    assert scheduler.stats()["failed"] == 1
+
+def test_stop_fails_queued_requests():
+    scheduler = RequestScheduler(max_concurrency=1, max_queue=4)
+    scheduler.start()
+    release, _ = block(scheduler)
+    queued = scheduler.submit(lambda: None)
+    scheduler.stop()
+    release.set()
+    with pytest.raises(RuntimeError):
+        queued.result(5)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
@@ -0,0 +1,103 @@
+import json
+import socket
+import threading
+import time
+import numpy as np
+import pytest
+from domain.protocol import HELLO, LENGTH_PREFIX, FRAME_FEATURES, FRAME_INFO, FLAG_DEADLINE
+from domain.framing import recv_exact, recv_header, send_message
+from domain.preprocessing import FEATURE_LENGTH
+from domain.service_client import ServiceClient
+from domain.tracing import Trace
+from fake_service import FakeService
+
+class LegacyService:
+    """Serviço v1: uma requisição por conexão; fecha a conexão ao receber o HELLO."""
+
+    def __init__(self):
+        self.server = socket.create_server(('localhost', 0))
+        self.address = f"localhost:{self.server.getsockname()[1]}"
+        self.requests = 0
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                header = recv_header(conn, LENGTH_PREFIX)
+                if header is None or header == HELLO:
+                    continue
+                payload = recv_exact(conn, int.from_bytes(header, 'big'))
+                self.requests += 1
+                send_message(conn, json.dumps({"status": "success", "size": len(payload)}).encode())
+
+    def close(self):
+        self.server.close()
+
+@pytest.fixture
+def legacy():
+    service = LegacyService()
+    yield service
+    service.close()
+
+@pytest.fixture
+def service():
+    service = FakeService()
+    yield service
+    service.close()
+
+def test_v2_request(service):
+    client = ServiceClient(service.address, timeout=5)
+    try:
+        assert json.loads(client.request(b'imagem'))["status"] == "success"
+        assert not client.legacy
+    finally:
+        client.close()
+
+def test_v2_concurrent_requests_share_the_connection(service):
+    client = ServiceClient(service.address, timeout=5)
+    try:
+        futures = [client.submit(b'imagem') for _ in range(20)]
+        assert all(json.loads(f.result(5))["status"] == "success" for f in futures)
+        assert all(f.trace is None for f in futures)
+    finally:
+        client.close()
+
+def test_cancel_reaches_the_service():
+    service = FakeService(delay=1.0)
+    client = ServiceClient(service.address, timeout=5)
+    try:
+        future = client.submit(b'imagem')
+        assert client.cancel(future)
+        for _ in range(100):
+            if service.cancelled:
+                break
+            time.sleep(0.01)
+        assert service.cancelled == 1
+    finally:
+        client.close()
+        service.close()
+
+def test_legacy_fallback_for_images(legacy):
+    client = ServiceClient(legacy.address, timeout=5)
+    future = client.submit(b'imagem', deadline=1.0)
+    assert client.legacy
+    assert json.loads(future.result(5)) == {"status": "success", "size": 6}
+    assert future.trace is None
+
+@pytest.mark.parametrize("options", [{'flags': FLAG_DEADLINE}, {'trace': Trace(["localhost:1"])},
+                                     {'frame_type': FRAME_FEATURES}, {'frame_type': FRAME_INFO}])
+def test_legacy_rejects_v2_options(legacy, options):
+    client = ServiceClient(legacy.address, timeout=5)
+    with pytest.raises(ConnectionError):
+        client.submit(b'imagem', **options)
+    assert legacy.requests == 0
+
+def test_legacy_rejects_features(legacy):
+    client = ServiceClient(legacy.address, timeout=5)
+    with pytest.raises(ConnectionError):
+        client.request_features(np.zeros(FEATURE_LENGTH, dtype=np.uint8))
+    assert legacy.requests == 0